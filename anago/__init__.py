@@ -1,3 +1,37 @@
-from anago.tagger import Tagger
-from anago.trainer import Trainer
-from anago.wrapper import Sequence
+import importlib
+import sys
+
+# Submodules holding the public classes. They are imported on first access,
+# so that `import anago` does not load Keras and TensorFlow.
+_CLASSES = {
+    'Tagger': 'anago.tagger',
+    'AsyncTagger': 'anago.aio',
+    'MultiTaskTagger': 'anago.tagger',
+    'Trainer': 'anago.trainer',
+    'Sequence': 'anago.wrapper',
+}
+
+__all__ = list(_CLASSES)
+
+
+def __getattr__(name):
+    if name not in _CLASSES:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+    value = getattr(importlib.import_module(_CLASSES[name]), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
+
+
+if sys.version_info < (3, 7):
+    # Module __getattr__ needs Python 3.7.
+    from anago.tagger import Tagger, MultiTaskTagger
+    if sys.version_info >= (3, 5):
+        # async def is a syntax error before Python 3.5.
+        from anago.aio import AsyncTagger
+    from anago.trainer import Trainer
+    from anago.wrapper import Sequence
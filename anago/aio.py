@@ -0,0 +1,112 @@
+"""
+Asyncio front-end of the model API.
+
+It lives apart from `anago.tagger`, so that only asyncio users import it.
+"""
+import asyncio
+
+from anago.tagger import analyze_batch_safely
+
+
+class AsyncTagger(object):
+    """An asyncio front-end that batches concurrent requests to a Tagger.
+
+    Texts passed to `analyze` are queued and coalesced into batches of at
+    most `max_batch_size` texts, waiting at most `max_wait` seconds for a
+    batch to fill up. Batches run in an executor thread, so the event loop
+    is never blocked by the model.
+
+    Attributes:
+        tagger: Tagger.
+        max_batch_size: int, maximum number of texts in a batch.
+        max_wait: float, seconds to wait for more texts after the first one.
+        executor: concurrent.futures.Executor running the model.
+            Default is the event loop's default executor.
+
+    Examples:
+        >>> async_tagger = AsyncTagger(tagger, max_batch_size=64, max_wait=0.01)
+        >>> res = await async_tagger.analyze('President Obama is speaking at the White House.')
+    """
+
+    def __init__(self, tagger, max_batch_size=32, max_wait=0.005, executor=None):
+        self.tagger = tagger
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.executor = executor
+        self._pending = []
+        self._running = []
+        self._ready = None
+        self._full = None
+        self._worker = None
+
+    async def analyze(self, text):
+        """Analyze text and return pretty format.
+
+        Args:
+            text: string, the input text.
+
+        Returns:
+            res: dict, as returned by `Tagger.analyze`.
+        """
+        loop = asyncio.get_event_loop()
+        if self._worker is None or self._worker.done():
+            self._ready = asyncio.Event()
+            self._full = asyncio.Event()
+            self._worker = asyncio.ensure_future(self._run())
+
+        future = loop.create_future()
+        self._pending.append((text, future))
+        self._ready.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._full.set()
+
+        return await future
+
+    async def close(self):
+        """Stop the batching worker and cancel the texts it has not answered."""
+        # The running batch is no longer pending, so it is cancelled with it.
+        running = self._running
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        for _, future in running + self._pending:
+            future.cancel()
+        self._pending = []
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            await self._ready.wait()
+            if len(self._pending) < self.max_batch_size:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            if len(self._pending) < self.max_batch_size:
+                self._full.clear()
+            if not self._pending:
+                self._ready.clear()
+
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                continue
+            texts = [text for text, _ in batch]
+            self._running = batch
+            try:
+                results = await loop.run_in_executor(self.executor, analyze_batch_safely, self.tagger, texts)
+            finally:
+                self._running = []
+            for (_, future), res in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(res, Exception):
+                    future.set_exception(res)
+                else:
+                    future.set_result(res)
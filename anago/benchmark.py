@@ -0,0 +1,227 @@
+"""
+Micro-benchmarks of the CRF layer and tuning of its configuration.
+
+Usage:
+    python -m anago.benchmark --output crf.json
+    python -m anago.benchmark --results crf.json --profile traffic.txt
+
+Each code path of `anago.layers.CRF` (the training loss with its gradients,
+the marginal probabilities and Viterbi decoding) is timed on synthetic
+emissions for a grid of sentence lengths, label counts and batch sizes, with
+the symbolic loop, the unrolled loop and the parallel scan. The results are
+saved as JSON, and `recommend_crf_config` picks the CRF options and the
+bucket lengths that are fastest for the sentence lengths of a deployment.
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+PATHS = ('loss', 'marginal', 'viterbi')
+MODES = {
+    'loop': {},
+    'unroll': {'unroll': True},
+    'parallel': {'parallel': True},
+}
+
+
+def benchmark_crf(lengths=(10, 25, 50, 100), num_labels=(10,), batch_sizes=(32,),
+                  modes=('loop', 'unroll', 'parallel'), paths=PATHS, dim=100, repeat=5):
+    """Times the CRF code paths on random inputs.
+
+    Args:
+        lengths: list of int, sentence lengths. Sentences in a batch have
+            random lengths up to it.
+        num_labels: list of int, numbers of labels.
+        batch_sizes: list of int.
+        modes: list of keys of `MODES`.
+        paths: list of 'loss', 'marginal' and 'viterbi'.
+        dim: int, input dimension of the CRF.
+        repeat: int, number of timed runs. The median is reported.
+
+    Returns:
+        list: a dict for each measurement with the `path`, `mode`, `length`,
+        `num_labels`, `batch_size` and `seconds` per batch.
+    """
+    import tensorflow as tf
+
+    results = []
+    for n in num_labels:
+        for length in lengths:
+            for mode in modes:
+                # A fresh graph and session for each configuration, so that
+                # it is not timed against the graphs of the previous ones.
+                graph = tf.Graph()
+                with graph.as_default(), tf.Session(graph=graph):
+                    results.extend(_benchmark_crf_config(n, length, mode, batch_sizes, paths, dim, repeat))
+
+    return results
+
+
+def _benchmark_crf_config(n, length, mode, batch_sizes, paths, dim, repeat):
+    import keras.backend as K
+
+    from anago.layers import CRF
+
+    # Unrolling needs the number of steps, so the inputs have a static length.
+    X = K.placeholder(shape=(None, length, dim))
+    mask = K.placeholder(shape=(None, length), dtype='bool')
+    y_true = K.placeholder(shape=(None, length, n))
+    crf = CRF(n, **MODES[mode])
+    crf.build((None, length, dim))
+    loss = K.mean(crf.get_negative_log_likelihood(y_true, X, mask))
+    outputs = {
+        'loss': [loss] + K.gradients(loss, crf.trainable_weights),
+        'marginal': [crf.get_marginal_prob(X, mask)],
+        'viterbi': [crf.viterbi_decoding(X, mask)],
+    }
+    functions = {path: K.function([X, mask, y_true], outputs[path]) for path in paths}
+    results = []
+    for batch_size in batch_sizes:
+        inputs = _random_batch(batch_size, length, dim, n)
+        for path in paths:
+            f = functions[path]
+            results.append({
+                'path': path,
+                'mode': mode,
+                'length': length,
+                'num_labels': n,
+                'batch_size': batch_size,
+                'seconds': _measure(lambda: f(inputs), repeat),
+            })
+
+    return results
+
+
+def _random_batch(batch_size, length, dim, num_labels):
+    x = np.random.randn(batch_size, length, dim)
+    mask = np.arange(length) < np.random.randint(1, length + 1, size=(batch_size, 1))
+    y = np.eye(num_labels)[np.random.randint(0, num_labels, size=(batch_size, length))]
+    return [x, mask, y]
+
+
+def _measure(f, repeat):
+    f()  # the first run builds the graph functions
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        f()
+        times.append(time.time() - start)
+
+    return sorted(times)[len(times) // 2]
+
+
+def save_results(results, path):
+    """Saves benchmark results as JSON with the versions they were measured with."""
+    import keras
+    import keras.backend as K
+
+    with open(path, 'w') as f:
+        json.dump({'backend': K.backend(), 'keras': keras.__version__, 'results': results},
+                  f, indent=4)
+
+
+def load_results(path):
+    """Loads benchmark results saved by `save_results`."""
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def recommend_crf_config(results, lengths, num_labels=None, batch_size=None, path='viterbi',
+                         static_length=False):
+    """Recommends CRF options and bucket lengths for a deployment profile.
+
+    Sentences are padded to the smallest benchmarked length that fits them,
+    and the mode with the smallest expected time over `lengths` is chosen.
+
+    Args:
+        results: list of dict returned by `benchmark_crf`.
+        lengths: list of int, sentence lengths seen in deployment.
+        num_labels: int. The closest benchmarked number of labels is used.
+        batch_size: int. The closest benchmarked batch size is used.
+        path: 'loss' for training, or 'viterbi' or 'marginal' for prediction.
+        static_length: boolean. Whether the model inputs have a fixed length.
+            `BiLSTMCRF` models do not, and the CRF cannot be unrolled then.
+
+    Returns:
+        dict: `crf_options` for `load_model` or `BiLSTMCRF`, the `buckets`
+        for `Tagger`, the chosen `mode` and its expected `seconds` per
+        sentence.
+    """
+    results = [r for r in results if r['path'] == path and (static_length or r['mode'] != 'unroll')]
+    if not results:
+        raise ValueError('No benchmark results for path: {}'.format(path))
+    if num_labels is not None:
+        closest = min({r['num_labels'] for r in results}, key=lambda n: abs(n - num_labels))
+        results = [r for r in results if r['num_labels'] == closest]
+    if batch_size is not None:
+        closest = min({r['batch_size'] for r in results}, key=lambda b: abs(b - batch_size))
+        results = [r for r in results if r['batch_size'] == closest]
+
+    best = None
+    for mode in sorted({r['mode'] for r in results}):
+        times = {}
+        for r in results:
+            if r['mode'] == mode:
+                times.setdefault(r['length'], []).append(r['seconds'] / r['batch_size'])
+        buckets = sorted(times)
+        seconds = 0.
+        used = set()
+        for length in lengths:
+            bucket = next((b for b in buckets if length <= b), buckets[-1])
+            used.add(bucket)
+            # Longer sentences than benchmarked are assumed to take proportionally longer.
+            seconds += np.mean(times[bucket]) * max(1., length / bucket)
+        seconds = float(seconds / max(len(lengths), 1))
+        if best is None or seconds < best['seconds']:
+            best = {'mode': mode, 'crf_options': dict(MODES[mode]), 'buckets': sorted(used),
+                    'seconds': seconds}
+
+    return best
+
+
+def main(args):
+    if args.results:
+        results = load_results(args.results)
+    else:
+        results = benchmark_crf(args.lengths, args.num_labels, args.batch_sizes,
+                                args.modes.split(','), args.paths.split(','), repeat=args.repeat)
+        if args.output:
+            save_results(results, args.output)
+        print('path\tmode\tlength\tlabels\tbatch\tms/batch', file=sys.stderr)
+        for r in results:
+            print('{path}\t{mode}\t{length}\t{num_labels}\t{batch_size}\t'.format(**r)
+                  + '{:.2f}'.format(r['seconds'] * 1000), file=sys.stderr)
+
+    if args.profile:
+        with open(args.profile, encoding=args.encoding) as f:
+            lengths = [len(line.split()) for line in f if line.strip()]
+        config = recommend_crf_config(results, lengths, args.profile_num_labels, args.profile_batch_size,
+                                      args.profile_path, args.static_length)
+        print(json.dumps(config, indent=4))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarking the CRF layer.')
+    parser.add_argument('--lengths', type=int, nargs='+', default=[10, 25, 50, 100])
+    parser.add_argument('--num_labels', type=int, nargs='+', default=[10])
+    parser.add_argument('--batch_sizes', type=int, nargs='+', default=[32])
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--paths', default=','.join(PATHS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default=None, help='JSON file to save the results to')
+    parser.add_argument('--results', default=None, help='JSON file of saved results to use instead')
+    parser.add_argument('--profile', default=None,
+                        help='deployment sentences, one per line, to recommend a configuration for')
+    parser.add_argument('--profile_num_labels', type=int, default=None)
+    parser.add_argument('--profile_batch_size', type=int, default=None)
+    parser.add_argument('--profile_path', default='viterbi', choices=PATHS)
+    parser.add_argument('--static_length', action='store_true',
+                        help='the deployed model has fixed-length inputs, so it can be unrolled')
+    parser.add_argument('--encoding', default='utf-8')
+    args = parser.parse_args()
+    if not args.results and not args.output and not args.profile:
+        parser.error('Give --output, --profile or both.')
+    main(args)
@@ -0,0 +1,138 @@
+"""
+Single-file model bundles.
+
+A bundle is an `anago.storage` file holding everything needed to tag: the
+model config and weights, the preprocessor vocabularies as NUL-separated
+UTF-8 blobs, and a manifest with the SHA-256 hash of every array. It is
+written atomically, so a server reloading it never sees a half-written model,
+and its arrays can be memory-mapped.
+"""
+import hashlib
+import json
+import os
+from collections import Counter
+
+import numpy as np
+from keras.models import model_from_json
+
+from anago.models import CUSTOM_OBJECTS, _replace_embeddings
+from anago.preprocessing import IndexTransformer
+from anago.storage import load_arrays, open_arrays, save_arrays
+
+FORMAT = 'anago-bundle'
+VERSION = 1
+VOCABS = ('word', 'char', 'label')
+
+
+def save_bundle(path, model, p):
+    """Saves a model and its preprocessor to a single file.
+
+    Args:
+        path: string, file path.
+        model: Keras model.
+        p: IndexTransformer.
+    """
+    if type(p) is not IndexTransformer:
+        raise ValueError('Bundles support IndexTransformer, not {}.'.format(type(p).__name__))
+
+    arrays = {}
+    for layer in model.layers:
+        for i, w in enumerate(layer.get_weights()):
+            arrays['weights/{}:{}'.format(layer.name, i)] = w
+
+    vocabs = {}
+    for name in VOCABS:
+        vocab = getattr(p, '_{}_vocab'.format(name))
+        arrays['vocab/{}'.format(name)] = _join_tokens(vocab.reverse_vocab)
+        arrays['vocab/{}:count'.format(name)] = np.array(
+            [vocab._token_count.get(token, 0) for token in vocab.reverse_vocab], dtype='int64')
+        vocabs[name] = {'lower': vocab._lower, 'unk': vocab._unk, 'max_size': vocab._max_size}
+
+    manifest = {
+        'format': FORMAT,
+        'version': VERSION,
+        'model': json.loads(model.to_json()),
+        'preprocessor': {'use_char': p._use_char, 'num_norm': p._num_norm, 'vocabs': vocabs},
+    }
+    manifest['sha256'] = {name: _sha256(a) for name, a in arrays.items()}
+    manifest['sha256']['manifest'] = _manifest_sha256(manifest)
+    save_arrays(path, arrays, manifest)
+
+
+def load_bundle(path, verify=True, mapped=False):
+    """Loads a model and its preprocessor from a bundle.
+
+    Args:
+        path: string, file path.
+        verify: boolean. Whether to check the hashes of the manifest and of
+            every array before building the model.
+        mapped: boolean. If True, embedding layers gather rows from a shared
+            memory map of the bundle instead of copies. See `MappedEmbedding`.
+
+    Returns:
+        tuple of the Keras model and the IndexTransformer.
+
+    Raises:
+        ValueError: if the file is not a bundle or fails verification.
+    """
+    arrays, manifest = open_arrays(path) if mapped else load_arrays(path)
+    if manifest.get('format') != FORMAT or manifest.get('version') != VERSION:
+        raise ValueError('Not a version {} anago bundle: {}'.format(VERSION, path))
+    if verify:
+        hashes = dict(manifest['sha256'])
+        if hashes.pop('manifest') != _manifest_sha256(manifest) or set(hashes) != set(arrays):
+            raise ValueError('Corrupted bundle manifest: {}'.format(path))
+        for name, a in arrays.items():
+            if _sha256(a) != hashes[name]:
+                raise ValueError('Checksum mismatch of {} in bundle: {}'.format(name, path))
+
+    p = _build_preprocessor(manifest['preprocessor'], arrays)
+
+    config = json.loads(json.dumps(manifest['model']))
+    if mapped:
+        for layer in _replace_embeddings(config, 'MappedEmbedding'):
+            layer['config']['key'] = 'weights/{}:0'.format(layer['name'])
+            layer['config']['weights_file'] = os.path.abspath(path)
+    model = model_from_json(json.dumps(config), custom_objects=CUSTOM_OBJECTS)
+    for layer in model.layers:
+        weights = [arrays['weights/{}:{}'.format(layer.name, i)] for i in range(len(layer.weights))]
+        if weights:
+            layer.set_weights(weights)
+
+    return model, p
+
+
+def _build_preprocessor(config, arrays):
+    vocabs = config['vocabs']
+    p = IndexTransformer(lower=vocabs['word']['lower'], num_norm=config['num_norm'],
+                         use_char=config['use_char'])
+    for name in VOCABS:
+        vocab = getattr(p, '_{}_vocab'.format(name))
+        vocab._lower = vocabs[name]['lower']
+        vocab._unk = vocabs[name]['unk']
+        vocab._max_size = vocabs[name]['max_size']
+        vocab._id2token = _split_tokens(arrays['vocab/{}'.format(name)])
+        vocab._token2id = {token: i for i, token in enumerate(vocab._id2token)}
+        counts = arrays['vocab/{}:count'.format(name)].tolist()
+        vocab._token_count = Counter({token: c for token, c in zip(vocab._id2token, counts) if c})
+
+    return p
+
+
+def _join_tokens(tokens):
+    if any('\0' in token for token in tokens):
+        raise ValueError('Tokens cannot contain NUL characters.')
+    return np.frombuffer('\0'.join(tokens).encode('utf-8'), dtype=np.uint8)
+
+
+def _split_tokens(blob):
+    return bytes(blob).decode('utf-8').split('\0') if len(blob) else []
+
+
+def _sha256(a):
+    return hashlib.sha256(np.ascontiguousarray(a).reshape(-1).view(np.uint8)).hexdigest()
+
+
+def _manifest_sha256(manifest):
+    content = {k: v for k, v in manifest.items() if k != 'sha256'}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
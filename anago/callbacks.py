@@ -1,44 +1,146 @@
 """
 Custom callbacks.
 """
+import time
+
 import numpy as np
 from keras.callbacks import Callback
-from seqeval.metrics import f1_score, classification_report
+from seqeval.metrics import classification_report
+
+from anago.preprocessing import inverse_labels
+from anago.tagger import label_ids_and_scores
+from anago.utils import EntityDecoder
 
 
 class F1score(Callback):
+    """Prints and logs the F1 score of the validation data after each epoch.
+
+    The validation batches are transformed once and cached with their true
+    entity spans, so an epoch only predicts the batches and compares spans
+    extracted from label ids by `EntityDecoder`. The scores are the same as
+    `seqeval`'s `f1_score`.
+    """
 
-    def __init__(self, seq, preprocessor=None):
+    def __init__(self, seq, preprocessor=None, report_every=None):
+        """Create an F1score callback.
+
+        Args:
+            seq: Sequence of validation batches.
+            preprocessor: the transformer of the batches.
+            report_every: int. Print a `classification_report` every this
+                many epochs. None never prints it.
+        """
         super(F1score, self).__init__()
         self.seq = seq
         self.p = preprocessor
+        self.report_every = report_every
+        self._batches = None
 
     def get_lengths(self, y_true):
-        lengths = []
-        for y in np.argmax(y_true, -1):
-            try:
-                i = list(y).index(0)
-            except ValueError:
-                i = len(y)
-            lengths.append(i)
+        # Sentences end at their first padding label.
+        is_pad = np.argmax(y_true, -1) == 0
 
-        return lengths
+        return np.where(is_pad.any(-1), np.argmax(is_pad, -1), is_pad.shape[-1])
 
-    def on_epoch_end(self, epoch, logs={}):
-        label_true = []
-        label_pred = []
+    def _cache(self):
+        self._batches = []
+        y_true = []
         for i in range(len(self.seq)):
-            x_true, y_true = self.seq[i]
-            lengths = self.get_lengths(y_true)
-            y_pred = self.model.predict_on_batch(x_true)
+            x, y = self.seq[i]
+            # Multi-task models have a list of targets and outputs.
+            y = y if isinstance(y, list) else [y]
+            lengths = self.get_lengths(y[0])
+            self._batches.append((x, lengths))
+            y_true.append([np.argmax(y_task, -1) for y_task in y])
+
+        vocabs = getattr(self.p, '_label_vocabs', None) or [self.p._label_vocab]
+        self._vocabs = vocabs
+        self._decoders = [EntityDecoder(vocab.reverse_vocab) for vocab in vocabs]
+        self._y_true = [[y[k] for y in y_true] for k in range(len(vocabs))]
+        self._true_spans = [self._get_spans(decoder, y) for decoder, y in zip(self._decoders, self._y_true)]
+
+    def _get_spans(self, decoder, y):
+        spans = set()
+        offset = 0
+        for ids, (_, lengths) in zip(y, self._batches):
+            for i, chunks in enumerate(decoder.decode(ids, lengths), offset):
+                spans.update((i, chunk_type, begin, end) for chunk_type, begin, end, _ in chunks)
+            offset += len(lengths)
+
+        return spans
+
+    def _get_labels(self, k, y):
+        labels = []
+        for ids, (_, lengths) in zip(y, self._batches):
+            labels.extend(inverse_labels(ids, self._vocabs[k], lengths))
+
+        return labels
+
+    def on_epoch_end(self, epoch, logs={}):
+        if self._batches is None:
+            self._cache()
+
+        y_pred = [[] for _ in self._decoders]
+        for x, _ in self._batches:
+            pred = self.model.predict_on_batch(x)
+            pred = pred if isinstance(pred, list) else [pred]
+            for task, y in zip(y_pred, pred):
+                task.append(label_ids_and_scores(y)[0])
+
+        report = self.report_every and (epoch + 1) % self.report_every == 0
+        names = getattr(self.p, 'task_names', None) or [None] * len(self._decoders)
+        scores = []
+        for k, name in enumerate(names):
+            true_spans = self._true_spans[k]
+            pred_spans = self._get_spans(self._decoders[k], y_pred[k])
+            correct = len(true_spans & pred_spans)
+            score = 2. * correct / (len(true_spans) + len(pred_spans)) if correct else 0.
+            scores.append(score)
+            if name:
+                logs['{}_f1'.format(name)] = score
+                print(' - {}_f1: {:04.2f}'.format(name, score * 100))
+            else:
+                print(' - f1: {:04.2f}'.format(score * 100))
+            if report:
+                print(classification_report(self._get_labels(k, self._y_true[k]),
+                                            self._get_labels(k, y_pred[k])))
+        logs['f1'] = sum(scores) / len(scores)
+
+
+class DataWait(Callback):
+    """Prints and logs the fraction of each epoch spent waiting for batches.
+
+    Keras gets the next training batch between the end of a batch and the
+    beginning of the next one, so the time between them is mostly spent
+    waiting for the input pipeline. A high fraction means more `workers`
+    would speed up training. It is logged as `data_wait`.
+    """
+
+    def __init__(self, verbose=1):
+        """Create a DataWait callback.
+
+        Args:
+            verbose: Integer. Whether to print the fraction after each epoch.
+        """
+        super(DataWait, self).__init__()
+        self.verbose = verbose
+        self._start = self._last = None
+        self._wait = 0.
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = self._last = time.time()
+        self._wait = 0.
 
-            y_true = self.p.inverse_transform(y_true, lengths)
-            y_pred = self.p.inverse_transform(y_pred, lengths)
+    def on_batch_begin(self, batch, logs=None):
+        self._wait += time.time() - self._last
 
-            label_true.extend(y_true)
-            label_pred.extend(y_pred)
+    def on_batch_end(self, batch, logs=None):
+        self._last = time.time()
 
-        score = f1_score(label_true, label_pred)
-        print(' - f1: {:04.2f}'.format(score * 100))
-        print(classification_report(label_true, label_pred))
-        logs['f1'] = score
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = self._last - self._start
+        data_wait = self._wait / elapsed if elapsed > 0 else 0.
+        if logs is not None:
+            logs['data_wait'] = data_wait
+        if self.verbose:
+            print(' - data_wait: {:04.2f}%'.format(data_wait * 100))
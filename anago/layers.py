@@ -2,15 +2,19 @@ from __future__ import absolute_import
 from __future__ import division
 
 import keras.backend as K
+import numpy as np
 from keras import activations
 from keras import initializers
 from keras import regularizers
 from keras import constraints
 from keras.engine import Layer
 from keras.engine import InputSpec
+from keras.layers import Conv1D, GlobalMaxPooling1D
 from keras.objectives import categorical_crossentropy
 from keras.objectives import sparse_categorical_crossentropy
 
+from anago.storage import open_arrays
+
 
 class CRF(Layer):
     """An implementation of linear chain conditional random field (CRF).
@@ -105,6 +109,25 @@ class CRF(Layer):
         unroll: Boolean (default False). If True, the network will be unrolled, else a symbolic loop will be used.
             Unrolling can speed-up a RNN, although it tends to be more memory-intensive.
             Unrolling is only suitable for short sequences.
+        parallel: Boolean (default False). If True, the log-partition function, marginals and
+            Viterbi tables are computed with a parallel prefix scan over the time steps instead
+            of a step-by-step loop (TensorFlow only). The results are the same, but the scan takes
+            log2(timesteps) batched steps, each of which holds a `(nb_samples, timesteps, units,
+            units, units)` tensor, so it suits small label sets.
+        viterbi_output: Either 'onehot' (default) or 'index'. The form of the Viterbi best path:
+            one-hot vectors of shape `(nb_samples, timesteps, units)`, or int32 label indices of
+            shape `(nb_samples, timesteps)`, which are `units` times smaller. Index output is
+            for prediction only: train with one-hot output and load the weights with
+            `viterbi_output='index'`.
+        allowed_transitions: List of `(from, to)` label index pairs (default None, all allowed)
+            the Viterbi best path may contain, where index `units` stands for the start and
+            `units + 1` for the end of a sequence. See `anago.utils.allowed_transitions`. Other
+            transitions get an energy penalty when decoding, so e.g. `O -> I-PER` never appears
+            in a best path. Training and marginals are not affected.
+        beam_size: Positive integer (default None). If given, each Viterbi step only extends the
+            `beam_size` best labels of the previous step, which takes `(nb_samples, beam_size,
+            units)` instead of `(nb_samples, units, units)` energies. Decoding is then approximate
+            unless `beam_size >= units`. Not available with `parallel=True`.
     # Input shape
         3D tensor with shape `(nb_samples, timesteps, input_dim)`.
     # Output shape
@@ -116,6 +139,9 @@ class CRF(Layer):
         set to `True`.
     """
 
+    # Energy added to the transitions outside `allowed_transitions` when decoding.
+    TRANSITION_PENALTY = 1e4
+
     def __init__(self, units,
                  learn_mode='join',
                  test_mode=None,
@@ -137,6 +163,10 @@ class CRF(Layer):
                  bias_constraint=None,
                  input_dim=None,
                  unroll=False,
+                 parallel=False,
+                 viterbi_output='onehot',
+                 allowed_transitions=None,
+                 beam_size=None,
                  **kwargs):
         super(CRF, self).__init__(**kwargs)
         self.supports_masking = True
@@ -170,6 +200,29 @@ class CRF(Layer):
         self.bias_constraint = constraints.get(bias_constraint)
 
         self.unroll = unroll
+        self.parallel = parallel
+        if self.parallel and K.backend() != 'tensorflow':
+            raise ValueError('parallel=True requires the TensorFlow backend.')
+        self.viterbi_output = viterbi_output
+        if self.viterbi_output not in ('onehot', 'index'):
+            raise ValueError('Unknown viterbi_output: {}'.format(viterbi_output))
+        if self.viterbi_output == 'index' and (self.learn_mode, self.test_mode) != ('join', 'viterbi'):
+            raise ValueError('viterbi_output="index" requires learn_mode="join" and test_mode="viterbi".')
+        self.allowed_transitions = allowed_transitions
+        if allowed_transitions is not None:
+            self.allowed_transitions = [[int(i), int(j)] for i, j in allowed_transitions]
+            allowed = np.zeros((units + 2, units + 2), dtype=bool)
+            for i, j in allowed_transitions:
+                allowed[i, j] = True
+            penalty = np.where(allowed, 0., self.TRANSITION_PENALTY).astype(K.floatx())
+            self._chain_penalty = penalty[:units, :units]
+            self._start_penalty = penalty[units, :units]
+            self._end_penalty = penalty[:units, units + 1]
+        self.beam_size = beam_size
+        if self.beam_size is not None and self.parallel:
+            raise ValueError('beam_size cannot be used with parallel=True.')
+        if self.beam_size is not None and K.backend() != 'tensorflow':
+            raise ValueError('beam_size requires the TensorFlow backend.')
 
     def build(self, input_shape):
         self.input_spec = [InputSpec(shape=input_shape)]
@@ -211,6 +264,10 @@ class CRF(Layer):
         if mask is not None:
             assert K.ndim(mask) == 2, 'Input mask to CRF must have dim 2 if not None'
 
+        if self.viterbi_output == 'index':
+            # There is no training output of this shape, see `loss_function`.
+            return self.viterbi_decoding(X, mask)
+
         if self.test_mode == 'viterbi':
             test_output = self.viterbi_decoding(X, mask)
         else:
@@ -229,6 +286,8 @@ class CRF(Layer):
         return out
 
     def compute_output_shape(self, input_shape):
+        if self.viterbi_output == 'index':
+            return input_shape[:2]
         return input_shape[:2] + (self.units,)
 
     def compute_mask(self, input, mask=None):
@@ -257,12 +316,18 @@ class CRF(Layer):
                   'boundary_constraint': constraints.serialize(self.boundary_constraint),
                   'bias_constraint': constraints.serialize(self.bias_constraint),
                   'input_dim': self.input_dim,
-                  'unroll': self.unroll}
+                  'unroll': self.unroll,
+                  'parallel': self.parallel,
+                  'viterbi_output': self.viterbi_output,
+                  'allowed_transitions': self.allowed_transitions,
+                  'beam_size': self.beam_size}
         base_config = super(CRF, self).get_config()
         return dict(list(base_config.items()) + list(config.items()))
 
     @property
     def loss_function(self):
+        if self.viterbi_output == 'index':
+            raise ValueError('A CRF with viterbi_output="index" cannot be trained.')
         if self.learn_mode == 'join':
             def loss(y_true, y_pred):
                 assert self._inbound_nodes, 'CRF has not connected to any layer.'
@@ -338,7 +403,14 @@ class CRF(Layer):
         assert offset > 0
         return K.concatenate([K.zeros_like(x[:, :offset]), x[:, :-offset]], axis=1)
 
-    def add_boundary_energy(self, energy, mask, start, end):
+    def add_boundary_energy(self, energy, mask, start, end, last_word=False):
+        """Adds `start` to the first word and `end` to a word near the end.
+
+        With a mask, `end` goes to the word before the first real word of
+        left-padded inputs, which is where the trained boundary weights have
+        always been applied. `last_word=True` puts it on the last real word
+        instead, whatever the padding.
+        """
         start = K.expand_dims(K.expand_dims(start, 0), 0)
         end = K.expand_dims(K.expand_dims(end, 0), 0)
         if mask is None:
@@ -347,7 +419,10 @@ class CRF(Layer):
         else:
             mask = K.expand_dims(K.cast(mask, K.floatx()))
             start_mask = K.cast(K.greater(mask, self.shift_right(mask)), K.floatx())
-            end_mask = K.cast(K.greater(self.shift_left(mask), mask), K.floatx())
+            if last_word:
+                end_mask = K.cast(K.greater(mask, self.shift_left(mask)), K.floatx())
+            else:
+                end_mask = K.cast(K.greater(self.shift_left(mask), mask), K.floatx())
             energy = energy + start_mask * start
             energy = energy + end_mask * end
         return energy
@@ -397,13 +472,18 @@ class CRF(Layer):
         # Note: `i` is of float32, due to the behavior of `K.rnn`
         prev_target_val, i, chain_energy = states[:3]
         t = K.cast(i[0, 0], dtype='int32')
+        chain_mask = None
         if len(states) > 3:
             if K.backend() == 'theano':
                 m = states[3][:, t:(t + 2)]
             else:
                 m = K.tf.slice(states[3], [0, t], [-1, 2])
             input_energy_t = input_energy_t * K.expand_dims(m[:, 0])
-            chain_energy = chain_energy * K.expand_dims(K.expand_dims(m[:, 0] * m[:, 1]))  # (1, F, F)*(B, 1, 1) -> (B, F, F)
+            chain_mask = K.expand_dims(K.expand_dims(m[:, 0] * m[:, 1]))  # (B, 1, 1)
+        if not return_logZ and self.beam_size:
+            return self.beam_step(input_energy_t, prev_target_val, chain_energy[0], chain_mask, i)
+        if chain_mask is not None:
+            chain_energy = chain_energy * chain_mask  # (1, F, F)*(B, 1, 1) -> (B, F, F)
         if return_logZ:
             energy = chain_energy + K.expand_dims(input_energy_t - prev_target_val, 2)  # shapes: (1, B, F) + (B, F, 1) -> (B, F, F)
             new_target_val = K.logsumexp(-energy, 1)  # shapes: (B, F)
@@ -414,7 +494,23 @@ class CRF(Layer):
             argmin_table = K.cast(K.argmin(energy, 1), K.floatx())  # cast for tf-version `K.rnn`
             return argmin_table, [min_energy, i + 1]
 
-    def recursion(self, input_energy, mask=None, go_backwards=False, return_sequences=True, return_logZ=True, input_length=None):
+    def beam_step(self, input_energy_t, prev_target_val, chain_energy, chain_mask, i):
+        """Viterbi step extending only the `beam_size` best previous labels.
+        """
+        beam_size = min(self.beam_size, self.units)
+        neg_energy, beam = K.tf.nn.top_k(-(input_energy_t + prev_target_val), beam_size)  # (B, K)
+        chain_energy = K.gather(chain_energy, beam)  # (B, K, F): rows of the labels in the beam
+        if chain_mask is not None:
+            chain_energy = chain_energy * chain_mask
+        energy = chain_energy - K.expand_dims(neg_energy, 2)
+        min_energy = K.min(energy, 1)
+        # map the position in the beam back to the label
+        argmin = K.one_hot(K.argmin(energy, 1), beam_size)  # (B, F, K)
+        argmin_table = K.sum(argmin * K.expand_dims(K.cast(beam, K.floatx()), 1), 2)
+        return argmin_table, [min_energy, i + 1]
+
+    def recursion(self, input_energy, mask=None, go_backwards=False, return_sequences=True, return_logZ=True, input_length=None,
+                  chain_energy=None):
         """Forward (alpha) or backward (beta) recursion
         If `return_logZ = True`, compute the logZ, the normalization constant:
         \[ Z = \sum_{y1, y2, y3} exp(-E) # energy
@@ -428,28 +524,35 @@ class CRF(Layer):
               yi's are one-hot vectors
               u1, u3: boundary energies have been merged
         If `return_logZ = False`, compute the Viterbi's best path lookup table.
+        `chain_energy` defaults to the `chain_kernel`.
         """
-        chain_energy = self.chain_kernel
-        chain_energy = K.expand_dims(chain_energy, 0)  # shape=(1, F, F): F=num of output features. 1st F is for t-1, 2nd F for t
-        prev_target_val = K.zeros_like(input_energy[:, 0, :])  # shape=(B, F), dtype=float32
+        if chain_energy is None:
+            chain_energy = self.chain_kernel
 
         if go_backwards:
             input_energy = K.reverse(input_energy, 1)
             if mask is not None:
                 mask = K.reverse(mask, 1)
 
-        initial_states = [prev_target_val, K.zeros_like(prev_target_val[:, :1])]
-        constants = [chain_energy]
+        if self.parallel:
+            target_val_seq = self.parallel_recursion(input_energy, mask, return_logZ, chain_energy)
+            target_val_last = target_val_seq[:, -1]
+        else:
+            chain_energy = K.expand_dims(chain_energy, 0)  # shape=(1, F, F): F=num of output features. 1st F is for t-1, 2nd F for t
+            prev_target_val = K.zeros_like(input_energy[:, 0, :])  # shape=(B, F), dtype=float32
 
-        if mask is not None:
-            mask2 = K.cast(K.concatenate([mask, K.zeros_like(mask[:, :1])], axis=1), K.floatx())
-            constants.append(mask2)
+            initial_states = [prev_target_val, K.zeros_like(prev_target_val[:, :1])]
+            constants = [chain_energy]
 
-        def _step(input_energy_i, states):
-            return self.step(input_energy_i, states, return_logZ)
+            if mask is not None:
+                mask2 = K.cast(K.concatenate([mask, K.zeros_like(mask[:, :1])], axis=1), K.floatx())
+                constants.append(mask2)
+
+            def _step(input_energy_i, states):
+                return self.step(input_energy_i, states, return_logZ)
 
-        target_val_last, target_val_seq, _ = K.rnn(_step, input_energy, initial_states, constants=constants,
-                                                   input_length=input_length, unroll=self.unroll)
+            target_val_last, target_val_seq, _ = K.rnn(_step, input_energy, initial_states, constants=constants,
+                                                       input_length=input_length, unroll=self.unroll)
 
         if return_sequences:
             if go_backwards:
@@ -458,6 +561,59 @@ class CRF(Layer):
         else:
             return target_val_last
 
+    def parallel_recursion(self, input_energy, mask=None, return_logZ=True, chain_energy=None):
+        """Computes the same tables as the `K.rnn` loop of `recursion` with a parallel prefix scan.
+
+        Each step of `step` maps the previous values `a` to
+            a'[j] = log_sum_exp_i(a[i] - u_t[i] - W_t[i, j])   (logZ)
+            a'[j] = min_i(a[i] + u_t[i] + W_t[i, j])           (Viterbi)
+        where u_t and W_t are the masked input and chain energies. These maps are matrix products
+        in the (log-sum-exp, +) and (min, +) semirings, which are associative, so the values of
+        every step are the prefix products of the per-step matrices, starting from a = 0.
+        """
+        if chain_energy is None:
+            chain_energy = self.chain_kernel
+        chain_energy = K.expand_dims(K.expand_dims(chain_energy, 0), 0)  # (1, 1, F, F)
+        if mask is not None:
+            mask = K.cast(mask, K.floatx())
+            next_mask = K.concatenate([mask[:, 1:], K.zeros_like(mask[:, :1])], axis=1)
+            input_energy = input_energy * K.expand_dims(mask)
+            chain_energy = chain_energy * K.expand_dims(K.expand_dims(mask * next_mask))  # (B, T, F, F)
+
+        if return_logZ:
+            transitions = -(chain_energy + K.expand_dims(input_energy, 3))  # (B, T, F, F)
+            return K.logsumexp(self.prefix_scan(transitions, K.logsumexp), 2)  # (B, T, F)
+
+        transitions = chain_energy + K.expand_dims(input_energy, 3)
+        min_energy = K.min(self.prefix_scan(transitions, K.min), 2)
+        prev_target_val = K.concatenate([K.zeros_like(min_energy[:, :1]), min_energy[:, :-1]], axis=1)
+        energy = transitions + K.expand_dims(prev_target_val, 3)
+        return K.cast(K.argmin(energy, 2), K.floatx())  # same dtype as the `K.rnn` tables
+
+    def prefix_scan(self, x, reduce):
+        """Inclusive scan of matrices `x` of shape (B, T, F, F) over axis 1 under the semiring
+        product `(a * b)[i, k] = reduce_j(a[i, j] + b[j, k])`. Each round combines every step
+        with the one `offset` before it and doubles `offset` (Hillis and Steele), so the scan
+        takes log2(T) batched products.
+        """
+        tf = K.tf
+
+        def combine(a, b):
+            return reduce(K.expand_dims(a, 4) + K.expand_dims(b, 2), 3)
+
+        def cond(offset, x):
+            return offset < K.shape(x)[1]
+
+        def body(offset, x):
+            length = K.shape(x)[1]
+            x = K.concatenate([x[:, :offset], combine(x[:, :length - offset], x[:, offset:])], axis=1)
+            return offset * 2, x
+
+        shape = tf.TensorShape([None, None, self.units, self.units])
+        _, x = tf.while_loop(cond, body, [tf.constant(1), x],
+                             shape_invariants=[tf.TensorShape([]), shape])
+        return x
+
     def forward_recursion(self, input_energy, **kwargs):
         return self.recursion(input_energy, **kwargs)
 
@@ -478,10 +634,15 @@ class CRF(Layer):
 
     def viterbi_decoding(self, X, mask=None):
         input_energy = self.activation(K.dot(X, self.kernel) + self.bias)
+        chain_energy = self.chain_kernel
         if self.use_boundary:
             input_energy = self.add_boundary_energy(input_energy, mask, self.left_boundary, self.right_boundary)
+        if self.allowed_transitions is not None:
+            chain_energy = chain_energy + K.constant(self._chain_penalty)
+            input_energy = self.add_boundary_energy(input_energy, mask, K.constant(self._start_penalty),
+                                                    K.constant(self._end_penalty), last_word=True)
 
-        argmin_tables = self.recursion(input_energy, mask, return_logZ=False)
+        argmin_tables = self.recursion(input_energy, mask, return_logZ=False, chain_energy=chain_energy)
         argmin_tables = K.cast(argmin_tables, 'int32')
 
         # backward to find best path, `initial_best_idx` can be any, as all elements in the last argmin_table are the same
@@ -509,4 +670,202 @@ class CRF(Layer):
         best_paths = K.reverse(best_paths, 1)
         best_paths = K.squeeze(best_paths, 2)
 
+        if self.viterbi_output == 'index':
+            return best_paths
         return K.one_hot(best_paths, self.units)
+
+
+class QuantizedEmbedding(Layer):
+    """Embedding layer whose matrix is stored as int8 with a scale per row.
+
+    Only the looked-up rows are dequantized, so the full matrix takes a quarter
+    of the memory of a float32 `Embedding`. The layer is meant for inference;
+    its weights are set from a trained `Embedding` by `quantize_model`.
+
+    # Arguments
+        input_dim: int > 0. Size of the vocabulary.
+        output_dim: int >= 0. Dimension of the dense embedding.
+        mask_zero: Whether or not the input value 0 is a special "padding"
+            value that should be masked out.
+        input_length: Length of input sequences, when it is constant.
+    """
+
+    def __init__(self, input_dim, output_dim, mask_zero=False, input_length=None, **kwargs):
+        if 'input_shape' not in kwargs:
+            if input_length:
+                kwargs['input_shape'] = (input_length,)
+            else:
+                kwargs['input_shape'] = (None,)
+        super(QuantizedEmbedding, self).__init__(**kwargs)
+        self.input_dim = input_dim
+        self.output_dim = output_dim
+        self.mask_zero = mask_zero
+        self.input_length = input_length
+        self.supports_masking = mask_zero
+
+    def build(self, input_shape):
+        self.embeddings = self.add_weight(name='embeddings',
+                                          shape=(self.input_dim, self.output_dim),
+                                          dtype='int8',
+                                          initializer=lambda shape, dtype=None: np.zeros(shape, 'int8'),
+                                          trainable=False)
+        self.scales = self.add_weight(name='scales',
+                                      shape=(self.input_dim,),
+                                      initializer='ones',
+                                      trainable=False)
+        self.built = True
+
+    def call(self, inputs):
+        if K.dtype(inputs) != 'int32':
+            inputs = K.cast(inputs, 'int32')
+        rows = K.cast(K.gather(self.embeddings, inputs), K.floatx())
+        scales = K.expand_dims(K.gather(self.scales, inputs))
+        return rows * scales
+
+    def compute_mask(self, inputs, mask=None):
+        if not self.mask_zero:
+            return None
+        return K.not_equal(inputs, 0)
+
+    def compute_output_shape(self, input_shape):
+        return tuple(input_shape) + (self.output_dim,)
+
+    def get_config(self):
+        config = {'input_dim': self.input_dim,
+                  'output_dim': self.output_dim,
+                  'mask_zero': self.mask_zero,
+                  'input_length': self.input_length}
+        base_config = super(QuantizedEmbedding, self).get_config()
+        return dict(list(base_config.items()) + list(config.items()))
+
+
+def quantize(x, axis=-1):
+    """Quantizes an array to int8 with symmetric, per-slice scales.
+
+    Args:
+        x: numpy array.
+        axis: int, the axis reduced for each scale. For an embedding matrix
+            `axis=1` gives a scale per row, for a kernel `axis=0` a scale per
+            output unit.
+
+    Returns:
+        tuple of the int8 array and the float32 scales, such that
+        `q * np.expand_dims(scales, axis)` approximates `x`.
+    """
+    scales = np.abs(x).max(axis=axis) / 127.
+    divisor = np.expand_dims(np.where(scales == 0, 1., scales), axis)
+    q = np.clip(np.round(x / divisor), -127, 127).astype('int8')
+
+    return q, scales.astype('float32')
+
+
+class MappedEmbedding(Layer):
+    """Embedding layer that looks up rows of a memory-mapped matrix.
+
+    The matrix is not copied into a variable: rows are gathered from a
+    read-only memory map of a file saved by `anago.storage.save_arrays`, so
+    processes and models using the same file share its pages. The layer is
+    meant for inference with the TensorFlow backend.
+
+    # Arguments
+        input_dim: int > 0. Size of the vocabulary.
+        output_dim: int >= 0. Dimension of the dense embedding.
+        weights_file: path to the file holding the matrix.
+        key: name of the matrix in the file.
+        mask_zero: Whether or not the input value 0 is a special "padding"
+            value that should be masked out.
+        input_length: Length of input sequences, when it is constant.
+    """
+
+    def __init__(self, input_dim, output_dim, weights_file=None, key=None,
+                 mask_zero=False, input_length=None, **kwargs):
+        if 'input_shape' not in kwargs:
+            if input_length:
+                kwargs['input_shape'] = (input_length,)
+            else:
+                kwargs['input_shape'] = (None,)
+        super(MappedEmbedding, self).__init__(**kwargs)
+        self.input_dim = input_dim
+        self.output_dim = output_dim
+        self.weights_file = weights_file
+        self.key = key
+        self.mask_zero = mask_zero
+        self.input_length = input_length
+        self.supports_masking = mask_zero
+
+    @property
+    def matrix(self):
+        arrays, _ = open_arrays(self.weights_file)
+        return arrays[self.key]
+
+    def call(self, inputs):
+        matrix = self.matrix
+
+        def gather(ids):
+            return np.asarray(matrix[ids], dtype=K.floatx())
+
+        outputs = K.tf.py_func(gather, [K.cast(inputs, 'int32')], K.floatx(), stateful=False)
+        outputs.set_shape(inputs.shape.concatenate(self.output_dim))
+        return outputs
+
+    def compute_mask(self, inputs, mask=None):
+        if not self.mask_zero:
+            return None
+        return K.not_equal(inputs, 0)
+
+    def compute_output_shape(self, input_shape):
+        return tuple(input_shape) + (self.output_dim,)
+
+    def get_config(self):
+        config = {'input_dim': self.input_dim,
+                  'output_dim': self.output_dim,
+                  'weights_file': self.weights_file,
+                  'key': self.key,
+                  'mask_zero': self.mask_zero,
+                  'input_length': self.input_length}
+        base_config = super(MappedEmbedding, self).get_config()
+        return dict(list(base_config.items()) + list(config.items()))
+
+
+class MaskedConv1D(Conv1D):
+    """1D convolution that supports masking.
+
+    Masked timesteps are zeroed before the convolution, so padding does not
+    leak into the outputs of real timesteps, and the mask is passed on to the
+    next layers. Use it with `padding='same'` to keep the sequence length.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(MaskedConv1D, self).__init__(*args, **kwargs)
+        self.supports_masking = True
+
+    def call(self, inputs, mask=None):
+        if mask is not None:
+            inputs = inputs * K.expand_dims(K.cast(mask, K.dtype(inputs)))
+        return super(MaskedConv1D, self).call(inputs)
+
+    def compute_mask(self, inputs, mask=None):
+        return mask
+
+
+class MaskedGlobalMaxPooling1D(GlobalMaxPooling1D):
+    """Global max pooling over the timesteps that are not masked.
+
+    Sequences with every timestep masked are pooled to zeros. The mask is
+    not passed on, since the timesteps are pooled away.
+    """
+
+    def __init__(self, **kwargs):
+        super(MaskedGlobalMaxPooling1D, self).__init__(**kwargs)
+        self.supports_masking = True
+
+    def call(self, inputs, mask=None):
+        if mask is None:
+            return super(MaskedGlobalMaxPooling1D, self).call(inputs)
+        mask = K.expand_dims(K.cast(mask, K.dtype(inputs)))
+        # Masked timesteps are moved far below any real output before pooling.
+        outputs = K.max(inputs - (1 - mask) * 1e9, axis=1)
+        return outputs * K.max(mask, axis=1)
+
+    def compute_mask(self, inputs, mask=None):
+        return None
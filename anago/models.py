@@ -2,12 +2,23 @@
 Model definition.
 """
 import json
+import os
 
+import keras.backend as K
+import numpy as np
 from keras.layers import Dense, LSTM, Bidirectional, Embedding, Input, Dropout, TimeDistributed
 from keras.layers.merge import Concatenate
 from keras.models import Model, model_from_json
 
-from anago.layers import CRF
+from anago.layers import CRF, MappedEmbedding, MaskedConv1D, MaskedGlobalMaxPooling1D, QuantizedEmbedding
+from anago.layers import quantize
+from anago.storage import open_arrays, save_arrays
+
+CUSTOM_OBJECTS = {'CRF': CRF,
+                  'MappedEmbedding': MappedEmbedding,
+                  'MaskedConv1D': MaskedConv1D,
+                  'MaskedGlobalMaxPooling1D': MaskedGlobalMaxPooling1D,
+                  'QuantizedEmbedding': QuantizedEmbedding}
 
 
 def save_model(model, weights_file, params_file):
@@ -17,14 +28,339 @@ def save_model(model, weights_file, params_file):
         model.save_weights(weights_file)
 
 
-def load_model(weights_file, params_file):
+def load_model(weights_file, params_file, crf_options=None):
+    """Loads a model saved by `save_model`.
+
+    Args:
+        weights_file: path to the weights file.
+        params_file: path to the params file.
+        crf_options: dict, options overriding the saved config of the CRF
+            layers, e.g. `{'viterbi_output': 'index'}` to predict label ids.
+
+    Returns:
+        Keras model.
+    """
     with open(params_file) as f:
-        model = model_from_json(f.read(), custom_objects={'CRF': CRF})
-        model.load_weights(weights_file)
+        config = json.load(f)
+    if crf_options:
+        for layer in config['config']['layers']:
+            if layer['class_name'] == 'CRF':
+                layer['config'].update(crf_options)
+    model = model_from_json(json.dumps(config), custom_objects=CUSTOM_OBJECTS)
+    model.load_weights(weights_file)
+
+    return model
+
+
+def quantize_model(model, weights_file, params_file, quantize_kernels=False):
+    """Saves a model with int8 weights for deployment.
+
+    Embedding layers are replaced with `QuantizedEmbedding`, which keeps the
+    matrix as int8 with a scale per row at inference. With `quantize_kernels`,
+    the kernels of Dense and LSTM layers are stored as int8 with a scale per
+    output unit too. They are dequantized when loaded, so they shrink the file
+    but not the memory of the loaded model.
+
+    Args:
+        model: Keras model.
+        weights_file: path to write the weights (.npz) to.
+        params_file: path to write the model config (.json) to.
+        quantize_kernels: boolean. Whether to quantize Dense and LSTM kernels.
+    """
+    config = json.loads(model.to_json())
+    _replace_embeddings(config, 'QuantizedEmbedding')
+
+    arrays = {}
+    for layer in model.layers:
+        is_kernel_layer = quantize_kernels and _is_kernel_layer(layer)
+        for i, (w, weight) in enumerate(zip(layer.get_weights(), layer.weights)):
+            key = '{}:{}'.format(layer.name, i)
+            if isinstance(layer, Embedding):
+                arrays[key], arrays['{}:{}'.format(layer.name, i + 1)] = quantize(w, axis=1)
+            elif is_kernel_layer and 'kernel' in weight.name:
+                arrays[key], arrays[key + ':scale'] = quantize(w, axis=0)
+            else:
+                arrays[key] = w
+
+    with open(params_file, 'w') as f:
+        json.dump(config, f, sort_keys=True, indent=4)
+    with open(weights_file, 'wb') as f:
+        np.savez(f, **arrays)
+
+
+def load_quantized_model(weights_file, params_file):
+    """Loads a model saved by `quantize_model`.
+
+    Args:
+        weights_file: path to the weights (.npz).
+        params_file: path to the model config (.json).
+
+    Returns:
+        Keras model.
+    """
+    with open(params_file) as f:
+        model = model_from_json(f.read(), custom_objects=CUSTOM_OBJECTS)
+
+    with np.load(weights_file) as arrays:
+        keys = set(arrays.files)
+        for layer in model.layers:
+            weights = []
+            for i in range(len(layer.weights)):
+                key = '{}:{}'.format(layer.name, i)
+                w = arrays[key]
+                if key + ':scale' in keys:
+                    w = w.astype('float32') * arrays[key + ':scale']
+                weights.append(w)
+            if weights:
+                layer.set_weights(weights)
+
+    return model
+
+
+def save_mapped_model(model, weights_file):
+    """Saves a model to a single file whose embeddings can be memory-mapped.
+
+    Load it with `load_mapped_model`.
+
+    Args:
+        model: Keras model.
+        weights_file: path to write the model config and weights to.
+    """
+    config = json.loads(model.to_json())
+    for layer in _replace_embeddings(config, 'MappedEmbedding'):
+        layer['config']['key'] = '{}:0'.format(layer['name'])
+
+    arrays = {}
+    for layer in model.layers:
+        for i, w in enumerate(layer.get_weights()):
+            arrays['{}:{}'.format(layer.name, i)] = w
+    save_arrays(weights_file, arrays, metadata={'model': config})
+
+
+def load_mapped_model(weights_file):
+    """Loads a model saved by `save_mapped_model`.
+
+    Embedding layers become `MappedEmbedding`, which gather rows from a
+    read-only memory map of the file. Every process and model loading the
+    same file shares the pages of those matrices, and so do processes forked
+    after loading. The other, small weights are copied into the model.
+
+    Args:
+        weights_file: path to the file.
+
+    Returns:
+        Keras model.
+    """
+    arrays, metadata = open_arrays(weights_file)
+    config = json.loads(json.dumps(metadata['model']))
+    for layer in config['config']['layers']:
+        if layer['class_name'] == 'MappedEmbedding':
+            layer['config']['weights_file'] = os.path.abspath(weights_file)
+
+    model = model_from_json(json.dumps(config), custom_objects=CUSTOM_OBJECTS)
+    for layer in model.layers:
+        weights = [arrays['{}:{}'.format(layer.name, i)] for i in range(len(layer.weights))]
+        if weights:
+            layer.set_weights(weights)
 
     return model
 
 
+def _replace_embeddings(config, class_name):
+    layers = [layer for layer in config['config']['layers'] if layer['class_name'] == 'Embedding']
+    for layer in layers:
+        layer['class_name'] = class_name
+        layer['config'] = {k: v for k, v in layer['config'].items()
+                           if k in ('name', 'trainable', 'batch_input_shape', 'dtype',
+                                    'input_dim', 'output_dim', 'mask_zero', 'input_length')}
+    return layers
+
+
+def _is_kernel_layer(layer):
+    while hasattr(layer, 'layer'):
+        layer = layer.layer
+    return isinstance(layer, (Dense, LSTM))
+
+
+def freeze_model(model, graph_file, signature_file):
+    """Exports a frozen, inference-only graph of a model.
+
+    The model is rebuilt in the test phase, so that the CRF output is the
+    Viterbi decoding and dropout is gone, and its variables are folded into
+    constants. Nodes only used for training are stripped.
+
+    Args:
+        model: Keras model.
+        graph_file: path to write the frozen GraphDef to.
+        signature_file: path to write the input and output tensor names to.
+    """
+    tf = K.tf
+    config = model.to_json()
+    weights = model.get_weights()
+
+    prev_session = K.get_session()
+    graph = tf.Graph()
+    session = tf.Session(graph=graph)
+    try:
+        with graph.as_default():
+            K.set_session(session)
+            K.set_learning_phase(0)
+            frozen = model_from_json(config, custom_objects=CUSTOM_OBJECTS)
+            frozen.set_weights(weights)
+            inputs = [t.name for t in frozen.inputs]
+            outputs = [t.name for t in frozen.outputs]
+            output_nodes = [t.op.name for t in frozen.outputs]
+            graph_def = tf.graph_util.convert_variables_to_constants(
+                session, graph.as_graph_def(), output_nodes)
+            graph_def = tf.graph_util.remove_training_nodes(graph_def, protected_nodes=output_nodes)
+    finally:
+        K.set_session(prev_session)
+        session.close()
+
+    with open(graph_file, 'wb') as f:
+        f.write(graph_def.SerializeToString())
+    with open(signature_file, 'w') as f:
+        json.dump({'inputs': inputs, 'outputs': outputs}, f, indent=4)
+
+
+def load_frozen_model(graph_file, signature_file):
+    """Loads a model exported by `freeze_model`.
+
+    Args:
+        graph_file: path to the frozen GraphDef.
+        signature_file: path to the input and output tensor names.
+
+    Returns:
+        FrozenModel.
+    """
+    graph_def = K.tf.GraphDef()
+    with open(graph_file, 'rb') as f:
+        graph_def.ParseFromString(f.read())
+    with open(signature_file) as f:
+        signature = json.load(f)
+
+    return FrozenModel(graph_def, signature['inputs'], signature['outputs'])
+
+
+class FrozenModel(object):
+    """An inference-only model running a frozen graph in its own session.
+
+    It has the `predict` method of Keras models, so that it can be used
+    in place of one by `Tagger` and `Sequence`.
+
+    Attributes:
+        graph: tf.Graph.
+        session: tf.Session.
+        inputs: list of input tensors.
+        outputs: list of output tensors.
+    """
+
+    def __init__(self, graph_def, inputs, outputs):
+        tf = K.tf
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            tf.import_graph_def(graph_def, name='')
+        self.session = tf.Session(graph=self.graph)
+        self.inputs = [self.graph.get_tensor_by_name(name) for name in inputs]
+        self.outputs = [self.graph.get_tensor_by_name(name) for name in outputs]
+
+    def predict(self, x, batch_size=None):
+        """Generates output predictions for the input samples.
+
+        Args:
+            x: numpy array or list of numpy arrays, one for each input.
+            batch_size: int. If given, samples are run in batches of this size.
+
+        Returns:
+            numpy array, or list of arrays for several outputs.
+        """
+        x = x if isinstance(x, list) else [x]
+        size = len(x[0])
+        batch_size = batch_size or size
+        batches = []
+        for i in range(0, size, batch_size):
+            feed_dict = {t: v[i: i + batch_size] for t, v in zip(self.inputs, x)}
+            batches.append(self.session.run(self.outputs, feed_dict=feed_dict))
+        y = [np.concatenate(ys) for ys in zip(*batches)]
+
+        return y[0] if len(y) == 1 else y
+
+
+def build_char_encoder(char_ids, char_vocab_size, char_embedding_dim, encoder='lstm',
+                       lstm_size=25, filters=50, kernel_size=3):
+    """Builds character-based word embeddings.
+
+    Args:
+        char_ids: tensor of character ids, shape (batch, words, chars).
+        char_vocab_size (int): character vocabulary size.
+        char_embedding_dim (int): character embedding dimensions.
+        encoder (str): 'lstm' runs a BiLSTM over the characters of each word.
+            'cnn' runs a convolution and max-pools it over the characters,
+            which is parallel over characters and much faster on CPU.
+        lstm_size (int): character LSTM output dimensions.
+        filters (int): number of filters of the character CNN.
+        kernel_size (int): window size of the character CNN.
+
+    Returns:
+        tensor of shape (batch, words, 2 * lstm_size) or (batch, words, filters).
+    """
+    if encoder == 'lstm':
+        char_embeddings = Embedding(input_dim=char_vocab_size,
+                                    output_dim=char_embedding_dim,
+                                    mask_zero=True,
+                                    name='char_embedding')(char_ids)
+        return TimeDistributed(Bidirectional(LSTM(lstm_size)))(char_embeddings)
+    elif encoder == 'cnn':
+        # Padding characters are masked, so a word's vector does not depend
+        # on how far its batch pads the characters.
+        char_embeddings = Embedding(input_dim=char_vocab_size,
+                                    output_dim=char_embedding_dim,
+                                    mask_zero=True,
+                                    name='char_embedding')(char_ids)
+        char_embeddings = TimeDistributed(MaskedConv1D(filters, kernel_size,
+                                                       padding='same', activation='relu'))(char_embeddings)
+        return TimeDistributed(MaskedGlobalMaxPooling1D())(char_embeddings)
+    else:
+        raise ValueError('Unknown char_encoder: {}'.format(encoder))
+
+
+def build_idcnn_encoder(word_embeddings, filters=200, kernel_size=3, dilations=(1, 2, 4),
+                        iterations=4, dropout=0.5):
+    """Builds an iterated dilated CNN word encoder.
+
+    A block of convolutions with growing dilation is applied `iterations`
+    times with shared weights, so the receptive field grows exponentially
+    within a block and linearly with iterations, while every step is computed
+    in parallel.
+
+    References
+    --
+    Emma Strubell, Patrick Verga, David Belanger, Andrew McCallum.
+    "Fast and Accurate Entity Recognition with Iterated Dilated Convolutions". EMNLP 2017.
+    https://arxiv.org/abs/1702.02098
+
+    Args:
+        word_embeddings: masked tensor of shape (batch, words, features).
+        filters (int): number of filters of each convolution.
+        kernel_size (int): window size of each convolution.
+        dilations (tuple): dilation rates of the convolutions in a block.
+        iterations (int): number of times the block is applied.
+        dropout (float): dropout rate between blocks.
+
+    Returns:
+        masked tensor of shape (batch, words, filters).
+    """
+    z = MaskedConv1D(filters, kernel_size, padding='same', activation='relu')(word_embeddings)
+    block = [MaskedConv1D(filters, kernel_size, padding='same', dilation_rate=rate, activation='relu')
+             for rate in dilations]
+    for _ in range(iterations):
+        for conv in block:
+            z = conv(z)
+        z = Dropout(dropout)(z)
+
+    return z
+
+
 class BiLSTMCRF(object):
     """A Keras implementation of BiLSTM-CRF for sequence labeling.
 
@@ -47,7 +383,14 @@ class BiLSTMCRF(object):
                  dropout=0.5,
                  embeddings=None,
                  use_char=True,
-                 use_crf=True):
+                 use_crf=True,
+                 char_encoder='lstm',
+                 char_filters=50,
+                 char_kernel_size=3,
+                 encoder='bilstm',
+                 idcnn_filters=200,
+                 idcnn_iterations=4,
+                 crf_options=None):
         """Build a Bi-LSTM CRF model.
 
         Args:
@@ -63,8 +406,22 @@ class BiLSTMCRF(object):
             embeddings (numpy array): word embedding matrix.
             use_char (boolean): add char feature.
             use_crf (boolean): use crf as last layer.
+            char_encoder (str): 'lstm' for a character BiLSTM or 'cnn' for a
+                convolution max-pooled over the characters of each word.
+            char_filters (int): number of filters of the character CNN.
+            char_kernel_size (int): window size of the character CNN.
+            encoder (str): word encoder, 'bilstm' or 'idcnn' for an iterated
+                dilated CNN, which is parallel over the words of a sentence.
+            idcnn_filters (int): number of filters of the dilated CNN.
+            idcnn_iterations (int): number of times the dilated block is applied.
+            crf_options (dict): keyword arguments of the `CRF` layer, e.g.
+                `{'parallel': True}`.
         """
         super(BiLSTMCRF).__init__()
+        if char_encoder not in ('lstm', 'cnn'):
+            raise ValueError('Unknown char_encoder: {}'.format(char_encoder))
+        if encoder not in ('bilstm', 'idcnn'):
+            raise ValueError('Unknown encoder: {}'.format(encoder))
         self._char_embedding_dim = char_embedding_dim
         self._word_embedding_dim = word_embedding_dim
         self._char_lstm_size = char_lstm_size
@@ -77,8 +434,31 @@ class BiLSTMCRF(object):
         self._use_crf = use_crf
         self._embeddings = embeddings
         self._num_labels = num_labels
+        self._char_encoder = char_encoder
+        self._char_filters = char_filters
+        self._char_kernel_size = char_kernel_size
+        self._encoder = encoder
+        self._idcnn_filters = idcnn_filters
+        self._idcnn_iterations = idcnn_iterations
+        self._crf_options = crf_options or {}
 
     def build(self):
+        inputs, z = self._build_encoder()
+        z = Dense(self._fc_dim, activation='tanh')(z)
+
+        if self._use_crf:
+            crf = CRF(self._num_labels, sparse_target=False, **self._crf_options)
+            loss = crf.loss_function
+            pred = crf(z)
+        else:
+            loss = 'categorical_crossentropy'
+            pred = Dense(self._num_labels, activation='softmax')(z)
+
+        model = Model(inputs=inputs, outputs=pred)
+
+        return model, loss
+
+    def _build_encoder(self):
         # build word embedding
         word_ids = Input(batch_shape=(None, None), dtype='int32', name='word_input')
         inputs = [word_ids]
@@ -98,28 +478,59 @@ class BiLSTMCRF(object):
         if self._use_char:
             char_ids = Input(batch_shape=(None, None, None), dtype='int32', name='char_input')
             inputs.append(char_ids)
-            char_embeddings = Embedding(input_dim=self._char_vocab_size,
-                                        output_dim=self._char_embedding_dim,
-                                        mask_zero=True,
-                                        name='char_embedding')(char_ids)
-            char_embeddings = TimeDistributed(Bidirectional(LSTM(self._char_lstm_size)))(char_embeddings)
+            char_embeddings = build_char_encoder(char_ids, self._char_vocab_size, self._char_embedding_dim,
+                                                 self._char_encoder, self._char_lstm_size,
+                                                 self._char_filters, self._char_kernel_size)
             word_embeddings = Concatenate()([word_embeddings, char_embeddings])
 
         word_embeddings = Dropout(self._dropout)(word_embeddings)
-        z = Bidirectional(LSTM(units=self._word_lstm_size, return_sequences=True))(word_embeddings)
-        z = Dense(self._fc_dim, activation='tanh')(z)
-
-        if self._use_crf:
-            crf = CRF(self._num_labels, sparse_target=False)
-            loss = crf.loss_function
-            pred = crf(z)
+        if self._encoder == 'bilstm':
+            z = Bidirectional(LSTM(units=self._word_lstm_size, return_sequences=True))(word_embeddings)
         else:
-            loss = 'categorical_crossentropy'
-            pred = Dense(self._num_labels, activation='softmax')(z)
+            z = build_idcnn_encoder(word_embeddings, self._idcnn_filters,
+                                    iterations=self._idcnn_iterations, dropout=self._dropout)
 
-        model = Model(inputs=inputs, outputs=pred)
+        return inputs, z
 
-        return model, loss
+
+class MultiTaskBiLSTMCRF(BiLSTMCRF):
+    """BiLSTM-CRF with one output head for each of several label sets.
+
+    The word and character embeddings and the word encoder are shared, and
+    each task has its own fully-connected layer and CRF (or softmax), so all
+    the label sets are predicted with a single forward pass.
+    """
+
+    def __init__(self, num_labels, word_vocab_size, task_names=None, **kwargs):
+        """Build a multi-task Bi-LSTM CRF model.
+
+        Args:
+            num_labels (list): number of labels of each task.
+            word_vocab_size (int): word vocabulary size.
+            task_names (list): names of the tasks, used to name their layers.
+            kwargs: other arguments of `BiLSTMCRF`.
+        """
+        super(MultiTaskBiLSTMCRF, self).__init__(list(num_labels), word_vocab_size, **kwargs)
+        self._task_names = task_names or ['task{}'.format(i) for i in range(len(num_labels))]
+
+    def build(self):
+        inputs, z = self._build_encoder()
+
+        preds = []
+        losses = []
+        for name, num_labels in zip(self._task_names, self._num_labels):
+            h = Dense(self._fc_dim, activation='tanh', name='{}_dense'.format(name))(z)
+            if self._use_crf:
+                crf = CRF(num_labels, sparse_target=False, name='{}_crf'.format(name), **self._crf_options)
+                losses.append(crf.loss_function)
+                preds.append(crf(h))
+            else:
+                losses.append('categorical_crossentropy')
+                preds.append(Dense(num_labels, activation='softmax', name='{}_output'.format(name))(h))
+
+        model = Model(inputs=inputs, outputs=preds)
+
+        return model, losses
 
 
 class ELModel(object):
@@ -137,7 +548,10 @@ class ELModel(object):
                  char_lstm_size=25,
                  fc_dim=100,
                  dropout=0.5,
-                 embeddings=None):
+                 embeddings=None,
+                 char_encoder='lstm',
+                 char_filters=50,
+                 char_kernel_size=3):
         """Build a Bi-LSTM CRF model.
 
         Args:
@@ -151,7 +565,13 @@ class ELModel(object):
             fc_dim (int): output fully-connected layer size.
             dropout (float): dropout rate.
             embeddings (numpy array): word embedding matrix.
+            char_encoder (str): 'lstm' for a character BiLSTM or 'cnn' for a
+                convolution max-pooled over the characters of each word.
+            char_filters (int): number of filters of the character CNN.
+            char_kernel_size (int): window size of the character CNN.
         """
+        if char_encoder not in ('lstm', 'cnn'):
+            raise ValueError('Unknown char_encoder: {}'.format(char_encoder))
         self._char_embedding_dim = char_embedding_dim
         self._word_embedding_dim = word_embedding_dim
         self._char_lstm_size = char_lstm_size
@@ -162,6 +582,9 @@ class ELModel(object):
         self._dropout = dropout
         self._embeddings = embeddings
         self._num_labels = num_labels
+        self._char_encoder = char_encoder
+        self._char_filters = char_filters
+        self._char_kernel_size = char_kernel_size
 
     def build(self):
         # build word embedding
@@ -180,11 +603,9 @@ class ELModel(object):
 
         # build character based word embedding
         char_ids = Input(batch_shape=(None, None, None), dtype='int32', name='char_input')
-        char_embeddings = Embedding(input_dim=self._char_vocab_size,
-                                    output_dim=self._char_embedding_dim,
-                                    mask_zero=True,
-                                    name='char_embedding')(char_ids)
-        char_embeddings = TimeDistributed(Bidirectional(LSTM(self._char_lstm_size)))(char_embeddings)
+        char_embeddings = build_char_encoder(char_ids, self._char_vocab_size, self._char_embedding_dim,
+                                             self._char_encoder, self._char_lstm_size,
+                                             self._char_filters, self._char_kernel_size)
 
         elmo_embeddings = Input(shape=(None, 1024), dtype='float32')
 
@@ -5,11 +5,8 @@ Preprocessors.
 import re
 
 import numpy as np
-from allennlp.modules.elmo import Elmo, batch_to_ids
 from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.externals import joblib
-from keras.utils.np_utils import to_categorical
-from keras.preprocessing.sequence import pad_sequences
 
 from anago.utils import Vocabulary
 
@@ -88,7 +85,7 @@ class IndexTransformer(BaseEstimator, TransformerMixin):
             y: label id matrix.
         """
         word_ids = [self._word_vocab.doc2id(doc) for doc in X]
-        word_ids = pad_sequences(word_ids, padding='post')
+        word_ids = pad_sequences(word_ids)
 
         if self._use_char:
             char_ids = [[self._char_vocab.doc2id(w) for w in doc] for doc in X]
@@ -99,15 +96,8 @@ class IndexTransformer(BaseEstimator, TransformerMixin):
 
         if y is not None:
             y = [self._label_vocab.doc2id(doc) for doc in y]
-            y = pad_sequences(y, padding='post')
-            y = to_categorical(y, self.label_size).astype(int)
-            # In 2018/06/01, to_categorical is a bit strange.
-            # >>> to_categorical([[1,3]], num_classes=4).shape
-            # (1, 2, 4)
-            # >>> to_categorical([[1]], num_classes=4).shape
-            # (1, 4)
-            # So, I expand dimensions when len(y.shape) == 2.
-            y = y if len(y.shape) == 3 else np.expand_dims(y, axis=0)
+            y = pad_sequences(y)
+            y = np.eye(self.label_size, dtype=int)[y]
             return features, y
         else:
             return features
@@ -127,22 +117,19 @@ class IndexTransformer(BaseEstimator, TransformerMixin):
         """
         return self.fit(X, y).transform(X, y)
 
-    def inverse_transform(self, y, lengths=None):
+    def inverse_transform(self, y, lengths=None, return_ids=False):
         """Return label strings.
 
         Args:
-            y: label id matrix.
-            lengths: sentences length.
+            y: label id matrix of shape (n_samples, sent_length), or label
+                scores (e.g. one-hot) of shape (n_samples, sent_length, label_size).
+            lengths: sentences length. Labels past them are dropped.
+            return_ids: boolean. Whether to return label ids instead of strings.
 
         Returns:
-            list: list of list of strings.
+            list: list of list of strings, or list of int arrays if `return_ids`.
         """
-        y = np.argmax(y, -1)
-        inverse_y = [self._label_vocab.id2doc(ids) for ids in y]
-        if lengths is not None:
-            inverse_y = [iy[:l] for iy, l in zip(inverse_y, lengths)]
-
-        return inverse_y
+        return inverse_labels(y, self._label_vocab, lengths, return_ids)
 
     @property
     def word_vocab_size(self):
@@ -166,6 +153,153 @@ class IndexTransformer(BaseEstimator, TransformerMixin):
         return p
 
 
+class MultiLabelIndexTransformer(IndexTransformer):
+    """Convert documents labeled with several label sets to id matrices.
+
+    Words and characters are indexed as in `IndexTransformer`, and each label
+    set (e.g. named entities and chunks) has its own label vocabulary. The
+    labels of a sentence are a tuple with a tag list for each task.
+
+    Attributes:
+        task_names: list of str. Names of the label sets, in label tuple order.
+        _label_vocabs: list of label vocabularies, one for each task.
+    """
+
+    def __init__(self, task_names, lower=True, num_norm=True,
+                 use_char=True, initial_vocab=None):
+        """Create a preprocessor object.
+
+        Args:
+            task_names: list of str. Names of the label sets.
+            lower: boolean. Whether to convert the texts to lowercase.
+            use_char: boolean. Whether to use char feature.
+            num_norm: boolean. Whether to normalize text.
+            initial_vocab: Iterable. Initial vocabulary for expanding word_vocab.
+        """
+        super(MultiLabelIndexTransformer, self).__init__(lower, num_norm, use_char, initial_vocab)
+        self.task_names = list(task_names)
+        self._label_vocab = None
+        self._label_vocabs = [Vocabulary(lower=False, unk_token=False) for _ in self.task_names]
+
+    def fit(self, X, y):
+        """Learn vocabularies from training set.
+
+        Args:
+            X : iterable. An iterable which yields either str, unicode or file objects.
+            y : iterable of tuples of label lists, one for each task.
+
+        Returns:
+            self : MultiLabelIndexTransformer.
+        """
+        self._word_vocab.add_documents(X)
+        for vocab, docs in zip(self._label_vocabs, zip(*y)):
+            vocab.add_documents(docs)
+            vocab.build()
+        if self._use_char:
+            for doc in X:
+                self._char_vocab.add_documents(doc)
+
+        self._word_vocab.build()
+        self._char_vocab.build()
+
+        return self
+
+    def transform(self, X, y=None):
+        """Transform documents to document ids.
+
+        Args:
+            X : iterable
+            an iterable which yields either str, unicode or file objects.
+            y : iterable of tuples of label lists, one for each task.
+
+        Returns:
+            features: document id matrix.
+            y: list of label id matrices, one for each task.
+        """
+        features = super(MultiLabelIndexTransformer, self).transform(X)
+        if y is None:
+            return features
+
+        y_tasks = []
+        for vocab, docs in zip(self._label_vocabs, zip(*y)):
+            ids = pad_sequences([vocab.doc2id(doc) for doc in docs])
+            y_tasks.append(np.eye(len(vocab), dtype=int)[ids])
+
+        return features, y_tasks
+
+    def inverse_transform(self, y, lengths=None, return_ids=False):
+        """Return label strings for each task.
+
+        Args:
+            y: list of label id or score matrices, one for each task.
+            lengths: sentences length. Labels past them are dropped.
+            return_ids: boolean. Whether to return label ids instead of strings.
+
+        Returns:
+            list: for each task, the output of `IndexTransformer.inverse_transform`.
+        """
+        lengths = list(lengths) if lengths is not None else None
+
+        return [inverse_labels(y_task, vocab, lengths, return_ids)
+                for y_task, vocab in zip(y, self._label_vocabs)]
+
+    @property
+    def label_size(self):
+        return [len(vocab) for vocab in self._label_vocabs]
+
+
+def inverse_labels(y, label_vocab, lengths=None, return_ids=False):
+    """Converts label ids or scores to label strings.
+
+    Args:
+        y: label id matrix of shape (n_samples, sent_length), or label
+            scores of shape (n_samples, sent_length, label_size).
+        label_vocab: Vocabulary of the labels.
+        lengths: sentences length. Labels past them are dropped.
+        return_ids: boolean. Whether to return label ids instead of strings.
+
+    Returns:
+        list: list of list of strings, or list of int arrays if `return_ids`.
+    """
+    y = np.asarray(y)
+    if y.ndim == 3:
+        y = np.argmax(y, -1)
+    if lengths is None:
+        lengths = np.full(len(y), y.shape[1])
+    else:
+        lengths = np.minimum(np.fromiter(lengths, dtype='int64'), y.shape[1])
+
+    if return_ids:
+        return [ids[:l] for ids, l in zip(y, lengths)]
+
+    # Look up the labels of all the words at once, skipping padding.
+    mask = np.arange(y.shape[1]) < lengths[:, None]
+    labels = np.array(label_vocab.reverse_vocab, dtype=object)
+    labels = labels[y[mask]].tolist()
+    ends = np.cumsum(lengths).tolist()
+    inverse_y = [labels[end - l: end] for end, l in zip(ends, lengths.tolist())]
+
+    return inverse_y
+
+
+def pad_sequences(sequences, dtype='int32'):
+    """Pads sequences with zeros at the end to the same length.
+
+    Args:
+        sequences: List of lists of ints.
+        dtype: Type of the output sequences.
+
+    Returns:
+        x: Numpy array of shape (len(sequences), max length).
+    """
+    max_len = max((len(seq) for seq in sequences), default=0)
+    x = np.zeros((len(sequences), max_len), dtype=dtype)
+    for i, seq in enumerate(sequences):
+        x[i, :len(seq)] = seq
+
+    return x
+
+
 def pad_nested_sequences(sequences, dtype='int32'):
     """Pads nested sequences to the same length.
 
@@ -199,6 +333,8 @@ class ELMoTransformer(IndexTransformer):
     def __init__(self, lower=True, num_norm=True,
                  use_char=True, initial_vocab=None):
         super(ELMoTransformer, self).__init__(lower, num_norm, use_char, initial_vocab)
+        from allennlp.modules.elmo import Elmo
+
         self._elmo = Elmo(options_file, weight_file, 2, dropout=0)
 
     def transform(self, X, y=None):
@@ -216,11 +352,13 @@ class ELMoTransformer(IndexTransformer):
             y: label id matrix.
         """
         word_ids = [self._word_vocab.doc2id(doc) for doc in X]
-        word_ids = pad_sequences(word_ids, padding='post')
+        word_ids = pad_sequences(word_ids)
 
         char_ids = [[self._char_vocab.doc2id(w) for w in doc] for doc in X]
         char_ids = pad_nested_sequences(char_ids)
 
+        from allennlp.modules.elmo import batch_to_ids
+
         character_ids = batch_to_ids(X)
         elmo_embeddings = self._elmo(character_ids)['elmo_representations'][1]
         elmo_embeddings = elmo_embeddings.detach().numpy()
@@ -229,15 +367,8 @@ class ELMoTransformer(IndexTransformer):
 
         if y is not None:
             y = [self._label_vocab.doc2id(doc) for doc in y]
-            y = pad_sequences(y, padding='post')
-            y = to_categorical(y, self.label_size).astype(int)
-            # In 2018/06/01, to_categorical is a bit strange.
-            # >>> to_categorical([[1,3]], num_classes=4).shape
-            # (1, 2, 4)
-            # >>> to_categorical([[1]], num_classes=4).shape
-            # (1, 4)
-            # So, I expand dimensions when len(y.shape) == 2.
-            y = y if len(y.shape) == 3 else np.expand_dims(y, axis=0)
+            y = pad_sequences(y)
+            y = np.eye(self.label_size, dtype=int)[y]
             return features, y
         else:
             return features
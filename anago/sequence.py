@@ -0,0 +1,34 @@
+"""
+Batches of training data for Keras.
+
+It lives apart from `anago.utils`, so that importing the utilities does not
+import Keras.
+"""
+import math
+
+from keras.utils import Sequence
+
+
+class NERSequence(Sequence):
+    """Batches of preprocessed sentences.
+
+    `__getitem__` only reads its data, so batches can be prepared by
+    several threads or processes (`workers` and `use_multiprocessing` of
+    `fit_generator`). `preprocess` must then be picklable, e.g. a
+    transformer's `transform` method.
+    """
+
+    def __init__(self, x, y, batch_size=1, preprocess=None):
+        self.x = x
+        self.y = y
+        self.batch_size = batch_size
+        self.preprocess = preprocess
+
+    def __getitem__(self, idx):
+        batch_x = self.x[idx * self.batch_size: (idx + 1) * self.batch_size]
+        batch_y = self.y[idx * self.batch_size: (idx + 1) * self.batch_size]
+
+        return self.preprocess(batch_x, batch_y)
+
+    def __len__(self):
+        return math.ceil(len(self.x) / self.batch_size)
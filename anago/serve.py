@@ -0,0 +1,321 @@
+"""
+HTTP serving entry point.
+
+Usage:
+    python -m anago.serve --weights weights.h5 --params params.json --preprocessor preprocessor.pickle
+
+Endpoints:
+    POST /analyze        {"text": "..."} -> response of `Tagger.analyze`.
+    POST /analyze/batch  {"texts": ["...", ...]} -> {"results": [...]}.
+    GET  /ready          200 once the model is warmed up, 503 before or
+                         if the warm-up failed. `?timeout=seconds` waits
+                         for the warm-up.
+    GET  /metrics        QPS, batch sizes and latency percentiles.
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from concurrent.futures import Future, TimeoutError
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from anago.tagger import Tagger, analyze_batch_safely
+from anago.wrapper import Sequence
+
+
+class Metrics(object):
+    """Thread-safe request and batch statistics.
+
+    Attributes:
+        window: int, number of recent requests kept for latency percentiles.
+    """
+
+    def __init__(self, window=10000):
+        self._lock = threading.Lock()
+        self._start = time.time()
+        self._requests = 0
+        self._errors = 0
+        self._latencies = deque(maxlen=window)
+        self._batch_sizes = Counter()
+
+    def record_request(self, latency, error=False):
+        with self._lock:
+            self._requests += 1
+            self._errors += int(error)
+            self._latencies.append((time.time(), latency))
+
+    def record_batch(self, size):
+        with self._lock:
+            self._batch_sizes[size] += 1
+
+    def snapshot(self):
+        """Returns the statistics as a JSON-serializable dict."""
+        with self._lock:
+            now = time.time()
+            uptime = now - self._start
+            latencies = np.array([l for _, l in self._latencies])
+            recent = sum(1 for t, _ in self._latencies if now - t <= 60)
+            batches = sum(self._batch_sizes.values())
+            texts = sum(size * n for size, n in self._batch_sizes.items())
+            res = {
+                'uptime': uptime,
+                'requests': self._requests,
+                'errors': self._errors,
+                'qps': self._requests / uptime if uptime else 0.,
+                'qps_1m': recent / min(uptime, 60) if uptime else 0.,
+                'batches': batches,
+                'batch_size': {
+                    'mean': texts / batches if batches else 0.,
+                    'max': max(self._batch_sizes) if batches else 0,
+                    'histogram': {str(size): n for size, n in sorted(self._batch_sizes.items())}
+                },
+                'latency_ms': {}
+            }
+            if len(latencies):
+                for q in (50, 90, 99):
+                    res['latency_ms']['p{}'.format(q)] = float(np.percentile(latencies, q)) * 1000
+                res['latency_ms']['max'] = float(latencies.max()) * 1000
+
+        return res
+
+
+class BatchingWorker(object):
+    """Coalesces texts submitted from many threads into batches for a Tagger.
+
+    Attributes:
+        tagger: Tagger.
+        max_batch_size: int, maximum number of texts in a batch.
+        max_wait: float, seconds to wait for more texts after the first one.
+        num_workers: int, number of threads running batches.
+        metrics: Metrics.
+    """
+
+    def __init__(self, tagger, max_batch_size=32, max_wait=0.005, num_workers=1, metrics=None):
+        self.tagger = tagger
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.metrics = metrics
+        self._queue = queue.Queue()
+        self._threads = [threading.Thread(target=self._run, daemon=True) for _ in range(num_workers)]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, text):
+        """Queues a text for analysis.
+
+        Returns:
+            concurrent.futures.Future: resolves to the response dict.
+        """
+        future = Future()
+        self._queue.put((text, future))
+
+        return future
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.time()
+            try:
+                if timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if self.metrics:
+                self.metrics.record_batch(len(batch))
+            results = analyze_batch_safely(self.tagger, [text for text, _ in batch])
+            for (_, future), res in zip(batch, results):
+                if isinstance(res, Exception):
+                    future.set_exception(res)
+                else:
+                    future.set_result(res)
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        app = self.server.app
+        url = urlparse(self.path)
+        if url.path == '/ready':
+            timeout = float(parse_qs(url.query).get('timeout', [0])[0])
+            ready = app.ready.wait(timeout)
+            if app.error is not None:
+                self._send(503, {'ready': False, 'error': app.error})
+            else:
+                self._send(200 if ready else 503, {'ready': ready})
+        elif url.path == '/metrics':
+            self._send(200, app.metrics.snapshot())
+        else:
+            self._send(404, {'error': 'Not found: {}'.format(url.path)})
+
+    def do_POST(self):
+        app = self.server.app
+        url = urlparse(self.path)
+        if url.path not in ('/analyze', '/analyze/batch'):
+            self._send(404, {'error': 'Not found: {}'.format(url.path)})
+            return
+
+        start = time.time()
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length).decode('utf-8'))
+            if url.path == '/analyze':
+                texts = [body['text']]
+            else:
+                texts = body['texts']
+            if not all(isinstance(text, str) for text in texts):
+                raise TypeError('texts must be strings.')
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {'error': 'Bad request: {}'.format(e)})
+            app.metrics.record_request(time.time() - start, error=True)
+            return
+
+        try:
+            futures = [app.worker.submit(text) for text in texts]
+            deadline = start + app.timeout
+            results = [future.result(max(deadline - time.time(), 0)) for future in futures]
+        except TimeoutError:
+            self._send(503, {'error': 'Timed out after {} seconds.'.format(app.timeout)})
+            app.metrics.record_request(time.time() - start, error=True)
+            return
+        except Exception as e:
+            self._send(500, {'error': str(e)})
+            app.metrics.record_request(time.time() - start, error=True)
+            return
+
+        if url.path == '/analyze':
+            self._send(200, results[0])
+        else:
+            self._send(200, {'results': results})
+        app.metrics.record_request(time.time() - start)
+
+    def _send(self, status, obj):
+        body = json.dumps(obj).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.app.verbose:
+            super(RequestHandler, self).log_message(format, *args)
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class Application(object):
+    """Serving state shared by the request handlers.
+
+    Attributes:
+        tagger: Tagger.
+        metrics: Metrics.
+        worker: BatchingWorker.
+        ready: threading.Event, set once the model is warmed up, or failed to.
+        error: string, why the warm-up failed. None if it did not.
+        timeout: float, seconds a request waits for its results.
+    """
+
+    def __init__(self, tagger, num_workers=1, max_batch_size=32, max_wait=0.005,
+                 warmup=True, timeout=30., verbose=False):
+        self.tagger = tagger
+        self.metrics = Metrics()
+        self.worker = BatchingWorker(tagger, max_batch_size, max_wait, num_workers, self.metrics)
+        self.ready = threading.Event()
+        self.error = None
+        self.timeout = timeout
+        self.verbose = verbose
+        self._warmup = warmup
+
+    def warmup(self):
+        try:
+            if self._warmup:
+                batch_sizes = sorted({1, self.worker.max_batch_size})
+                self.tagger.warmup(batch_sizes=batch_sizes)
+        except Exception as e:
+            traceback.print_exc()
+            self.error = 'Warm-up failed: {!r}'.format(e)
+        finally:
+            # Requests would block forever without the workers.
+            self.worker.start()
+            self.ready.set()
+
+
+def make_server(tagger, host='127.0.0.1', port=8080, **kwargs):
+    """Creates an HTTP server for a tagger and starts warming it up.
+
+    Args:
+        tagger: Tagger.
+        host: string, address to bind.
+        port: int, port to bind. 0 picks a free port.
+        kwargs: passed to `Application`.
+
+    Returns:
+        ThreadingHTTPServer: call `serve_forever` to start serving.
+    """
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.app = Application(tagger, **kwargs)
+    threading.Thread(target=server.app.warmup, daemon=True).start()
+
+    return server
+
+
+def main(args):
+    print('Loading objects...')
+    model = Sequence.load(args.weights, args.params, args.preprocessor)
+    buckets = [int(b) for b in args.buckets.split(',')] if args.buckets else None
+    tagger = Tagger(model.model, preprocessor=model.p, buckets=buckets)
+
+    server = make_server(tagger, args.host, args.port,
+                         num_workers=args.workers,
+                         max_batch_size=args.max_batch_size,
+                         max_wait=args.max_wait,
+                         timeout=args.timeout,
+                         verbose=args.verbose)
+    print('Serving on http://{}:{}'.format(*server.server_address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serving a model over HTTP.')
+    parser.add_argument('--weights', required=True)
+    parser.add_argument('--params', required=True)
+    parser.add_argument('--preprocessor', required=True)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=1, help='number of inference threads')
+    parser.add_argument('--max_batch_size', type=int, default=32)
+    parser.add_argument('--max_wait', type=float, default=0.005,
+                        help='seconds to wait for a batch to fill up')
+    parser.add_argument('--timeout', type=float, default=30.,
+                        help='seconds a request waits for its results')
+    parser.add_argument('--buckets', default='8,16,32,64',
+                        help='comma-separated lengths inputs are padded up to, empty to disable')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+    main(args)
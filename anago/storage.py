@@ -0,0 +1,125 @@
+"""
+Single-file storage of numpy arrays that can be memory-mapped.
+
+Layout:
+    magic (8 bytes) | header length (uint64, little-endian) | JSON header |
+    padding | arrays, each aligned to `ALIGNMENT` bytes.
+
+The header maps array names to their dtype, shape and offset from the start of
+the data, and holds a JSON-serializable metadata dict. Arrays are read as
+read-only views of one `np.memmap`, so every process that opens the same file
+shares its pages through the OS page cache.
+"""
+import json
+import os
+import struct
+import threading
+
+import numpy as np
+
+MAGIC = b'ANAGO\x00\x01\n'
+ALIGNMENT = 64
+
+_opened = {}
+_lock = threading.Lock()
+
+
+def _align(n):
+    return -(-n // ALIGNMENT) * ALIGNMENT
+
+
+def save_arrays(path, arrays, metadata=None):
+    """Saves arrays and metadata to a single file.
+
+    The file is written next to `path` and moved into place, so readers see
+    either the old or the new file, never a partial one.
+
+    Args:
+        path: string, file path.
+        arrays: dict of string to numpy array. Object arrays are not supported.
+        metadata: JSON-serializable dict.
+    """
+    arrays = {name: np.asarray(a, order='C') for name, a in arrays.items()}
+    entries = {}
+    offset = 0
+    for name, a in arrays.items():
+        if a.dtype.hasobject:
+            raise ValueError('Cannot store object array: {}'.format(name))
+        entries[name] = {'dtype': a.dtype.str, 'shape': list(a.shape), 'offset': offset}
+        offset = _align(offset + a.nbytes)
+    header = json.dumps({'arrays': entries, 'metadata': metadata or {}}).encode('utf-8')
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    tmp = '{}.tmp{}'.format(path, os.getpid())
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<Q', len(header)))
+            f.write(header)
+            for name, a in arrays.items():
+                f.write(b'\0' * (data_start + entries[name]['offset'] - f.tell()))
+                f.write(a.reshape(-1).view(np.uint8))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def load_arrays(path, mmap=True):
+    """Loads arrays and metadata saved by `save_arrays`.
+
+    Args:
+        path: string, file path.
+        mmap: boolean. If True, arrays are read-only views of a memory map of
+            the file. Otherwise the file is read into memory.
+
+    Returns:
+        tuple of a dict of string to numpy array, and the metadata dict.
+    """
+    if mmap:
+        buf = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        buf = np.fromfile(path, dtype=np.uint8)
+
+    if bytes(buf[:len(MAGIC)]) != MAGIC:
+        raise ValueError('Not an anago weights file: {}'.format(path))
+    header_start = len(MAGIC) + 8
+    header_len, = struct.unpack('<Q', bytes(buf[len(MAGIC):header_start]))
+    header = json.loads(bytes(buf[header_start:header_start + header_len]).decode('utf-8'))
+    data_start = _align(header_start + header_len)
+
+    arrays = {}
+    for name, entry in header['arrays'].items():
+        dtype = np.dtype(entry['dtype'])
+        start = data_start + entry['offset']
+        nbytes = dtype.itemsize * int(np.prod(entry['shape']))
+        arrays[name] = buf[start:start + nbytes].view(dtype).reshape(entry['shape'])
+
+    return arrays, header['metadata']
+
+
+def open_arrays(path):
+    """Memory-maps a file saved by `save_arrays` once per process.
+
+    Later calls with the same file return the same arrays, so that all models
+    and layers of a process share one mapping. A file replaced on disk is
+    mapped again.
+
+    Args:
+        path: string, file path.
+
+    Returns:
+        tuple of a dict of string to numpy array, and the metadata dict.
+    """
+    path = os.path.realpath(path)
+    st = os.stat(path)
+    key = (path, st.st_ino, st.st_mtime_ns)
+    with _lock:
+        if key not in _opened:
+            for old in [k for k in _opened if k[0] == path]:
+                del _opened[old]
+            _opened[key] = load_arrays(path, mmap=True)
+        return _opened[key]
@@ -0,0 +1,218 @@
+"""
+Bulk tagging of large files with several worker processes.
+
+Usage:
+    python -m anago.tag --weights weights.h5 --params params.json --preprocessor preprocessor.pickle \
+        --input sentences.jsonl --output tagged.jsonl --workers 8
+
+Input formats:
+    conll: one word per line (first column), sentences separated by blank lines.
+    jsonl: one JSON object per line, either {"words": [...]} or {"text": "..."}.
+    text:  one whitespace-tokenized sentence per line.
+
+Output is written as `word<TAB>tag` lines (conll) or {"id", "words", "tags"}
+objects (jsonl). The input is streamed and each worker loads the model once.
+In ordered mode a checkpoint is kept next to the output, so an interrupted
+job continues where it stopped with `--resume`.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from collections import deque
+
+_tagger = None
+
+
+def read_sentences(f, fmt):
+    """Yields the words of each sentence in a file.
+
+    Args:
+        f: file object.
+        fmt: string, one of 'conll', 'jsonl' or 'text'.
+
+    Yields:
+        list: words of a sentence. Empty sentences are skipped.
+    """
+    if fmt == 'conll':
+        words = []
+        for line in f:
+            line = line.rstrip()
+            if line:
+                words.append(line.split()[0])
+            elif words:
+                yield words
+                words = []
+        if words:
+            yield words
+    elif fmt == 'jsonl':
+        for line in f:
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            words = obj['words'] if 'words' in obj else obj['text'].split()
+            if words:
+                yield words
+    elif fmt == 'text':
+        for line in f:
+            words = line.split()
+            if words:
+                yield words
+    else:
+        raise ValueError('Unknown format: {}'.format(fmt))
+
+
+def format_sentence(idx, words, tags, fmt):
+    if fmt == 'conll':
+        return ''.join('{}\t{}\n'.format(w, t) for w, t in zip(words, tags)) + '\n'
+    else:
+        return json.dumps({'id': idx, 'words': words, 'tags': tags}) + '\n'
+
+
+def _init_worker(weights_file, params_file, preprocessor_file):
+    # Workers load the model themselves; the parent never imports Keras.
+    global _tagger
+    from anago.tagger import Tagger
+    from anago.wrapper import Sequence
+
+    model = Sequence.load(weights_file, params_file, preprocessor_file)
+    _tagger = Tagger(model.model, preprocessor=model.p)
+
+
+def _tag_batch(batch):
+    idx, sents = batch
+    preds = _tagger._predict_words(sents)
+
+    return idx, [_tagger._get_tags(pred) for pred in preds]
+
+
+def _read_checkpoint(path):
+    if not os.path.exists(path):
+        return {'sentences': 0, 'bytes': 0}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_checkpoint(path, sentences, nbytes):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'sentences': sentences, 'bytes': nbytes}, f)
+    os.replace(tmp, path)
+
+
+def tag_file(args):
+    checkpoint = args.checkpoint or args.output + '.ckpt'
+    state = {'sentences': 0, 'bytes': 0}
+    if args.resume and os.path.exists(args.output):
+        state = _read_checkpoint(checkpoint)
+    elif os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    fin = open(args.input, encoding=args.encoding)
+    fout = open(args.output, 'r+' if state['bytes'] else 'w', encoding='utf-8')
+    # Drop anything written after the last checkpoint.
+    fout.seek(state['bytes'])
+    fout.truncate()
+
+    sents = read_sentences(fin, args.input_format)
+    sents = itertools.islice(sents, state['sentences'], None)
+    batches = ((state['sentences'] + i * args.batch_size, list(batch))
+               for i, batch in enumerate(iter(lambda: list(itertools.islice(sents, args.batch_size)), [])))
+
+    ctx = multiprocessing.get_context('spawn')
+    pool = ctx.Pool(args.workers, initializer=_init_worker,
+                    initargs=(args.weights, args.params, args.preprocessor))
+    max_pending = args.workers * args.prefetch
+    pending = {}
+    done = state['sentences']
+    # Output bytes of the batches written so far, without any partly written batch.
+    committed = state['bytes']
+    start = last_report = last_checkpoint = time.time()
+    tagged = 0
+
+    def write(idx, tags):
+        nonlocal done, tagged, committed, last_report, last_checkpoint
+        words = pending.pop(idx)
+        for i, (w, t) in enumerate(zip(words, tags)):
+            fout.write(format_sentence(idx + i, w, t, args.output_format))
+        done += len(words)
+        tagged += len(words)
+        committed = fout.tell()
+        now = time.time()
+        if args.ordered and now - last_checkpoint >= args.checkpoint_every:
+            fout.flush()
+            os.fsync(fout.fileno())
+            _write_checkpoint(checkpoint, done, committed)
+            last_checkpoint = now
+        if now - last_report >= args.report_every:
+            print('{} sentences, {:.1f} sents/sec'.format(done, tagged / (now - start)),
+                  file=sys.stderr)
+            last_report = now
+
+    try:
+        if args.ordered:
+            results = deque()
+            for idx, batch in batches:
+                pending[idx] = batch
+                results.append(pool.apply_async(_tag_batch, ((idx, batch),)))
+                if len(results) >= max_pending:
+                    write(*results.popleft().get())
+            while results:
+                write(*results.popleft().get())
+        else:
+            results = queue.Queue()
+            for idx, batch in batches:
+                pending[idx] = batch
+                pool.apply_async(_tag_batch, ((idx, batch),),
+                                 callback=results.put, error_callback=results.put)
+                while len(pending) >= max_pending:
+                    res = results.get()
+                    if isinstance(res, Exception):
+                        raise res
+                    write(*res)
+            while pending:
+                res = results.get()
+                if isinstance(res, Exception):
+                    raise res
+                write(*res)
+    finally:
+        pool.terminate()
+        fin.close()
+        fout.flush()
+        if args.ordered:
+            os.fsync(fout.fileno())
+            _write_checkpoint(checkpoint, done, committed)
+        fout.close()
+
+    elapsed = time.time() - start
+    print('Tagged {} sentences in {:.1f} sec, {:.1f} sents/sec'.format(
+        tagged, elapsed, tagged / elapsed if elapsed else 0.), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Tagging a large file with several processes.')
+    parser.add_argument('--weights', required=True)
+    parser.add_argument('--params', required=True)
+    parser.add_argument('--preprocessor', required=True)
+    parser.add_argument('--input', required=True)
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--input_format', choices=['conll', 'jsonl', 'text'], default='conll')
+    parser.add_argument('--output_format', choices=['conll', 'jsonl'], default='conll')
+    parser.add_argument('--encoding', default='utf-8')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--batch_size', type=int, default=64)
+    parser.add_argument('--prefetch', type=int, default=4, help='batches in flight per worker')
+    parser.add_argument('--unordered', dest='ordered', action='store_false',
+                        help='write batches as soon as they are done (not resumable)')
+    parser.add_argument('--checkpoint', default=None, help='default is OUTPUT.ckpt')
+    parser.add_argument('--checkpoint_every', type=float, default=30., help='seconds')
+    parser.add_argument('--report_every', type=float, default=10., help='seconds')
+    parser.add_argument('--resume', action='store_true')
+    args = parser.parse_args()
+    if args.resume and not args.ordered:
+        parser.error('--resume requires ordered output.')
+    tag_file(args)
@@ -1,8 +1,24 @@
 """
 Model API.
 """
+import contextlib
+import copy
+import io
+import itertools
+import re
+import threading
+import time
+from collections import OrderedDict
+
 import numpy as np
-from seqeval.metrics.sequence_labeling import get_entities
+from seqeval.metrics.sequence_labeling import end_of_chunk, start_of_chunk
+
+from anago.utils import EntityDecoder
+
+SENTENCE_END = re.compile(r'[.!?]["\')\]]*$')
+
+# Identifies the model and the preprocessor of a Tagger in its cache keys.
+_TOKENS = itertools.count()
 
 
 class Tagger(object):
@@ -12,12 +28,59 @@ class Tagger(object):
         model: Model.
         preprocessor: Transformer. Preprocessing data for feature extraction.
         tokenizer: Tokenize input sentence. Default tokenizer is `str.split`.
+        cache_size: int. Maximum number of `analyze` responses to cache.
+            0 disables the cache.
+        cache_ttl: float. Seconds before a cached response expires.
+            None means responses never expire.
+        buckets: list of int. If given, inputs are zero-padded up to the
+            smallest bucket length that fits them, so that the model only
+            sees a few input shapes. Lengths beyond the largest bucket are
+            rounded up to a multiple of it.
+        concurrency: int. Maximum number of threads running the model at
+            once. None means no limit. All threads share the same weights.
+
+    A Tagger can be shared by many threads: every prediction runs in the
+    graph and session the model was loaded in.
     """
 
-    def __init__(self, model, preprocessor, tokenizer=str.split):
+    def __init__(self, model, preprocessor, tokenizer=str.split,
+                 cache_size=0, cache_ttl=None, buckets=None, concurrency=None):
         self.model = model
         self.preprocessor = preprocessor
         self.tokenizer = tokenizer
+        self.buckets = sorted(buckets) if buckets else None
+        self._cache = ResultCache(cache_size, cache_ttl) if cache_size else None
+        self._slots = threading.BoundedSemaphore(concurrency) if concurrency else None
+
+        self._session = None
+        if hasattr(model, '_make_predict_function'):
+            import keras.backend as K
+
+            if K.backend() == 'tensorflow':
+                self._session = K.get_session()
+            with self._as_default():
+                # Keras builds the predict function lazily, which is not thread-safe.
+                model._make_predict_function()
+
+    @property
+    def model(self):
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        # Unlike id(model), a token is never reused by a later model.
+        self._model = model
+        self._model_token = next(_TOKENS)
+
+    @property
+    def preprocessor(self):
+        return self._preprocessor
+
+    @preprocessor.setter
+    def preprocessor(self, preprocessor):
+        self._preprocessor = preprocessor
+        self._preprocessor_token = next(_TOKENS)
+        self._decoder = None
 
     def predict_proba(self, text):
         """Probability estimates.
@@ -31,18 +94,97 @@ class Tagger(object):
         Returns:
             y : array-like, shape = [num_words, num_classes]
             Returns the probability of the word for each class in the model,
+            or the label ids, shape = [num_words], if the model has a CRF
+            with `viterbi_output='index'`.
         """
         assert isinstance(text, str)
 
         words = self.tokenizer(text)
-        X = self.preprocessor.transform([words])
-        y = self.model.predict(X)
+        y = self._predict_words([words])
         y = y[0]  # reduce batch dimension.
 
         return y
 
+    def _predict_words(self, sents):
+        """Probability estimates for a batch of tokenized sentences.
+
+        Args:
+            sents: list of list of str, tokenized sentences.
+
+        Returns:
+            list: an array of shape [num_words, num_classes] for each sentence.
+        """
+        y = self._predict_batch(sents)
+
+        return [pred[:len(words)] for pred, words in zip(y, sents)]
+
+    def _predict_batch(self, sents):
+        X = self.preprocessor.transform(sents)
+        if self.buckets:
+            X = self._pad_to_buckets(X)
+
+        return self._predict(X)
+
+    def _predict(self, X):
+        if self._slots is None:
+            with self._as_default():
+                return self.model.predict(X)
+
+        with self._slots, self._as_default():
+            return self.model.predict(X)
+
+    @contextlib.contextmanager
+    def _as_default(self):
+        """Binds the calling thread to the model's graph and session."""
+        if self._session is None:
+            yield
+        else:
+            with self._session.graph.as_default(), self._session.as_default():
+                yield
+
+    def _pad_to_buckets(self, X):
+        """Zero-pads id matrices along every axis but the batch one, and
+        other features (e.g. ELMo embeddings) along the time axis."""
+        features = X if isinstance(X, list) else [X]
+        padded = []
+        for x in features:
+            axes = range(1, x.ndim) if np.issubdtype(x.dtype, np.integer) else [1]
+            pad_width = [(0, 0)] * x.ndim
+            for axis in axes:
+                pad_width[axis] = (0, bucket_length(x.shape[axis], self.buckets) - x.shape[axis])
+            padded.append(np.pad(x, pad_width, 'constant'))
+
+        return padded if isinstance(X, list) else padded[0]
+
+    def warmup(self, lengths=None, word_lengths=None, batch_sizes=(1,)):
+        """Runs the model once on every input shape expected at serving time.
+
+        The first prediction for a new input shape is much slower than the
+        following ones. With `buckets`, warming up every bucket length makes
+        steady-state inference only reuse already-seen shapes.
+
+        Args:
+            lengths: list of int, sentence lengths to run.
+                Defaults to the bucket lengths.
+            word_lengths: list of int, word lengths in characters to run.
+                Defaults to the bucket lengths.
+            batch_sizes: list of int, batch sizes to run.
+        """
+        lengths = lengths or self.buckets or [10]
+        word_lengths = word_lengths or self.buckets or [5]
+        X = self.preprocessor.transform([['a']])
+        features = X if isinstance(X, list) else [X]
+        if not any(np.issubdtype(x.dtype, np.integer) and x.ndim == 3 for x in features):
+            word_lengths = word_lengths[:1]  # no character feature
+
+        for batch_size in batch_sizes:
+            for length in lengths:
+                for word_length in word_lengths:
+                    sents = [['a' * word_length] * length] * batch_size
+                    self._predict_words(sents)
+
     def _get_prob(self, pred):
-        prob = np.max(pred, -1)
+        _, prob = label_ids_and_scores(pred)
 
         return prob
 
@@ -52,22 +194,27 @@ class Tagger(object):
 
         return tags
 
-    def _build_response(self, sent, tags, prob):
-        words = self.tokenizer(sent)
+    @property
+    def _entity_decoder(self):
+        if self._decoder is None:
+            self._decoder = EntityDecoder(self.preprocessor._label_vocab.reverse_vocab)
+
+        return self._decoder
+
+    def _build_response(self, words, chunks):
         res = {
             'words': words,
             'entities': [
 
             ]
         }
-        chunks = get_entities(tags)
 
-        for chunk_type, chunk_start, chunk_end in chunks:
+        for chunk_type, chunk_start, chunk_end, score in chunks:
             chunk_end += 1
             entity = {
                 'text': ' '.join(words[chunk_start: chunk_end]),
                 'type': chunk_type,
-                'score': float(np.average(prob[chunk_start: chunk_end])),
+                'score': score,
                 'beginOffset': chunk_start,
                 'endOffset': chunk_end
             }
@@ -116,13 +263,71 @@ class Tagger(object):
                 ]
             }
         """
-        pred = self.predict_proba(text)
-        tags = self._get_tags(pred)
-        prob = self._get_prob(pred)
-        res = self._build_response(text, tags, prob)
+        res = self.analyze_batch([text])
+        res = res[0]  # reduce batch dimension.
+
+        return res
+
+    def analyze_batch(self, texts):
+        """Analyze texts with a single model call.
+
+        Args:
+            texts: list of strings, the input texts.
+
+        Returns:
+            list: a response dict for each text, as returned by `analyze`.
+        """
+        keys = [self._cache_key(text) for text in texts]
+        res = [self._get_cached(key) for key in keys]
+        misses = [i for i, r in enumerate(res) if r is None]
+        if not misses:
+            return res
+
+        sents = [self.tokenizer(texts[i]) for i in misses]
+        y = self._predict_batch(sents)
+        ids, scores = label_ids_and_scores(y)
+        chunks = self._entity_decoder.decode(ids, map(len, sents), scores)
+        for i, words, sent_chunks in zip(misses, sents, chunks):
+            res[i] = self._build_response(words, sent_chunks)
+            self._put_cached(keys[i], res[i])
 
         return res
 
+    def cache_info(self):
+        """Returns the cache statistics.
+
+        Returns:
+            dict: hits, misses, maxsize and currsize of the cache,
+            or None if the cache is disabled.
+        """
+        if self._cache is None:
+            return None
+
+        return self._cache.info()
+
+    def cache_clear(self):
+        """Clears the cache and its statistics."""
+        if self._cache is not None:
+            self._cache.clear()
+
+    def _cache_key(self, text):
+        if self.tokenizer is str.split:
+            text = ' '.join(text.split())
+
+        return self._model_token, self._preprocessor_token, text
+
+    def _get_cached(self, key):
+        if self._cache is None:
+            return None
+        res = self._cache.get(key)
+
+        # Callers own the returned dict, so hand out a copy.
+        return copy.deepcopy(res) if res is not None else None
+
+    def _put_cached(self, key, res):
+        if self._cache is not None:
+            self._cache.put(key, copy.deepcopy(res))
+
     def predict(self, text):
         """Predict using the model.
 
@@ -137,3 +342,396 @@ class Tagger(object):
         tags = self._get_tags(pred)
 
         return tags
+
+    def analyze_document(self, doc, window_size=100, overlap=10, batch_size=32,
+                         split_sentences=True):
+        """Analyze a long document incrementally.
+
+        The document is split into sentences, and any sentence longer than
+        `window_size` words is cut into windows sharing `overlap` words.
+        Windows are predicted `batch_size` at a time, so memory stays bounded
+        no matter how long the document is. Each shared region takes its left
+        half from the earlier window and its right half from the later one,
+        and entities crossing a window boundary are merged.
+
+        Args:
+            doc: string or file object. File objects are read line by line.
+            window_size: int, maximum number of words fed to the model at once.
+            overlap: int, number of words shared by consecutive windows.
+            batch_size: int, number of windows predicted at once.
+            split_sentences: boolean. Whether to split the document into
+                sentences. If False, it is only cut into windows.
+
+        Yields:
+            res: dict. The words of each window (without the parts taken
+            from its neighbours) and the entities found so far, in the
+            format of `analyze`. An entity is only known to end at the word
+            after it, so one ending at the last word of a window is yielded
+            with the next window, unless the window ends a sentence.
+            `offset` and entity offsets are counted from the beginning of
+            the document.
+
+        Examples:
+            >>> with open('contract.txt') as f:
+            ...     for res in model.analyze_document(f):
+            ...         print(res['entities'])
+        """
+        assert 0 <= overlap < window_size
+
+        if isinstance(doc, str):
+            doc = io.StringIO(doc)
+
+        words = self._iter_words(doc, split_sentences)
+        windows = self._iter_windows(words, window_size, overlap)
+        state = self._new_chunk_state()
+        batch = []
+        for window in windows:
+            batch.append(window)
+            if len(batch) == batch_size:
+                for res in self._analyze_windows(batch, overlap, state):
+                    yield res
+                batch = []
+        if batch:
+            for res in self._analyze_windows(batch, overlap, state):
+                yield res
+
+    def _iter_words(self, doc, split_sentences):
+        """Yields (word, is_sentence_end) pairs from the lines of a document.
+
+        A sentence ends at a blank line or, if `split_sentences` is True,
+        at a word ending with a sentence-final punctuation mark.
+        """
+        prev = None
+        for line in doc:
+            words = self.tokenizer(line.strip())
+            if not words:
+                if prev is not None:
+                    yield prev, True
+                    prev = None
+                continue
+            for word in words:
+                if prev is not None:
+                    yield prev, split_sentences and bool(SENTENCE_END.search(prev))
+                prev = word
+        if prev is not None:
+            yield prev, True
+
+    def _iter_windows(self, words, window_size, overlap):
+        """Yields (words, offset, is_first, is_last) windows over a word stream.
+
+        `is_first` and `is_last` tell whether the window starts or ends a
+        sentence.
+        """
+        left = overlap - overlap // 2
+        buf, offset, first = [], 0, True
+        for word, end in words:
+            buf.append(word)
+            if end:
+                yield buf, offset, first, True
+                offset += len(buf)
+                buf, first = [], True
+            elif len(buf) == window_size:
+                yield buf, offset, first, False
+                buf = buf[len(buf) - overlap:]
+                offset += window_size - overlap
+                first = False
+        if buf and (first or len(buf) > left):
+            yield buf, offset, first, True
+
+    def _analyze_windows(self, windows, overlap, state):
+        preds = self._predict_words([window[0] for window in windows])
+        for (words, offset, first, last), pred in zip(windows, preds):
+            begin = 0 if first else overlap - overlap // 2
+            end = len(words) if last else len(words) - overlap // 2
+            tags = self._get_tags(pred)
+            prob = self._get_prob(pred)
+            res = {
+                'words': words[begin: end],
+                'entities': [],
+                'offset': offset + begin
+            }
+            for i in range(begin, end):
+                self._update_chunk(state, tags[i], offset + i, words[i], prob[i], res['entities'])
+            if last:
+                self._update_chunk(state, 'O', offset + end, None, 0, res['entities'])
+                state['type'] = ''
+            yield res
+
+    def _new_chunk_state(self):
+        return {'tag': 'O', 'type': '', 'begin': 0, 'words': [], 'prob': []}
+
+    def _update_chunk(self, state, tag, i, word, prob, entities):
+        """Feeds one word into the chunk being built, as `get_entities` does."""
+        prefix = tag[0]
+        type_ = tag.split('-')[-1]
+        if end_of_chunk(state['tag'], prefix, state['type'], type_):
+            entity = {
+                'text': ' '.join(state['words']),
+                'type': state['type'],
+                'score': float(np.average(state['prob'])),
+                'beginOffset': state['begin'],
+                'endOffset': i
+            }
+            entities.append(entity)
+            state['words'], state['prob'] = [], []
+        if start_of_chunk(state['tag'], prefix, state['type'], type_):
+            state['begin'] = i
+            state['words'], state['prob'] = [], []
+        if prefix == 'O':
+            state['words'], state['prob'] = [], []
+        else:
+            state['words'].append(word)
+            state['prob'].append(prob)
+        state['tag'] = prefix
+        state['type'] = type_
+
+
+class MultiTaskTagger(Tagger):
+    """Tagger for multi-task models, returning every label set at once.
+
+    The model has an output for each task of a `MultiLabelIndexTransformer`,
+    e.g. one built by `MultiTaskBiLSTMCRF`, and all of them come from a
+    single forward pass.
+    """
+
+    def __init__(self, model, preprocessor, tokenizer=str.split, **kwargs):
+        super(MultiTaskTagger, self).__init__(model, preprocessor, tokenizer, **kwargs)
+
+    @property
+    def task_names(self):
+        return self.preprocessor.task_names
+
+    def _predict_words(self, sents):
+        """Probability estimates for a batch of tokenized sentences.
+
+        Args:
+            sents: list of list of str, tokenized sentences.
+
+        Returns:
+            list: for each sentence, a list with an array of shape
+            [num_words, num_classes] for each task.
+        """
+        y = self._predict_batch(sents)
+
+        return [[y_task[i][:len(words)] for y_task in y] for i, words in enumerate(sents)]
+
+    def _get_tags(self, pred):
+        tags = self.preprocessor.inverse_transform([p[np.newaxis] for p in pred])
+
+        return {name: task_tags[0] for name, task_tags in zip(self.task_names, tags)}
+
+    @property
+    def _entity_decoders(self):
+        if self._decoder is None:
+            self._decoder = [EntityDecoder(vocab.reverse_vocab) for vocab in self.preprocessor._label_vocabs]
+
+        return self._decoder
+
+    def predict(self, text):
+        """Predict the labels of every task.
+
+        Args:
+            text: string, the input text.
+
+        Returns:
+            dict: a list of tags for each task name.
+        """
+        pred = self.predict_proba(text)
+
+        return self._get_tags(pred)
+
+    def analyze_batch(self, texts):
+        """Analyze texts with a single model call.
+
+        Args:
+            texts: list of strings, the input texts.
+
+        Returns:
+            list: a dict for each text, with the `words`, and the `tags` and
+            the `entities` (in the format of `Tagger.analyze`) of each task.
+        """
+        keys = [self._cache_key(text) for text in texts]
+        res = [self._get_cached(key) for key in keys]
+        misses = [i for i, r in enumerate(res) if r is None]
+        if not misses:
+            return res
+
+        sents = [self.tokenizer(texts[i]) for i in misses]
+        lengths = [len(words) for words in sents]
+        y = self._predict_batch(sents)
+        tags = self.preprocessor.inverse_transform(y, lengths)
+        chunks = [decoder.decode(ids, lengths, scores)
+                  for decoder, (ids, scores) in zip(self._entity_decoders, map(label_ids_and_scores, y))]
+        for j, (i, words) in enumerate(zip(misses, sents)):
+            res[i] = {
+                'words': words,
+                'tags': {name: task_tags[j] for name, task_tags in zip(self.task_names, tags)},
+                'entities': {name: self._build_response(words, task_chunks[j])['entities']
+                             for name, task_chunks in zip(self.task_names, chunks)}
+            }
+            self._put_cached(keys[i], res[i])
+
+        return res
+
+    def analyze_document(self, doc, window_size=100, overlap=10, batch_size=32,
+                         split_sentences=True):
+        """Analyze a long document incrementally for every task.
+
+        The document is windowed as in `Tagger.analyze_document`, and the
+        entities of each task are merged across windows separately.
+
+        Yields:
+            res: dict. The `words` and the `offset` of each window, and the
+            `tags` and the `entities` of each task, as in `analyze_batch`.
+        """
+        return super(MultiTaskTagger, self).analyze_document(doc, window_size, overlap, batch_size,
+                                                             split_sentences)
+
+    def _new_chunk_state(self):
+        parent = super(MultiTaskTagger, self)
+
+        return {name: parent._new_chunk_state() for name in self.task_names}
+
+    def _analyze_windows(self, windows, overlap, states):
+        preds = self._predict_words([window[0] for window in windows])
+        for (words, offset, first, last), pred in zip(windows, preds):
+            begin = 0 if first else overlap - overlap // 2
+            end = len(words) if last else len(words) - overlap // 2
+            tags = self._get_tags(pred)
+            res = {
+                'words': words[begin: end],
+                'tags': {},
+                'entities': {},
+                'offset': offset + begin
+            }
+            for name, task_pred in zip(self.task_names, pred):
+                state, task_tags = states[name], tags[name]
+                prob = self._get_prob(task_pred)
+                entities = res['entities'][name] = []
+                res['tags'][name] = task_tags[begin: end]
+                for i in range(begin, end):
+                    self._update_chunk(state, task_tags[i], offset + i, words[i], prob[i], entities)
+                if last:
+                    self._update_chunk(state, 'O', offset + end, None, 0, entities)
+                    state['type'] = ''
+            yield res
+
+
+def bucket_length(length, buckets):
+    """Returns the smallest bucket length that fits length.
+
+    Args:
+        length: int, length to fit.
+        buckets: sorted list of int, bucket lengths.
+
+    Returns:
+        int: the bucket length, or length rounded up to a multiple of the
+        largest bucket if it does not fit any.
+    """
+    for bucket in buckets:
+        if length <= bucket:
+            return bucket
+
+    return -(-length // buckets[-1]) * buckets[-1]
+
+
+def label_ids_and_scores(y):
+    """Returns the best label ids and their scores.
+
+    Args:
+        y: label scores of shape [..., num_classes], or int label ids of
+            shape [...] as output by a CRF with `viterbi_output='index'`.
+
+    Returns:
+        tuple: the label ids and their scores, which are 1 for label ids.
+    """
+    y = np.asarray(y)
+    if np.issubdtype(y.dtype, np.integer):
+        return y, np.ones(y.shape, dtype='float32')
+
+    return np.argmax(y, -1), np.max(y, -1)
+
+
+def analyze_batch_safely(tagger, texts):
+    """Analyzes texts as one batch, so that a single bad text fails alone.
+
+    If the batch fails, the texts are retried one by one.
+
+    Args:
+        tagger: Tagger.
+        texts: list of string, the input texts.
+
+    Returns:
+        list: the response dict of each text, or the exception it raised.
+    """
+    try:
+        return tagger.analyze_batch(texts)
+    except Exception as e:
+        if len(texts) == 1:
+            return [e]
+
+    results = []
+    for text in texts:
+        try:
+            results.append(tagger.analyze(text))
+        except Exception as e:
+            results.append(e)
+
+    return results
+
+
+class ResultCache(object):
+    """A thread-safe LRU cache whose entries can expire.
+
+    Attributes:
+        maxsize: int, maximum number of entries.
+        ttl: float, seconds before an entry expires. None means never.
+        hits: int, number of successful lookups.
+        misses: int, number of failed lookups.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """Returns the value of key, or None if it is missing or expired."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and self.ttl is not None and time.monotonic() > item[1]:
+                del self._data[key]
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+
+            return item[0]
+
+    def put(self, key, value):
+        """Stores value, evicting the least recently used entry if full."""
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'maxsize': self.maxsize, 'currsize': len(self._data)}
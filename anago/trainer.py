@@ -1,7 +1,14 @@
 """Training-related module.
 """
-from anago.callbacks import F1score
-from anago.utils import NERSequence
+import functools
+import json
+import time
+
+import numpy as np
+from seqeval.metrics import f1_score
+
+from anago.callbacks import DataWait, F1score
+from anago.sequence import NERSequence
 
 
 class Trainer(object):
@@ -17,9 +24,14 @@ class Trainer(object):
         self._preprocessor = preprocessor
 
     def train(self, x_train, y_train, x_valid=None, y_valid=None,
-              epochs=1, batch_size=32, verbose=1, callbacks=None, shuffle=True):
+              epochs=1, batch_size=32, verbose=1, callbacks=None, shuffle=True, report_every=None,
+              workers=1, use_multiprocessing=False, max_queue_size=10):
         """Trains the model for a fixed number of epochs (iterations on a dataset).
 
+        Batches are prepared ahead of training by `workers`, and the fraction
+        of each epoch spent waiting for them is logged as `data_wait` (see
+        `DataWait`).
+
         Args:
             x_train: list of training data.
             y_train: list of training target (label) data.
@@ -35,17 +47,204 @@ class Trainer(object):
                 List of callbacks to apply during training.
             shuffle: Boolean (whether to shuffle the training data
                 before each epoch). `shuffle` will default to True.
+            report_every: Integer. Print a classification report of the
+                validation data every this many epochs. None never prints it.
+            workers: Integer. Number of threads or processes preparing
+                batches ahead of training.
+            use_multiprocessing: Boolean. Whether the workers are processes,
+                which are not limited by the GIL.
+            max_queue_size: Integer. Maximum number of prepared batches.
         """
 
         train_seq = NERSequence(x_train, y_train, batch_size, self._preprocessor.transform)
+        self._fit(train_seq, x_valid, y_valid, epochs, batch_size, verbose, callbacks, shuffle,
+                  report_every, workers, use_multiprocessing, max_queue_size)
 
+    def _fit(self, train_seq, x_valid, y_valid, epochs, batch_size, verbose, callbacks, shuffle,
+             report_every, workers, use_multiprocessing, max_queue_size):
+        callbacks = [DataWait(verbose)] + (callbacks or [])
         if x_valid and y_valid:
             valid_seq = NERSequence(x_valid, y_valid, batch_size, self._preprocessor.transform)
-            f1 = F1score(valid_seq, preprocessor=self._preprocessor)
-            callbacks = [f1] + callbacks if callbacks else [f1]
+            f1 = F1score(valid_seq, preprocessor=self._preprocessor, report_every=report_every)
+            callbacks = [f1] + callbacks
 
         self._model.fit_generator(generator=train_seq,
                                   epochs=epochs,
                                   callbacks=callbacks,
                                   verbose=verbose,
-                                  shuffle=shuffle)
+                                  shuffle=shuffle,
+                                  workers=workers,
+                                  use_multiprocessing=use_multiprocessing,
+                                  max_queue_size=max_queue_size)
+
+
+class DistillationTrainer(Trainer):
+    """A trainer that trains a student model on the soft labels of a teacher.
+
+    The teacher labels the training sentences, which need no gold labels, with
+    its CRF marginals or softmax outputs, and the student is trained to
+    reproduce them. The student can be much smaller, e.g. without the
+    character LSTM or with narrow LSTMs, and is saved like any other model.
+
+    Attributes:
+        _model: Model. The student.
+        _preprocessor: Transformer of the student. Give a copy of the teacher's
+            one with `_use_char = False` for a student without char features.
+        _teacher: Model. A trained teacher.
+        _teacher_preprocessor: Transformer of the teacher.
+        _temperature: float. Soft labels are sharpened below 1, smoothed above.
+        _alpha: float. Weight of the gold labels, when given, against the soft ones.
+    """
+
+    def __init__(self, model, teacher, preprocessor=None, teacher_preprocessor=None,
+                 temperature=1., alpha=0.):
+        super(DistillationTrainer, self).__init__(model, preprocessor)
+        self._teacher = teacher
+        self._soft_teacher = soft_label_model(teacher)
+        self._teacher_preprocessor = teacher_preprocessor or preprocessor
+        self._temperature = temperature
+        self._alpha = alpha
+
+    def label(self, x, batch_size=32):
+        """Computes the soft labels of the teacher.
+
+        Args:
+            x: list of sentences (lists of words).
+            batch_size: Integer.
+
+        Returns:
+            list of numpy arrays of shape (sentence length, label size).
+        """
+        y = []
+        for i in range(0, len(x), batch_size):
+            batch = x[i: i + batch_size]
+            proba = self._soft_teacher.predict_on_batch(self._teacher_preprocessor.transform(batch))
+            if self._temperature != 1:
+                proba = np.power(proba, 1. / self._temperature)
+                proba /= proba.sum(axis=-1, keepdims=True)
+            y.extend(p[:len(sent)] for p, sent in zip(proba, batch))
+
+        return y
+
+    def train(self, x_train, y_train=None, x_valid=None, y_valid=None,
+              epochs=1, batch_size=32, verbose=1, callbacks=None, shuffle=True, report_every=None,
+              workers=1, use_multiprocessing=False, max_queue_size=10):
+        """Trains the student for a fixed number of epochs.
+
+        Args:
+            x_train: list of training data. It can be unlabeled.
+            y_train: list of gold labels of x_train, mixed in with weight `alpha`.
+            x_valid: list of validation data.
+            y_valid: list of validation target (label) data.
+            batch_size: Integer.
+            epochs: Integer. Number of epochs to train the model.
+            verbose: Integer. 0, 1, or 2. Verbosity mode.
+            callbacks: List of `keras.callbacks.Callback` instances.
+            shuffle: Boolean (whether to shuffle the batches before each epoch).
+            report_every: Integer. Print a classification report of the
+                validation data every this many epochs.
+            workers: Integer. Number of threads or processes preparing batches.
+            use_multiprocessing: Boolean. Whether the workers are processes.
+            max_queue_size: Integer. Maximum number of prepared batches.
+        """
+        soft = self.label(x_train, batch_size)
+        targets = list(zip(soft, y_train)) if y_train is not None and self._alpha else soft
+        # A partial of a module function, unlike a bound method of the trainer, can be
+        # sent to worker processes without the models.
+        transform = functools.partial(_transform_soft, self._preprocessor, self._alpha)
+        train_seq = NERSequence(x_train, targets, batch_size, transform)
+        self._fit(train_seq, x_valid, y_valid, epochs, batch_size, verbose, callbacks, shuffle,
+                  report_every, workers, use_multiprocessing, max_queue_size)
+
+    def compare(self, x_test, y_test, batch_size=32, num_queries=200):
+        """Reports the F1 gap and the speedup of the student over the teacher.
+
+        Args:
+            x_test: list of test data.
+            y_test: list of test labels.
+            batch_size: Integer.
+            num_queries: Integer. Number of single sentences tagged one at a
+                time to measure latency.
+
+        Returns:
+            dict: F1, batch throughput (sentences/sec) and median single
+            sentence latency (ms) of both models, the F1 gap and the speedups.
+        """
+        res = {}
+        models = [('teacher', self._teacher, self._teacher_preprocessor),
+                  ('student', self._model, self._preprocessor)]
+        for name, model, p in models:
+            y_pred = []
+            start = time.time()
+            for i in range(0, len(x_test), batch_size):
+                batch = x_test[i: i + batch_size]
+                y = model.predict_on_batch(p.transform(batch))
+                y_pred.extend(p.inverse_transform(y, map(len, batch)))
+            elapsed = time.time() - start
+
+            latencies = []
+            for sent in x_test[:num_queries]:
+                start = time.time()
+                model.predict_on_batch(p.transform([sent]))
+                latencies.append(time.time() - start)
+
+            res[name] = {'f1': f1_score(y_test, y_pred),
+                         'sents_per_sec': len(x_test) / elapsed,
+                         'latency_ms': float(np.median(latencies)) * 1000}
+
+        res['f1_gap'] = res['teacher']['f1'] - res['student']['f1']
+        res['speedup'] = res['student']['sents_per_sec'] / res['teacher']['sents_per_sec']
+        res['latency_speedup'] = res['teacher']['latency_ms'] / res['student']['latency_ms']
+
+        return res
+
+
+def _transform_soft(preprocessor, alpha, batch_x, batch_y):
+    if batch_y and isinstance(batch_y[0], tuple):
+        soft, gold = zip(*batch_y)
+        features, y = preprocessor.transform(batch_x, gold)
+        y = alpha * y + (1 - alpha) * _pad_soft(soft, y.shape[1], preprocessor.label_size)
+    else:
+        features = preprocessor.transform(batch_x)
+        y = _pad_soft(batch_y, max(map(len, batch_x)), preprocessor.label_size)
+
+    return features, y
+
+
+def _pad_soft(soft, max_len, label_size):
+    y = np.zeros((len(soft), max_len, label_size), dtype='float32')
+    for i, p in enumerate(soft):
+        y[i, :len(p)] = p
+
+    return y
+
+
+def soft_label_model(model):
+    """Returns a model giving label probabilities for each word.
+
+    A CRF in Viterbi test mode outputs best paths, so it is rebuilt
+    to output its marginal probabilities, sharing no state with `model`.
+    Other models are returned as they are.
+
+    Args:
+        model: Keras model.
+
+    Returns:
+        Keras model.
+    """
+    from keras.models import model_from_json
+
+    from anago.models import CUSTOM_OBJECTS
+
+    config = json.loads(model.to_json())
+    crf_layers = [layer for layer in config['config']['layers']
+                  if layer['class_name'] == 'CRF' and layer['config']['test_mode'] == 'viterbi']
+    if not crf_layers:
+        return model
+    for layer in crf_layers:
+        layer['config']['test_mode'] = 'marginal'
+        layer['config']['viterbi_output'] = 'onehot'
+    soft = model_from_json(json.dumps(config), custom_objects=CUSTOM_OBJECTS)
+    soft.set_weights(model.get_weights())
+
+    return soft
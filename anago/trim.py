@@ -0,0 +1,172 @@
+"""
+Trims the word vocabulary and embedding of a trained model for deployment.
+
+Usage:
+    python -m anago.trim --weights weights.h5 --params params.json --preprocessor preprocessor.pickle \
+        --sample traffic.txt --output_dir trimmed/
+
+Words are kept if they occur in a sample of the traffic (`--sample`, one
+whitespace-tokenized sentence per line), or at least `--min_count` times in
+the training data. The kept words get a new, compact id space, the
+`word_embedding` weights are sliced to match, and the smaller model and
+preprocessor are saved together. Sentences whose words are all kept are
+tagged exactly as before, which is verified on the sample.
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+from collections import Counter
+
+import numpy as np
+
+
+def trim_vocabulary(p, docs=None, min_count=1):
+    """Builds a preprocessor with a smaller word vocabulary.
+
+    Args:
+        p: IndexTransformer.
+        docs: list of list of words. If given, the words occurring at least
+            `min_count` times in them are kept. Otherwise the words occurring
+            at least `min_count` times in the data the vocabulary was built
+            from are kept.
+        min_count: int, minimum frequency of a kept word.
+
+    Returns:
+        tuple of the new IndexTransformer and a numpy array mapping each new
+        word id to its old id. Padding and the unknown word are always kept.
+    """
+    vocab = p._word_vocab
+    if docs is not None:
+        counts = Counter(vocab.process_token(w) for doc in docs for w in doc)
+    else:
+        counts = vocab._token_count
+    old_size = len(vocab)
+    unk_id = old_size - 1 if vocab._unk else None
+
+    keep = np.zeros(old_size, dtype=bool)
+    keep[0] = True
+    if unk_id is not None:
+        keep[unk_id] = True
+    for token, count in counts.items():
+        idx = vocab._token2id.get(token)
+        if idx is not None and count >= min_count:
+            keep[idx] = True
+    old_ids = np.flatnonzero(keep)
+
+    trimmed = copy.deepcopy(p)
+    trimmed_vocab = trimmed._word_vocab
+    # Old ids are kept in order, so the unknown word stays the last one.
+    trimmed_vocab._id2token = [vocab._id2token[i] for i in old_ids]
+    trimmed_vocab._token2id = {token: i for i, token in enumerate(trimmed_vocab._id2token)}
+    trimmed_vocab._token_count = Counter({token: count for token, count in vocab._token_count.items()
+                                          if token in trimmed_vocab._token2id})
+
+    return trimmed, old_ids
+
+
+def trim_model(model, old_ids, layer_name='word_embedding'):
+    """Builds a copy of a model with the rows of an embedding layer sliced.
+
+    Args:
+        model: Keras model.
+        old_ids: numpy array of the row kept for each new id.
+        layer_name: string, name of the embedding layer.
+
+    Returns:
+        Keras model.
+    """
+    from keras.models import model_from_json
+
+    from anago.models import CUSTOM_OBJECTS
+
+    config = json.loads(model.to_json())
+    for layer in config['config']['layers']:
+        if layer['name'] == layer_name:
+            if layer['class_name'] == 'MappedEmbedding':
+                raise ValueError('Cannot trim a memory-mapped embedding.')
+            layer['config']['input_dim'] = len(old_ids)
+    trimmed = model_from_json(json.dumps(config), custom_objects=CUSTOM_OBJECTS)
+
+    for layer in model.layers:
+        weights = layer.get_weights()
+        if layer.name == layer_name:
+            weights = [w[old_ids] for w in weights]
+        if weights:
+            trimmed.get_layer(layer.name).set_weights(weights)
+
+    return trimmed
+
+
+def verify_trim(model, p, trimmed_model, trimmed_p, docs, batch_size=256):
+    """Checks that a trimmed model tags in-vocabulary sentences as before.
+
+    Args:
+        model: Keras model.
+        p: IndexTransformer.
+        trimmed_model: Keras model returned by `trim_model`.
+        trimmed_p: IndexTransformer returned by `trim_vocabulary`.
+        docs: list of list of words.
+        batch_size: int.
+
+    Returns:
+        dict: the number of sentences whose words are all in the trimmed
+        vocabulary and the number of them tagged differently.
+    """
+    vocab = trimmed_p._word_vocab
+    docs = [doc for doc in docs if doc and all(vocab.process_token(w) in vocab.vocab for w in doc)]
+    mismatches = 0
+    for i in range(0, len(docs), batch_size):
+        batch = docs[i: i + batch_size]
+        lengths = [len(doc) for doc in batch]
+        y = p.inverse_transform(model.predict(p.transform(batch)), lengths)
+        y_trimmed = trimmed_p.inverse_transform(trimmed_model.predict(trimmed_p.transform(batch)), lengths)
+        mismatches += sum(a != b for a, b in zip(y, y_trimmed))
+
+    return {'sentences': len(docs), 'mismatches': mismatches}
+
+
+def main(args):
+    from anago.models import save_model
+    from anago.wrapper import Sequence
+
+    model = Sequence.load(args.weights, args.params, args.preprocessor)
+    docs = None
+    if args.sample:
+        with open(args.sample, encoding=args.encoding) as f:
+            docs = [line.split() for line in f if line.strip()]
+
+    p, old_ids = trim_vocabulary(model.p, docs, args.min_count)
+    trimmed = trim_model(model.model, old_ids)
+    print('Word vocabulary: {} -> {}'.format(model.p.word_vocab_size, p.word_vocab_size), file=sys.stderr)
+
+    if docs:
+        res = verify_trim(model.model, model.p, trimmed, p, docs)
+        print('Verified {sentences} in-vocabulary sentences, {mismatches} mismatches'.format(**res),
+              file=sys.stderr)
+        if res['mismatches']:
+            sys.exit(1)
+
+    if not os.path.exists(args.output_dir):
+        os.makedirs(args.output_dir)
+    p.save(os.path.join(args.output_dir, 'preprocessor.pickle'))
+    save_model(trimmed,
+               os.path.join(args.output_dir, 'weights.h5'),
+               os.path.join(args.output_dir, 'params.json'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Trimming the word vocabulary of a model.')
+    parser.add_argument('--weights', required=True)
+    parser.add_argument('--params', required=True)
+    parser.add_argument('--preprocessor', required=True)
+    parser.add_argument('--output_dir', required=True)
+    parser.add_argument('--sample', default=None, help='traffic sample, one sentence per line')
+    parser.add_argument('--min_count', type=int, default=1,
+                        help='minimum frequency in the sample, or in the training data without one')
+    parser.add_argument('--encoding', default='utf-8')
+    args = parser.parse_args()
+    if not args.sample and args.min_count <= 1:
+        parser.error('Give --sample or a --min_count above 1.')
+    main(args)
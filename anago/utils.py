@@ -1,12 +1,11 @@
 """
 Utility functions.
 """
-import math
 import os
 from collections import Counter
 
 import numpy as np
-from keras.utils import Sequence, get_file
+from seqeval.metrics.sequence_labeling import end_of_chunk, start_of_chunk
 
 
 def download(url):
@@ -15,6 +14,8 @@ def download(url):
     Args:
         url (str): target url.
     """
+    from keras.utils import get_file
+
     filepath = get_file(fname='tmp.zip', origin=url, extract=True)
     base_dir = os.path.dirname(filepath)
     weights_file = os.path.join(base_dir, 'weights.h5')
@@ -75,24 +76,6 @@ def load_data_and_labels(filename, encoding='utf-8'):
     return sents, labels
 
 
-class NERSequence(Sequence):
-
-    def __init__(self, x, y, batch_size=1, preprocess=None):
-        self.x = x
-        self.y = y
-        self.batch_size = batch_size
-        self.preprocess = preprocess
-
-    def __getitem__(self, idx):
-        batch_x = self.x[idx * self.batch_size: (idx + 1) * self.batch_size]
-        batch_y = self.y[idx * self.batch_size: (idx + 1) * self.batch_size]
-
-        return self.preprocess(batch_x, batch_y)
-
-    def __len__(self):
-        return math.ceil(len(self.x) / self.batch_size)
-
-
 class Vocabulary(object):
     """A vocabulary that maps tokens to ints (storing a vocabulary).
 
@@ -243,6 +226,144 @@ class Vocabulary(object):
         return self._id2token
 
 
+class EntityDecoder(object):
+    """Extracts entity chunks from label ids with NumPy.
+
+    It gives the same chunks as `seqeval`'s `get_entities` for any tagging
+    scheme (IOB2, IOBES, ...). The chunk boundary rules are evaluated once
+    for every pair of labels in the vocabulary, and a whole batch is then
+    decoded with table lookups.
+
+    Attributes:
+        labels: list of label strings indexed by label id.
+        types: numpy array of the entity type of each label.
+    """
+
+    def __init__(self, labels):
+        """Create an EntityDecoder object.
+
+        Args:
+            labels: list of label strings indexed by label id.
+        """
+        self.labels = list(labels)
+        prefixes = [label[0] for label in self.labels]
+        types = [label.split('-')[-1] for label in self.labels]
+
+        # Two extra labels: the one before a sentence and the one after it.
+        self._bos = len(self.labels)
+        self._eos = self._bos + 1
+        prefixes += ['O', 'O']
+        types += ['', 'O']
+        self.types = np.array(types, dtype=object)
+
+        size = len(prefixes)
+        self._start = np.zeros((size, size), dtype=bool)
+        self._end = np.zeros((size, size), dtype=bool)
+        for i in range(size):
+            for j in range(size):
+                self._start[i, j] = start_of_chunk(prefixes[i], prefixes[j], types[i], types[j])
+                self._end[i, j] = end_of_chunk(prefixes[i], prefixes[j], types[i], types[j])
+
+    def decode(self, y, lengths, scores=None):
+        """Extracts the chunks of a batch of label id sequences.
+
+        Args:
+            y: int array, shape = (n_samples, sent_length), label ids.
+            lengths: sentence lengths. Ids past them are ignored.
+            scores: float array, shape = (n_samples, sent_length), optional
+                per-word scores to average over each chunk.
+
+        Returns:
+            list: for each sentence, a list of (chunk_type, chunk_start, chunk_end, score)
+            tuples. `chunk_end` is inclusive as in `get_entities` and `score`
+            is None without `scores`.
+
+        Example:
+            >>> decoder = EntityDecoder(['<pad>', 'O', 'B-PER', 'I-PER'])
+            >>> decoder.decode([[2, 3, 1, 2]], [4])
+            [[('PER', 0, 1, None), ('PER', 3, 3, None)]]
+        """
+        y = np.asarray(y, dtype='int64')
+        n, length = y.shape
+        lengths = np.minimum(np.fromiter(lengths, dtype='int64', count=n), length)
+
+        ids = np.full((n, length + 2), self._eos, dtype='int64')
+        ids[:, 0] = self._bos
+        ids[:, 1:-1] = np.where(np.arange(length) < lengths[:, None], y, self._eos)
+        prev, cur = ids[:, :-1], ids[:, 1:]
+
+        # A chunk ending at i - 1 is detected at i, before the start check.
+        positions = np.arange(length + 1)
+        starts = np.where(self._start[prev, cur], positions, -1)
+        last_start = np.maximum.accumulate(starts, axis=1)
+        rows, ends = np.nonzero(self._end[prev, cur])
+        ends -= 1
+        begins = np.maximum(last_start[rows, ends], 0)
+        types = self.types[ids[rows, ends + 1]]
+
+        if scores is None:
+            means = [None] * len(rows)
+        else:
+            cumsum = np.zeros((n, length + 1))
+            cumsum[:, 1:] = np.cumsum(scores, axis=1)
+            means = (cumsum[rows, ends + 1] - cumsum[rows, begins]) / (ends - begins + 1)
+            means = means.tolist()
+
+        chunks = [[] for _ in range(n)]
+        for row, chunk in zip(rows.tolist(), zip(types, begins.tolist(), ends.tolist(), means)):
+            chunks[row].append(chunk)
+
+        return chunks
+
+
+def allowed_transitions(labels, scheme='BIO'):
+    """Lists the label transitions that are valid in a tagging scheme.
+
+    Labels not starting with a prefix of the scheme, such as the padding
+    label, are treated like 'O'.
+
+    Args:
+        labels: list of label strings indexed by label id.
+        scheme: 'BIO' (IOB2) or 'BIOES'.
+
+    Returns:
+        list: (from, to) label id pairs. Id `len(labels)` stands for the
+        start of a sentence and `len(labels) + 1` for its end. See the
+        `allowed_transitions` argument of `anago.layers.CRF`.
+
+    Example:
+        >>> allowed_transitions(['O', 'B-PER', 'I-PER'])
+        [(0, 0), (0, 1), (0, 4), (1, 0), (1, 1), (1, 2), (1, 4), (2, 0), (2, 1), (2, 2), (2, 4), (3, 0), (3, 1)]
+    """
+    if scheme not in ('BIO', 'BIOES'):
+        raise ValueError('Unknown tagging scheme: {}'.format(scheme))
+    tags = []
+    for label in labels:
+        prefix, _, entity = label.partition('-')
+        tags.append((prefix, entity) if prefix in scheme and entity else ('O', ''))
+    start, end = len(labels), len(labels) + 1
+    tags += [('START', ''), ('END', '')]
+    # Tags that continue the chunk of the previous tag.
+    inside = ('I',) if scheme == 'BIO' else ('I', 'E')
+
+    pairs = []
+    for i, (from_prefix, from_entity) in enumerate(tags[:end]):
+        for j, (to_prefix, to_entity) in enumerate(tags):
+            if j == start or (i, j) == (start, end):
+                continue
+            if to_prefix in inside:
+                allowed = from_prefix in ('B', 'I') and from_entity == to_entity
+            elif scheme == 'BIOES':
+                # A chunk must be closed by E or S before anything else.
+                allowed = from_prefix in ('O', 'E', 'S', 'START')
+            else:
+                allowed = True
+            if allowed:
+                pairs.append((i, j))
+
+    return pairs
+
+
 def filter_embeddings(embeddings, vocab, dim):
     """Loads word vectors in numpy array.
 
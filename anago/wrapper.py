@@ -1,13 +1,16 @@
 """
 Wrapper class.
 """
+import threading
+
 from seqeval.metrics import f1_score
 
-from anago.models import BiLSTMCRF, save_model, load_model
+from anago.models import BiLSTMCRF, save_model, load_model, freeze_model, load_frozen_model
+from anago.models import quantize_model, load_quantized_model, save_mapped_model, load_mapped_model
 from anago.preprocessing import IndexTransformer
 from anago.tagger import Tagger
 from anago.trainer import Trainer
-from anago.utils import filter_embeddings
+from anago.utils import allowed_transitions, filter_embeddings
 
 
 class Sequence(object):
@@ -23,11 +26,16 @@ class Sequence(object):
                  use_char=True,
                  use_crf=True,
                  initial_vocab=None,
-                 optimizer='adam'):
+                 optimizer='adam',
+                 char_encoder='lstm',
+                 encoder='bilstm',
+                 crf_options=None,
+                 tag_scheme=None):
 
         self.model = None
         self.p = None
         self.tagger = None
+        self._lock = threading.Lock()
 
         self.word_embedding_dim = word_embedding_dim
         self.char_embedding_dim = char_embedding_dim
@@ -40,6 +48,10 @@ class Sequence(object):
         self.use_crf = use_crf
         self.initial_vocab = initial_vocab
         self.optimizer = optimizer
+        self.char_encoder = char_encoder
+        self.encoder = encoder
+        self.crf_options = crf_options
+        self.tag_scheme = tag_scheme
 
     def fit(self, x_train, y_train, x_valid=None, y_valid=None,
             epochs=1, batch_size=32, verbose=1, callbacks=None, shuffle=True):
@@ -76,7 +88,10 @@ class Sequence(object):
                           dropout=self.dropout,
                           embeddings=embeddings,
                           use_char=self.use_char,
-                          use_crf=self.use_crf)
+                          use_crf=self.use_crf,
+                          char_encoder=self.char_encoder,
+                          encoder=self.encoder,
+                          crf_options=_constrain(self.crf_options, p, self.tag_scheme))
         model, loss = model.build()
         model.compile(loss=loss, optimizer=self.optimizer)
 
@@ -142,10 +157,11 @@ class Sequence(object):
         Returns:
             res: dict.
         """
-        if not self.tagger:
-            self.tagger = Tagger(self.model,
-                                 preprocessor=self.p,
-                                 tokenizer=tokenizer)
+        with self._lock:
+            if not self.tagger:
+                self.tagger = Tagger(self.model,
+                                     preprocessor=self.p,
+                                     tokenizer=tokenizer)
 
         return self.tagger.analyze(text)
 
@@ -153,10 +169,168 @@ class Sequence(object):
         self.p.save(preprocessor_file)
         save_model(self.model, weights_file, params_file)
 
+    def export(self, graph_file, signature_file):
+        """Exports a frozen, inference-only graph of the model.
+
+        Load it with `load_frozen` and the preprocessor saved by `save`.
+
+        Args:
+            graph_file: path to write the frozen GraphDef to.
+            signature_file: path to write the input and output tensor names to.
+        """
+        freeze_model(self.model, graph_file, signature_file)
+
+    def save_quantized(self, weights_file, params_file, preprocessor_file, quantize_kernels=False):
+        """Saves the model with int8 embeddings, and optionally kernels.
+
+        Load it with `load_quantized`. See `anago.models.quantize_model`.
+
+        Args:
+            weights_file: path to write the weights (.npz) to.
+            params_file: path to write the params file to.
+            preprocessor_file: path to write the preprocessor file to.
+            quantize_kernels: boolean. Whether to quantize Dense and LSTM kernels.
+        """
+        self.p.save(preprocessor_file)
+        quantize_model(self.model, weights_file, params_file, quantize_kernels)
+
+    @classmethod
+    def load(cls, weights_file, params_file, preprocessor_file,
+             buckets=None, warmup=False, tokenizer=str.split, crf_options=None, tag_scheme=None):
+        """Loads a saved model.
+
+        Args:
+            weights_file: path to the weights file.
+            params_file: path to the params file.
+            preprocessor_file: path to the preprocessor file.
+            buckets: list of int. Bucket lengths inputs of `analyze` are
+                padded up to. See `Tagger`.
+            warmup: boolean. Whether to run the model on representative
+                input shapes before returning.
+            tokenizer: Tokenize input sentence of `analyze`.
+            crf_options: dict, options overriding the saved CRF config, e.g.
+                `{'viterbi_output': 'index'}` to predict label ids instead
+                of one-hot paths.
+            tag_scheme: 'BIO' or 'BIOES'. If given, the CRF only decodes
+                label sequences that are valid in it.
+
+        Returns:
+            Sequence.
+        """
+        self = cls()
+        self.p = IndexTransformer.load(preprocessor_file)
+        self.model = load_model(weights_file, params_file, _constrain(crf_options, self.p, tag_scheme))
+        if buckets or warmup:
+            self.tagger = Tagger(self.model, preprocessor=self.p,
+                                 tokenizer=tokenizer, buckets=buckets)
+        if warmup:
+            self.tagger.warmup()
+
+        return self
+
+    def save_mapped(self, weights_file, preprocessor_file):
+        """Saves the model to a single file whose embeddings can be memory-mapped.
+
+        Load it with `load_mapped`. See `anago.models.load_mapped_model`.
+
+        Args:
+            weights_file: path to write the model config and weights to.
+            preprocessor_file: path to write the preprocessor file to.
+        """
+        self.p.save(preprocessor_file)
+        save_mapped_model(self.model, weights_file)
+
+    @classmethod
+    def load_mapped(cls, weights_file, preprocessor_file):
+        """Loads a model saved by `save_mapped`, sharing its embeddings across processes.
+
+        Args:
+            weights_file: path to the model config and weights.
+            preprocessor_file: path to the preprocessor file.
+
+        Returns:
+            Sequence. It can predict, score and analyze, but not fit.
+        """
+        self = cls()
+        self.p = IndexTransformer.load(preprocessor_file)
+        self.model = load_mapped_model(weights_file)
+
+        return self
+
+    def save_bundle(self, path):
+        """Saves the model and the preprocessor to a single, checksummed file.
+
+        The file is replaced atomically. Load it with `load_bundle`.
+
+        Args:
+            path: path to the bundle file.
+        """
+        from anago.bundle import save_bundle
+
+        save_bundle(path, self.model, self.p)
+
+    @classmethod
+    def load_bundle(cls, path, verify=True, mapped=False):
+        """Loads a model saved by `save_bundle`.
+
+        Args:
+            path: path to the bundle file.
+            verify: boolean. Whether to check the hashes of the bundle.
+            mapped: boolean. Whether embeddings are shared memory maps of the
+                file instead of copies.
+
+        Returns:
+            Sequence.
+        """
+        from anago.bundle import load_bundle
+
+        self = cls()
+        self.model, self.p = load_bundle(path, verify=verify, mapped=mapped)
+
+        return self
+
     @classmethod
-    def load(cls, weights_file, params_file, preprocessor_file):
+    def load_quantized(cls, weights_file, params_file, preprocessor_file):
+        """Loads a model saved by `save_quantized`.
+
+        Args:
+            weights_file: path to the weights (.npz).
+            params_file: path to the params file.
+            preprocessor_file: path to the preprocessor file.
+
+        Returns:
+            Sequence.
+        """
         self = cls()
         self.p = IndexTransformer.load(preprocessor_file)
-        self.model = load_model(weights_file, params_file)
+        self.model = load_quantized_model(weights_file, params_file)
 
         return self
+
+    @classmethod
+    def load_frozen(cls, graph_file, signature_file, preprocessor_file):
+        """Loads a model exported by `export` for inference only.
+
+        Args:
+            graph_file: path to the frozen GraphDef.
+            signature_file: path to the input and output tensor names.
+            preprocessor_file: path to the preprocessor file.
+
+        Returns:
+            Sequence. It can predict, score and analyze, but not fit.
+        """
+        self = cls()
+        self.p = IndexTransformer.load(preprocessor_file)
+        self.model = load_frozen_model(graph_file, signature_file)
+
+        return self
+
+
+def _constrain(crf_options, p, tag_scheme):
+    """Adds the valid transitions of a tagging scheme to CRF options."""
+    if not tag_scheme:
+        return crf_options
+    crf_options = dict(crf_options or {})
+    crf_options['allowed_transitions'] = allowed_transitions(p._label_vocab.reverse_vocab, tag_scheme)
+
+    return crf_options
@@ -0,0 +1,47 @@
+"""
+Compares the character BiLSTM and CNN encoders on training time, tagging
+speed and F1.
+"""
+import argparse
+import os
+import time
+
+from anago.utils import load_data_and_labels
+from anago.wrapper import Sequence
+
+
+def main(args):
+    print('Loading dataset...')
+    x_train, y_train = load_data_and_labels(args.train_data)
+    x_valid, y_valid = load_data_and_labels(args.valid_data)
+    x_test, y_test = load_data_and_labels(args.test_data)
+    if args.max_train:
+        x_train, y_train = x_train[:args.max_train], y_train[:args.max_train]
+
+    print('encoder\ttrain sec/epoch\ttest sents/sec\tf1')
+    for encoder in args.encoders.split(','):
+        model = Sequence(char_encoder=encoder)
+        start = time.time()
+        model.fit(x_train, y_train, x_valid, y_valid,
+                  epochs=args.epochs, batch_size=args.batch_size, verbose=0)
+        train_time = (time.time() - start) / args.epochs
+
+        start = time.time()
+        model.predict(x_test)
+        speed = len(x_test) / (time.time() - start)
+
+        print('{}\t{:.1f}\t{:.1f}\t{:.4f}'.format(encoder, train_time, speed, model.score(x_test, y_test)))
+
+
+if __name__ == '__main__':
+    DATA_DIR = os.path.join(os.path.dirname(__file__), '../data/conll2003/en/ner')
+    parser = argparse.ArgumentParser(description='Benchmarking character encoders.')
+    parser.add_argument('--train_data', default=os.path.join(DATA_DIR, 'train.txt'))
+    parser.add_argument('--valid_data', default=os.path.join(DATA_DIR, 'valid.txt'))
+    parser.add_argument('--test_data', default=os.path.join(DATA_DIR, 'test.txt'))
+    parser.add_argument('--encoders', default='lstm,cnn')
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--batch_size', type=int, default=32)
+    parser.add_argument('--max_train', type=int, default=None, help='number of training sentences')
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,74 @@
+"""
+Measures Viterbi decoding speed for large BIO label sets, with the full
+search, with the transitions constrained to valid BIO sequences and with
+beam pruning, and counts the invalid label sequences each one decodes.
+"""
+import argparse
+import time
+
+import numpy as np
+from keras.layers import Dense, Input
+from keras.models import Model
+
+from anago.layers import CRF
+from anago.utils import allowed_transitions
+
+
+def bio_labels(num_types):
+    labels = ['<pad>', 'O']
+    for i in range(num_types):
+        labels += ['B-T{}'.format(i), 'I-T{}'.format(i)]
+    return labels
+
+
+def build_model(dim, num_labels, crf_options):
+    x = Input(batch_shape=(None, None, dim))
+    crf = CRF(num_labels, sparse_target=False, **crf_options)
+    return Model(inputs=x, outputs=crf(Dense(dim, activation='tanh')(x)))
+
+
+def count_invalid(y, pairs, num_labels):
+    pairs = set(pairs)
+    invalid = 0
+    for ids in np.argmax(y, -1):
+        ids = [num_labels] + ids.tolist() + [num_labels + 1]
+        invalid += any(pair not in pairs for pair in zip(ids[:-1], ids[1:]))
+    return invalid
+
+
+def main(args):
+    x = np.random.randn(args.batch_size, args.length, args.dim)
+    print('labels\tdecoding\tms/batch\tinvalid sequences')
+    for num_types in args.num_types:
+        labels = bio_labels(num_types)
+        pairs = allowed_transitions(labels)
+        settings = [('full', {}), ('constrained', {'allowed_transitions': pairs})]
+        settings += [('beam={}'.format(k), {'allowed_transitions': pairs, 'beam_size': k})
+                     for k in args.beam_sizes if k < len(labels)]
+        weights = None
+        for name, crf_options in settings:
+            model = build_model(args.dim, len(labels), crf_options)
+            if weights is None:
+                weights = model.get_weights()
+            model.set_weights(weights)
+            y = model.predict_on_batch(x)
+            times = []
+            for _ in range(args.repeat):
+                start = time.time()
+                model.predict_on_batch(x)
+                times.append(time.time() - start)
+            print('{}\t{}\t{:.1f}\t{}'.format(len(labels), name, sorted(times)[len(times) // 2] * 1000,
+                                              count_invalid(y, pairs, len(labels))))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarking Viterbi decoding for large label sets.')
+    parser.add_argument('--num_types', type=int, nargs='+', default=[4, 20, 90],
+                        help='entity types; a BIO schema has 2 * types + 2 labels')
+    parser.add_argument('--beam_sizes', type=int, nargs='+', default=[8, 16, 32])
+    parser.add_argument('--batch_size', type=int, default=32)
+    parser.add_argument('--length', type=int, default=40)
+    parser.add_argument('--dim', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    main(args)
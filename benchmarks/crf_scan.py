@@ -0,0 +1,35 @@
+"""
+Compares the CRF recursions on synthetic data: the symbolic loop, the
+unrolled loop and the parallel prefix scan, for training steps and Viterbi
+decoding across sentence lengths.
+
+The measurements are made by `anago.benchmark.benchmark_crf`; run
+`python -m anago.benchmark` for the other code paths and for saving them.
+"""
+import argparse
+
+from anago.benchmark import MODES, benchmark_crf
+
+
+def main(args):
+    results = benchmark_crf(args.lengths, [args.num_labels], [args.batch_size], args.modes.split(','),
+                            paths=('loss', 'viterbi'), dim=args.dim, repeat=args.repeat)
+    seconds = {(r['length'], r['mode'], r['path']): r['seconds'] for r in results}
+
+    print('length\tmode\ttrain ms/batch\tpredict ms/batch')
+    for length in args.lengths:
+        for mode in args.modes.split(','):
+            print('{}\t{}\t{:.1f}\t{:.1f}'.format(length, mode, seconds[length, mode, 'loss'] * 1000,
+                                                 seconds[length, mode, 'viterbi'] * 1000))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarking CRF recursions.')
+    parser.add_argument('--lengths', type=int, nargs='+', default=[10, 25, 50, 100, 200])
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--batch_size', type=int, default=32)
+    parser.add_argument('--dim', type=int, default=100)
+    parser.add_argument('--num_labels', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,70 @@
+"""
+Distills a trained model into a small student without char features and
+reports the F1 gap and the speedup.
+"""
+import argparse
+import copy
+import json
+import os
+
+from anago.models import BiLSTMCRF, save_model
+from anago.trainer import DistillationTrainer
+from anago.utils import load_data_and_labels
+from anago.wrapper import Sequence
+
+
+def main(args):
+    print('Loading objects...')
+    teacher = Sequence.load(args.weights_file, args.params_file, args.preprocessor_file)
+    x_train, y_train = load_data_and_labels(args.train_data)
+    x_valid, y_valid = load_data_and_labels(args.valid_data)
+    x_test, y_test = load_data_and_labels(args.test_data)
+    if args.unlabeled_data:
+        with open(args.unlabeled_data) as f:
+            x_train += [line.split() for line in f if line.strip()]
+
+    p = copy.deepcopy(teacher.p)
+    p._use_char = args.use_char
+    student = BiLSTMCRF(char_vocab_size=p.char_vocab_size,
+                        word_vocab_size=p.word_vocab_size,
+                        num_labels=p.label_size,
+                        word_lstm_size=args.word_lstm_size,
+                        fc_dim=args.fc_dim,
+                        use_char=args.use_char,
+                        encoder=args.encoder)
+    student, loss = student.build()
+    student.compile(loss=loss, optimizer='adam')
+
+    print('Distilling...')
+    trainer = DistillationTrainer(student, teacher.model, preprocessor=p,
+                                  teacher_preprocessor=teacher.p, temperature=args.temperature)
+    trainer.train(x_train, x_valid=x_valid, y_valid=y_valid,
+                  epochs=args.epochs, batch_size=args.batch_size)
+    print(json.dumps(trainer.compare(x_test, y_test), indent=4))
+
+    if args.save_dir:
+        save_model(student, os.path.join(args.save_dir, 'weights.h5'), os.path.join(args.save_dir, 'params.json'))
+        p.save(os.path.join(args.save_dir, 'preprocessor.pickle'))
+
+
+if __name__ == '__main__':
+    SAVE_DIR = os.path.join(os.path.dirname(__file__), '../tests/models')
+    DATA_DIR = os.path.join(os.path.dirname(__file__), '../data/conll2003/en/ner')
+    parser = argparse.ArgumentParser(description='Benchmarking a distilled student model.')
+    parser.add_argument('--train_data', default=os.path.join(DATA_DIR, 'train.txt'))
+    parser.add_argument('--valid_data', default=os.path.join(DATA_DIR, 'valid.txt'))
+    parser.add_argument('--test_data', default=os.path.join(DATA_DIR, 'test.txt'))
+    parser.add_argument('--unlabeled_data', default=None, help='one whitespace-tokenized sentence per line')
+    parser.add_argument('--weights_file', default=os.path.join(SAVE_DIR, 'weights.h5'))
+    parser.add_argument('--params_file', default=os.path.join(SAVE_DIR, 'params.json'))
+    parser.add_argument('--preprocessor_file', default=os.path.join(SAVE_DIR, 'preprocessor.pickle'))
+    parser.add_argument('--save_dir', default=None, help='directory to save the student to')
+    parser.add_argument('--use_char', action='store_true', help='keep char features in the student')
+    parser.add_argument('--encoder', default='bilstm', choices=['bilstm', 'idcnn'])
+    parser.add_argument('--word_lstm_size', type=int, default=32)
+    parser.add_argument('--fc_dim', type=int, default=32)
+    parser.add_argument('--temperature', type=float, default=1.)
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--batch_size', type=int, default=32)
+    args = parser.parse_args()
+    main(args)
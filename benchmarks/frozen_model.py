@@ -0,0 +1,75 @@
+"""
+Compares the startup of a process loading a model normally and from a frozen
+graph: the time to load it, the time to its first prediction and its resident
+memory. Each load runs in a fresh process. Linux only: the resident memory is
+read from /proc.
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from anago.wrapper import Sequence
+
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024.
+
+
+def worker(args, frozen, graph_file, signature_file, results):
+    start = time.time()
+    if frozen:
+        model = Sequence.load_frozen(graph_file, signature_file, args.preprocessor_file)
+    else:
+        model = Sequence.load(args.weights_file, args.params_file, args.preprocessor_file)
+    load_time = time.time() - start
+    model.analyze(args.sent)
+    first_time = time.time() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+    results.put((load_time, first_time, rss_mb(), peak))
+
+
+def run(args, frozen, graph_file, signature_file):
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    measurements = []
+    for _ in range(args.repeat):
+        p = ctx.Process(target=worker, args=(args, frozen, graph_file, signature_file, results))
+        p.start()
+        measurements.append(results.get())
+        p.join()
+
+    # The median of each measurement.
+    return [sorted(values)[len(values) // 2] for values in zip(*measurements)]
+
+
+def main(args):
+    export_dir = tempfile.mkdtemp()
+    graph_file = os.path.join(export_dir, 'graph.pb')
+    signature_file = os.path.join(export_dir, 'signature.json')
+    model = Sequence.load(args.weights_file, args.params_file, args.preprocessor_file)
+    model.export(graph_file, signature_file)
+    del model
+
+    print('model\tload sec\tfirst prediction sec\tRSS MB\tpeak RSS MB')
+    for frozen in (False, True):
+        load_time, first_time, rss, peak = run(args, frozen, graph_file, signature_file)
+        print('{}\t{:.2f}\t{:.2f}\t{:.1f}\t{:.1f}'.format('frozen' if frozen else 'keras',
+                                                        load_time, first_time, rss, peak))
+
+
+if __name__ == '__main__':
+    SAVE_DIR = os.path.join(os.path.dirname(__file__), '../tests/models')
+    parser = argparse.ArgumentParser(description='Benchmarking startup of frozen models.')
+    parser.add_argument('--sent', default='President Obama is speaking at the White House.')
+    parser.add_argument('--weights_file', default=os.path.join(SAVE_DIR, 'weights.h5'))
+    parser.add_argument('--params_file', default=os.path.join(SAVE_DIR, 'params.json'))
+    parser.add_argument('--preprocessor_file', default=os.path.join(SAVE_DIR, 'preprocessor.pickle'))
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,53 @@
+"""
+Measures the time and heavy dependencies of importing anago modules.
+
+Each statement runs in a fresh interpreter. With `--max_seconds`, the script
+exits with status 1 when a statement is slower or imports a heavy backend, so
+it can be used as a regression check.
+"""
+import argparse
+import subprocess
+import sys
+
+STATEMENTS = [
+    'import anago',
+    'from anago.utils import load_data_and_labels',
+    'from anago.preprocessing import IndexTransformer',
+    'from anago.tagger import Tagger',
+    'from anago import Sequence',
+]
+HEAVY_MODULES = ('keras', 'tensorflow', 'allennlp', 'torch')
+
+
+def measure(statement):
+    code = ('import sys, time\n'
+            't = time.perf_counter()\n'
+            '{}\n'
+            't = time.perf_counter() - t\n'
+            'print(t, *[m for m in {!r} if m in sys.modules])').format(statement, HEAVY_MODULES)
+    out = subprocess.check_output([sys.executable, '-c', code]).decode('utf-8').split()
+
+    return float(out[0]), out[1:]
+
+
+def main(args):
+    failed = False
+    print('seconds\theavy modules\tstatement')
+    for statement in STATEMENTS:
+        times, heavy = zip(*[measure(statement) for _ in range(args.repeat)])
+        seconds = sorted(times)[len(times) // 2]
+        print('{:.3f}\t{}\t{}'.format(seconds, ','.join(heavy[0]) or '-', statement))
+        # Importing Sequence needs Keras, so only the time of the others is checked.
+        if args.max_seconds and statement != 'from anago import Sequence':
+            failed |= seconds > args.max_seconds or bool(heavy[0])
+
+    sys.exit(int(failed))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarking import time.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max_seconds', type=float, default=None,
+                        help='fail when a light import is slower or loads a heavy backend')
+    args = parser.parse_args()
+    main(args)
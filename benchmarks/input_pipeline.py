@@ -0,0 +1,57 @@
+"""
+Compares input pipeline settings of `Trainer.train` on epoch time and the
+fraction of it the model waits for batches.
+"""
+import argparse
+import os
+import time
+
+from anago.models import BiLSTMCRF
+from anago.preprocessing import IndexTransformer
+from anago.trainer import Trainer
+from anago.utils import load_data_and_labels
+
+SETTINGS = {
+    'serial': {'workers': 0},
+    'thread': {'workers': 1},
+    'threads': {'workers': 4},
+    'processes': {'workers': 4, 'use_multiprocessing': True},
+}
+
+
+def main(args):
+    print('Loading dataset...')
+    x_train, y_train = load_data_and_labels(args.train_data)
+    if args.max_train:
+        x_train, y_train = x_train[:args.max_train], y_train[:args.max_train]
+    p = IndexTransformer()
+    p.fit(x_train, y_train)
+
+    print('setting\tsec/epoch\tdata wait')
+    for name in args.settings.split(','):
+        model = BiLSTMCRF(char_vocab_size=p.char_vocab_size,
+                          word_vocab_size=p.word_vocab_size,
+                          num_labels=p.label_size)
+        model, loss = model.build()
+        model.compile(loss=loss, optimizer='adam')
+        trainer = Trainer(model, preprocessor=p)
+
+        start = time.time()
+        trainer.train(x_train, y_train, epochs=args.epochs, batch_size=args.batch_size, verbose=0,
+                      max_queue_size=args.max_queue_size, **SETTINGS[name])
+        epoch_time = (time.time() - start) / args.epochs
+        data_wait = model.history.history['data_wait'][-1]
+        print('{}\t{:.1f}\t{:.1%}'.format(name, epoch_time, data_wait))
+
+
+if __name__ == '__main__':
+    DATA_DIR = os.path.join(os.path.dirname(__file__), '../data/conll2003/en/ner')
+    parser = argparse.ArgumentParser(description='Benchmarking the training input pipeline.')
+    parser.add_argument('--train_data', default=os.path.join(DATA_DIR, 'train.txt'))
+    parser.add_argument('--settings', default=','.join(SETTINGS))
+    parser.add_argument('--epochs', type=int, default=2)
+    parser.add_argument('--batch_size', type=int, default=32)
+    parser.add_argument('--max_queue_size', type=int, default=10)
+    parser.add_argument('--max_train', type=int, default=None, help='number of training sentences')
+    args = parser.parse_args()
+    main(args)
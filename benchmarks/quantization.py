@@ -0,0 +1,56 @@
+"""
+Reports the accuracy and memory of int8 quantized models on a held-out set.
+"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+from anago.utils import load_data_and_labels
+from anago.wrapper import Sequence
+
+
+def weight_bytes(model):
+    return sum(w.nbytes for w in model.get_weights())
+
+
+def embedding_bytes(model):
+    return sum(w.nbytes for w in model.get_layer('word_embedding').get_weights())
+
+
+def main(args):
+    print('Loading objects...')
+    x_test, y_test = load_data_and_labels(args.test_data)
+    model = Sequence.load(args.weights_file, args.params_file, args.preprocessor_file)
+
+    rows = [('float32', model, os.path.getsize(args.weights_file))]
+    tmp_dir = tempfile.mkdtemp()
+    for quantize_kernels in (False, True):
+        weights_file = os.path.join(tmp_dir, 'weights_{}.npz'.format(int(quantize_kernels)))
+        params_file = os.path.join(tmp_dir, 'params_{}.json'.format(int(quantize_kernels)))
+        preprocessor_file = os.path.join(tmp_dir, 'preprocessor.pickle')
+        model.save_quantized(weights_file, params_file, preprocessor_file, quantize_kernels)
+        quantized = Sequence.load_quantized(weights_file, params_file, preprocessor_file)
+        name = 'int8 embedding + kernels' if quantize_kernels else 'int8 embedding'
+        rows.append((name, quantized, os.path.getsize(weights_file)))
+
+    print('model\tf1\tagreement\tembedding MB\tweights MB\tfile MB')
+    y_base = np.concatenate([np.array(y) for y in model.predict(x_test)])
+    for name, m, file_size in rows:
+        y_pred = np.concatenate([np.array(y) for y in m.predict(x_test)])
+        print('{}\t{:.4f}\t{:.4f}\t{:.1f}\t{:.1f}\t{:.1f}'.format(
+            name, m.score(x_test, y_test), np.mean(y_pred == y_base),
+            embedding_bytes(m.model) / 2 ** 20, weight_bytes(m.model) / 2 ** 20, file_size / 2 ** 20))
+
+
+if __name__ == '__main__':
+    SAVE_DIR = os.path.join(os.path.dirname(__file__), '../tests/models')
+    DATA_DIR = os.path.join(os.path.dirname(__file__), '../data/conll2003/en/ner')
+    parser = argparse.ArgumentParser(description='Benchmarking int8 quantization.')
+    parser.add_argument('--test_data', default=os.path.join(DATA_DIR, 'test.txt'))
+    parser.add_argument('--weights_file', default=os.path.join(SAVE_DIR, 'weights.h5'))
+    parser.add_argument('--params_file', default=os.path.join(SAVE_DIR, 'params.json'))
+    parser.add_argument('--preprocessor_file', default=os.path.join(SAVE_DIR, 'preprocessor.pickle'))
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,68 @@
+"""
+Compares the memory of worker processes loading a model normally and from a
+memory-mapped weights file. Linux only: PSS (proportional set size) counts
+shared pages once across processes.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+
+from anago.wrapper import Sequence
+
+
+def pss_mb():
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            if line.startswith('Pss:'):
+                return int(line.split()[1]) / 1024.
+
+
+def worker(args, mapped, weights_file, barrier, results):
+    if mapped:
+        model = Sequence.load_mapped(weights_file, args.preprocessor_file)
+    else:
+        model = Sequence.load(args.weights_file, args.params_file, args.preprocessor_file)
+    model.analyze(args.sent)
+    barrier.wait()
+    results.put(pss_mb())
+    barrier.wait()
+
+
+def run(args, mapped, weights_file):
+    ctx = multiprocessing.get_context('spawn')
+    barrier = ctx.Barrier(args.workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(args, mapped, weights_file, barrier, results))
+             for _ in range(args.workers)]
+    for p in procs:
+        p.start()
+    total = sum(results.get() for _ in procs)
+    for p in procs:
+        p.join()
+
+    return total
+
+
+def main(args):
+    weights_file = os.path.join(tempfile.mkdtemp(), 'weights.bin')
+    model = Sequence.load(args.weights_file, args.params_file, args.preprocessor_file)
+    model.save_mapped(weights_file, os.path.join(os.path.dirname(weights_file), 'preprocessor.pickle'))
+    del model
+
+    print('workers\tweights\ttotal PSS MB')
+    for mapped in (False, True):
+        total = run(args, mapped, weights_file)
+        print('{}\t{}\t{:.1f}'.format(args.workers, 'mapped' if mapped else 'h5', total))
+
+
+if __name__ == '__main__':
+    SAVE_DIR = os.path.join(os.path.dirname(__file__), '../tests/models')
+    parser = argparse.ArgumentParser(description='Benchmarking memory of memory-mapped weights.')
+    parser.add_argument('--sent', default='President Obama is speaking at the White House.')
+    parser.add_argument('--weights_file', default=os.path.join(SAVE_DIR, 'weights.h5'))
+    parser.add_argument('--params_file', default=os.path.join(SAVE_DIR, 'params.json'))
+    parser.add_argument('--preprocessor_file', default=os.path.join(SAVE_DIR, 'preprocessor.pickle'))
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    main(args)
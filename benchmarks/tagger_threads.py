@@ -0,0 +1,58 @@
+"""
+Measures how Tagger throughput scales with the number of calling threads.
+"""
+import argparse
+import os
+import threading
+import time
+
+from anago.tagger import Tagger
+from anago.wrapper import Sequence
+
+
+def run(tagger, text, num_threads, duration):
+    count = [0] * num_threads
+    stop = time.time() + duration
+
+    def worker(i):
+        while time.time() < stop:
+            tagger.analyze(text)
+            count[i] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return sum(count) / duration
+
+
+def main(args):
+    print('Loading objects...')
+    model = Sequence.load(args.weights_file, args.params_file, args.preprocessor_file)
+    tagger = Tagger(model.model, preprocessor=model.p, concurrency=args.concurrency)
+    tagger.analyze(args.sent)
+
+    print('threads\tsents/sec\tspeedup')
+    base = None
+    num_threads = 1
+    while num_threads <= args.max_threads:
+        qps = run(tagger, args.sent, num_threads, args.duration)
+        base = base or qps
+        print('{}\t{:.1f}\t{:.2f}'.format(num_threads, qps, qps / base))
+        num_threads *= 2
+
+
+if __name__ == '__main__':
+    SAVE_DIR = os.path.join(os.path.dirname(__file__), '../tests/models')
+    parser = argparse.ArgumentParser(description='Benchmarking multi-threaded tagging.')
+    parser.add_argument('--sent', default='President Obama is speaking at the White House.')
+    parser.add_argument('--weights_file', default=os.path.join(SAVE_DIR, 'weights.h5'))
+    parser.add_argument('--params_file', default=os.path.join(SAVE_DIR, 'params.json'))
+    parser.add_argument('--preprocessor_file', default=os.path.join(SAVE_DIR, 'preprocessor.pickle'))
+    parser.add_argument('--max_threads', type=int, default=os.cpu_count())
+    parser.add_argument('--concurrency', type=int, default=None)
+    parser.add_argument('--duration', type=float, default=5.)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,58 @@
+"""
+Compares the word BiLSTM and iterated dilated CNN encoders on training time,
+tagging speed by sentence length and F1.
+"""
+import argparse
+import os
+import time
+
+from anago.utils import load_data_and_labels
+from anago.wrapper import Sequence
+
+
+def main(args):
+    print('Loading dataset...')
+    x_train, y_train = load_data_and_labels(args.train_data)
+    x_valid, y_valid = load_data_and_labels(args.valid_data)
+    x_test, y_test = load_data_and_labels(args.test_data)
+    if args.max_train:
+        x_train, y_train = x_train[:args.max_train], y_train[:args.max_train]
+
+    print('encoder\ttrain sec/epoch\t{}\tf1'.format(
+        '\t'.join('sents/sec@{}'.format(length) for length in args.lengths)))
+    for encoder in args.encoders.split(','):
+        model = Sequence(encoder=encoder)
+        start = time.time()
+        model.fit(x_train, y_train, x_valid, y_valid,
+                  epochs=args.epochs, batch_size=args.batch_size, verbose=0)
+        train_time = (time.time() - start) / args.epochs
+
+        speeds = []
+        for length in args.lengths:
+            sents = [x for x in x_test if len(x) >= length]
+            sents = [x[:length] for x in sents] * (args.num_sents // max(len(sents), 1) + 1)
+            sents = sents[:args.num_sents]
+            start = time.time()
+            model.predict(sents)
+            speeds.append(len(sents) / (time.time() - start))
+
+        print('{}\t{:.1f}\t{}\t{:.4f}'.format(encoder, train_time,
+                                               '\t'.join('{:.1f}'.format(s) for s in speeds),
+                                               model.score(x_test, y_test)))
+
+
+if __name__ == '__main__':
+    DATA_DIR = os.path.join(os.path.dirname(__file__), '../data/conll2003/en/ner')
+    parser = argparse.ArgumentParser(description='Benchmarking word encoders.')
+    parser.add_argument('--train_data', default=os.path.join(DATA_DIR, 'train.txt'))
+    parser.add_argument('--valid_data', default=os.path.join(DATA_DIR, 'valid.txt'))
+    parser.add_argument('--test_data', default=os.path.join(DATA_DIR, 'test.txt'))
+    parser.add_argument('--encoders', default='bilstm,idcnn')
+    parser.add_argument('--lengths', type=int, nargs='+', default=[10, 20, 40],
+                        help='sentence lengths to measure tagging speed at')
+    parser.add_argument('--num_sents', type=int, default=1000)
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--batch_size', type=int, default=32)
+    parser.add_argument('--max_train', type=int, default=None, help='number of training sentences')
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import threading
+import unittest
+
+from anago.aio import AsyncTagger
+from anago.models import load_model
+from anago.preprocessing import IndexTransformer
+from anago.tagger import Tagger
+
+SAVE_ROOT = os.path.join(os.path.dirname(__file__), 'models')
+
+
+class SlowTagger(object):
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def analyze_batch(self, texts):
+        self.started.set()
+        self.release.wait(5)
+        return [{'text': text} for text in texts]
+
+
+class TestAsyncTagger(unittest.TestCase):
+
+    def test_analyze(self):
+        weights_file = os.path.join(SAVE_ROOT, 'weights.h5')
+        params_file = os.path.join(SAVE_ROOT, 'params.json')
+        preprocessor_file = os.path.join(SAVE_ROOT, 'preprocessor.pickle')
+        p = IndexTransformer.load(preprocessor_file)
+        model = load_model(weights_file, params_file)
+        tagger = Tagger(model, preprocessor=p)
+        async_tagger = AsyncTagger(tagger, max_batch_size=4)
+
+        texts = ['President Obama is speaking at the White House.'] * 10
+
+        async def analyze_all():
+            res = await asyncio.gather(*[async_tagger.analyze(text) for text in texts])
+            await async_tagger.close()
+            return res
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        res = loop.run_until_complete(analyze_all())
+        loop.close()
+        self.assertEqual(len(res), len(texts))
+        for text, r in zip(texts, res):
+            self.assertEqual(r, tagger.analyze(text))
+
+    def test_close_cancels_running_batch(self):
+        tagger = SlowTagger()
+        async_tagger = AsyncTagger(tagger, max_batch_size=2)
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        async def close_while_running():
+            futures = [asyncio.ensure_future(async_tagger.analyze(text)) for text in 'abc']
+            # Wait until the first batch is in the executor.
+            await loop.run_in_executor(None, tagger.started.wait, 5)
+            await async_tagger.close()
+            tagger.release.set()
+            # Unresolved futures would hang, so fail on a timeout instead.
+            return await asyncio.wait_for(asyncio.gather(*futures, return_exceptions=True), 5)
+
+        res = loop.run_until_complete(close_while_running())
+        loop.close()
+        self.assertEqual(len(res), 3)
+        for r in res:
+            self.assertIsInstance(r, asyncio.CancelledError)
@@ -0,0 +1,31 @@
+import unittest
+
+from anago.benchmark import benchmark_crf, recommend_crf_config
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_benchmark_crf(self):
+        results = benchmark_crf(lengths=[5, 10], num_labels=[4], batch_sizes=[2], dim=8, repeat=1)
+        self.assertEqual(len(results), 2 * 3 * 3)
+        for r in results:
+            self.assertGreater(r['seconds'], 0)
+
+    def test_recommend_crf_config(self):
+        results = []
+        for mode, factor in [('loop', 1.0), ('unroll', 0.5), ('parallel', 0.8)]:
+            for length in [10, 25, 50]:
+                results.append({'path': 'viterbi', 'mode': mode, 'length': length,
+                                'num_labels': 10, 'batch_size': 32, 'seconds': factor * length})
+
+        config = recommend_crf_config(results, [3, 8, 12, 60])
+        self.assertEqual(config['mode'], 'parallel')
+        self.assertEqual(config['crf_options'], {'parallel': True})
+        self.assertEqual(config['buckets'], [10, 25, 50])
+
+        config = recommend_crf_config(results, [3, 8], static_length=True)
+        self.assertEqual(config['crf_options'], {'unroll': True})
+        self.assertEqual(config['buckets'], [10])
+
+        with self.assertRaises(ValueError):
+            recommend_crf_config(results, [3], path='loss')
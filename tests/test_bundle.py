@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from anago.bundle import save_bundle, load_bundle
+from anago.models import BiLSTMCRF
+from anago.preprocessing import IndexTransformer
+
+
+class TestBundle(unittest.TestCase):
+
+    def setUp(self):
+        self.save_root = tempfile.mkdtemp()
+        self.path = os.path.join(self.save_root, 'model.bundle')
+        x = [['EU', 'rejects', 'German', 'call'], ['Peter', 'Blackburn']]
+        y = [['B-ORG', 'O', 'B-MISC', 'O'], ['B-PER', 'I-PER']]
+        self.x = x
+        self.p = IndexTransformer().fit(x, y)
+        self.model, _ = BiLSTMCRF(char_vocab_size=self.p.char_vocab_size,
+                                  word_vocab_size=self.p.word_vocab_size,
+                                  num_labels=self.p.label_size).build()
+
+    def tearDown(self):
+        shutil.rmtree(self.save_root)
+
+    def test_save_and_load(self):
+        save_bundle(self.path, self.model, self.p)
+        self.assertEqual(os.listdir(self.save_root), ['model.bundle'])
+
+        for mapped in (False, True):
+            model, p = load_bundle(self.path, mapped=mapped)
+            for name in ('_word_vocab', '_char_vocab', '_label_vocab'):
+                self.assertEqual(getattr(p, name).vocab, getattr(self.p, name).vocab)
+                self.assertEqual(getattr(p, name)._token_count, getattr(self.p, name)._token_count)
+            np.testing.assert_array_equal(p.transform(self.x)[1], self.p.transform(self.x)[1])
+            np.testing.assert_allclose(model.predict(p.transform(self.x)),
+                                       self.model.predict(self.p.transform(self.x)))
+
+    def test_verify(self):
+        save_bundle(self.path, self.model, self.p)
+        with open(self.path, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            byte = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([byte[0] ^ 1]))
+
+        with self.assertRaises(ValueError):
+            load_bundle(self.path)
+        load_bundle(self.path, verify=False)
@@ -0,0 +1,100 @@
+import random
+import time
+import unittest
+
+from seqeval.metrics import f1_score
+
+from anago.callbacks import DataWait, F1score
+from anago.preprocessing import IndexTransformer, MultiLabelIndexTransformer
+
+
+class BatchSequence(object):
+
+    def __init__(self, x, y, batch_size, preprocess):
+        self.x = x
+        self.y = y
+        self.batch_size = batch_size
+        self.preprocess = preprocess
+        self.calls = 0
+
+    def __getitem__(self, idx):
+        self.calls += 1
+        batch = slice(idx * self.batch_size, (idx + 1) * self.batch_size)
+        return self.preprocess(self.x[batch], self.y[batch])
+
+    def __len__(self):
+        return -(-len(self.x) // self.batch_size)
+
+
+class PredictionModel(object):
+    """Returns the one-hot labels of fixed predictions, batch after batch."""
+
+    def __init__(self, seq):
+        self.seq = seq
+        self.i = 0
+
+    def predict_on_batch(self, x):
+        _, y = self.seq[self.i]
+        self.i = (self.i + 1) % len(self.seq)
+        if isinstance(y, list):
+            return [y_task.astype('float32') for y_task in y]
+        return y.astype('float32')
+
+
+class TestF1score(unittest.TestCase):
+
+    def setUp(self):
+        labels = ['O', 'B-PER', 'I-PER', 'B-LOC', 'I-LOC']
+        self.x = [['w{}'.format(random.randint(0, 20)) for _ in range(random.randint(1, 9))] for _ in range(50)]
+        self.y = [[random.choice(labels) for _ in sent] for sent in self.x]
+        self.y_pred = [[random.choice(labels) if random.random() < 0.3 else tag for tag in tags]
+                       for tags in self.y]
+        self.p = IndexTransformer().fit(self.x, self.y)
+
+    def test_f1(self):
+        seq = BatchSequence(self.x, self.y, 8, self.p.transform)
+        f1 = F1score(seq, preprocessor=self.p, report_every=2)
+        f1.model = PredictionModel(BatchSequence(self.x, self.y_pred, 8, self.p.transform))
+        for epoch in range(3):
+            logs = {}
+            f1.on_epoch_end(epoch, logs)
+            self.assertAlmostEqual(logs['f1'], f1_score(self.y, self.y_pred))
+        # The validation data is transformed once.
+        self.assertEqual(seq.calls, len(seq))
+
+    def test_multi_task_f1(self):
+        chunks = ['B-NP', 'I-NP', 'B-VP']
+        y_chunk = [[random.choice(chunks) for _ in sent] for sent in self.x]
+        y_chunk_pred = [[random.choice(chunks) if random.random() < 0.5 else tag for tag in tags]
+                        for tags in y_chunk]
+        y = list(zip(self.y, y_chunk))
+        y_pred = list(zip(self.y_pred, y_chunk_pred))
+        p = MultiLabelIndexTransformer(['ner', 'chunk']).fit(self.x, y)
+        f1 = F1score(BatchSequence(self.x, y, 8, p.transform), preprocessor=p, report_every=1)
+        f1.model = PredictionModel(BatchSequence(self.x, y_pred, 8, p.transform))
+        logs = {}
+        f1.on_epoch_end(0, logs)
+        self.assertAlmostEqual(logs['ner_f1'], f1_score(self.y, self.y_pred))
+        self.assertAlmostEqual(logs['chunk_f1'], f1_score(y_chunk, y_chunk_pred))
+        self.assertAlmostEqual(logs['f1'], (logs['ner_f1'] + logs['chunk_f1']) / 2)
+
+    def test_get_lengths(self):
+        _, y = self.p.transform(self.x[:8], self.y[:8])
+        f1 = F1score(None, preprocessor=self.p)
+        self.assertEqual(f1.get_lengths(y).tolist(), [len(sent) for sent in self.x[:8]])
+
+
+class TestDataWait(unittest.TestCase):
+
+    def test_data_wait(self):
+        callback = DataWait(verbose=0)
+        logs = {}
+        callback.on_epoch_begin(0)
+        for batch in range(3):
+            time.sleep(0.03)  # waiting for the batch
+            callback.on_batch_begin(batch)
+            time.sleep(0.01)  # training on it
+            callback.on_batch_end(batch)
+        callback.on_epoch_end(0, logs)
+        self.assertGreater(logs['data_wait'], 0.5)
+        self.assertLess(logs['data_wait'], 1)
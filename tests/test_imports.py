@@ -0,0 +1,38 @@
+import subprocess
+import sys
+import unittest
+
+HEAVY_MODULES = ('keras', 'tensorflow', 'allennlp', 'torch')
+
+
+def imported_modules(statement):
+    code = '{}\nimport sys\nprint(" ".join(sys.modules))'.format(statement)
+    out = subprocess.check_output([sys.executable, '-c', code])
+    return set(out.decode('utf-8').split())
+
+
+@unittest.skipIf(sys.version_info < (3, 7), 'lazy imports need Python 3.7')
+class TestImports(unittest.TestCase):
+
+    def assertNotHeavy(self, statement):
+        modules = imported_modules(statement)
+        for name in HEAVY_MODULES:
+            self.assertNotIn(name, modules, '`{}` imports {}'.format(statement, name))
+
+    def test_import_anago(self):
+        self.assertNotHeavy('import anago')
+
+    def test_import_utils(self):
+        self.assertNotHeavy('from anago.utils import load_data_and_labels, Vocabulary')
+
+    def test_import_preprocessing(self):
+        self.assertNotHeavy('from anago.preprocessing import IndexTransformer')
+
+    def test_import_tagger(self):
+        self.assertNotHeavy('from anago.tagger import Tagger')
+
+    def test_lazy_attributes(self):
+        import anago
+        from anago.tagger import Tagger
+        self.assertIs(anago.Tagger, Tagger)
+        self.assertIn('Sequence', dir(anago))
@@ -0,0 +1,184 @@
+import unittest
+
+import keras.backend as K
+import numpy as np
+from keras.layers import Embedding, Input
+from keras.models import Model
+
+from anago.layers import CRF
+from anago.utils import allowed_transitions
+
+
+def build_model(crf, vocab_size=50, dim=8, compile=True):
+    word_ids = Input(batch_shape=(None, None), dtype='int32')
+    x = Embedding(vocab_size, dim, mask_zero=True, name='embedding')(word_ids)
+    pred = crf(x)
+    model = Model(inputs=word_ids, outputs=pred)
+    if compile:
+        model.compile(loss=crf.loss_function, optimizer='adam')
+    return model
+
+
+class TestParallelCRF(unittest.TestCase):
+
+    def setUp(self):
+        self.num_labels = 5
+        self.crf = CRF(self.num_labels, sparse_target=False, name='crf')
+        self.parallel_crf = CRF(self.num_labels, sparse_target=False, parallel=True, name='crf')
+        self.model = build_model(self.crf)
+        self.parallel_model = build_model(self.parallel_crf)
+        for layer in self.model.layers:
+            self.parallel_model.get_layer(layer.name).set_weights(layer.get_weights())
+
+        lengths = [9, 6, 1, 4]
+        self.x = np.zeros((len(lengths), max(lengths)), dtype='int32')
+        self.y = np.zeros((len(lengths), max(lengths), self.num_labels))
+        for i, length in enumerate(lengths):
+            self.x[i, :length] = np.random.randint(1, 50, size=length)
+            self.y[i, np.arange(length), np.random.randint(0, self.num_labels, size=length)] = 1
+
+    def test_loss(self):
+        loss = self.model.evaluate(self.x, self.y, verbose=0)
+        parallel_loss = self.parallel_model.evaluate(self.x, self.y, verbose=0)
+        self.assertAlmostEqual(loss, parallel_loss, places=4)
+
+    def test_viterbi(self):
+        y = self.model.predict(self.x)
+        np.testing.assert_array_equal(self.parallel_model.predict(self.x), y)
+
+    def test_marginal(self):
+        def marginal(crf, model):
+            X = model.get_layer('embedding').output
+            mask = model.get_layer('embedding').compute_mask(model.input)
+            f = K.function([model.input], [crf.get_marginal_prob(X, mask)])
+            return f([self.x])[0]
+
+        np.testing.assert_allclose(marginal(self.parallel_crf, self.parallel_model),
+                                   marginal(self.crf, self.model), rtol=1e-4, atol=1e-6)
+
+    def test_gradient(self):
+        self.model.train_on_batch(self.x, self.y)
+        self.parallel_model.train_on_batch(self.x, self.y)
+        for w, parallel_w in zip(self.model.get_weights(), self.parallel_model.get_weights()):
+            np.testing.assert_allclose(parallel_w, w, rtol=1e-4, atol=1e-6)
+
+    def test_get_config(self):
+        config = self.parallel_crf.get_config()
+        self.assertTrue(config['parallel'])
+        self.assertTrue(CRF.from_config(config).parallel)
+
+
+class TestIndexOutput(unittest.TestCase):
+
+    def test_index_output(self):
+        crf = CRF(5, sparse_target=False, viterbi_output='index', parallel=True)
+        model = build_model(crf, compile=False)
+        x = np.random.randint(1, 50, size=(3, 6))
+        x[1, 4:] = 0
+        y = model.predict(x)
+        self.assertEqual(y.shape, (3, 6))
+
+        onehot = build_model(CRF(5, sparse_target=False))
+        onehot.set_weights(model.get_weights())
+        np.testing.assert_array_equal(y, np.argmax(onehot.predict(x), -1))
+
+    def test_index_output_cannot_be_trained(self):
+        crf = CRF(5, viterbi_output='index')
+        with self.assertRaises(ValueError):
+            crf.loss_function
+        with self.assertRaises(ValueError):
+            CRF(5, learn_mode='marginal', viterbi_output='index')
+
+
+class TestConstrainedViterbi(unittest.TestCase):
+
+    def setUp(self):
+        self.labels = ['<pad>', 'O', 'B-A', 'I-A', 'B-B', 'I-B']
+        self.x = np.random.randint(1, 50, size=(8, 7))
+        self.x[2, 3:] = 0
+
+    def build(self, **kwargs):
+        crf = CRF(len(self.labels), sparse_target=False, name='crf', **kwargs)
+        model = build_model(crf, compile=False)
+        # Lower energies are better, so I-B wins every word on its own.
+        kernel, chain_kernel, bias, left, right = model.get_layer('crf').get_weights()
+        bias[self.labels.index('I-B')] = -5
+        model.get_layer('crf').set_weights([kernel, chain_kernel, bias, left, right])
+        return model
+
+    def assert_valid(self, y, x, labels=None, scheme='BIO'):
+        labels = labels or self.labels
+        pairs = set(allowed_transitions(labels, scheme))
+        start, end = len(labels), len(labels) + 1
+        for ids, words in zip(np.argmax(y, -1), x):
+            ids = [start] + ids[words > 0].tolist() + [end]
+            for pair in zip(ids[:-1], ids[1:]):
+                self.assertIn(pair, pairs)
+
+    def test_allowed_transitions(self):
+        model = self.build()
+        y = np.argmax(model.predict(self.x), -1)
+        self.assertTrue((y[self.x > 0] == self.labels.index('I-B')).all())
+
+        pairs = allowed_transitions(self.labels)
+        constrained = self.build(allowed_transitions=pairs)
+        constrained.set_weights(model.get_weights())
+        self.assert_valid(constrained.predict(self.x), self.x)
+
+    def test_allowed_end(self):
+        labels = ['<pad>', 'O', 'B-A', 'I-A', 'E-A', 'S-A']
+        crf = CRF(len(labels), sparse_target=False, name='crf')
+        model = build_model(crf, compile=False)
+        # B-A wins every word on its own, so the best path ends on B-A.
+        kernel, chain_kernel, bias, left, right = crf.get_weights()
+        bias[labels.index('B-A')] = -5
+        crf.set_weights([kernel, chain_kernel, bias, left, right])
+        x = np.random.randint(1, 50, size=(4, 7))
+        x[1, 5:] = 0
+        x[3, 2:] = 0
+        y = np.argmax(model.predict(x), -1)
+        self.assertTrue((y[x > 0] == labels.index('B-A')).all())
+
+        constrained = build_model(CRF(len(labels), sparse_target=False, name='crf',
+                                      allowed_transitions=allowed_transitions(labels, 'BIOES')),
+                                  compile=False)
+        constrained.set_weights(model.get_weights())
+        y = constrained.predict(x)
+        self.assert_valid(y, x, labels, 'BIOES')
+        for ids, words in zip(np.argmax(y, -1), x):
+            self.assertIn(labels[ids[words > 0][-1]], ('O', 'E-A', 'S-A'))
+
+    def test_beam(self):
+        pairs = allowed_transitions(self.labels)
+        model = self.build(allowed_transitions=pairs)
+        full_beam = self.build(allowed_transitions=pairs, beam_size=len(self.labels))
+        beam = self.build(allowed_transitions=pairs, beam_size=2)
+        full_beam.set_weights(model.get_weights())
+        beam.set_weights(model.get_weights())
+        y = model.predict(self.x)
+        np.testing.assert_array_equal(full_beam.predict(self.x), y)
+        self.assert_valid(beam.predict(self.x), self.x)
+
+        # Word i strongly prefers label i, so a valid sequence of those labels
+        # is the best path and a narrow beam finds it too.
+        embeddings = np.zeros((50, 8))
+        embeddings[:len(self.labels)] = -10 * np.eye(8)[:len(self.labels)]
+        kernel = np.eye(8, len(self.labels))
+        _, _, chain_kernel, bias, left, right = model.get_weights()
+        model.set_weights([embeddings, kernel, chain_kernel, np.zeros_like(bias), left, right])
+        beam.set_weights(model.get_weights())
+        x = np.array([[1, 2, 3, 3, 1, 4, 5],
+                      [4, 5, 5, 2, 3, 0, 0],
+                      [2, 1, 4, 5, 1, 0, 0]])
+        np.testing.assert_array_equal(np.argmax(model.predict(x), -1)[x > 0], x[x > 0])
+        np.testing.assert_array_equal(np.argmax(beam.predict(x), -1)[x > 0], x[x > 0])
+
+    def test_get_config(self):
+        pairs = allowed_transitions(self.labels)
+        crf = CRF.from_config(CRF(len(self.labels), allowed_transitions=pairs, beam_size=3).get_config())
+        self.assertEqual(crf.allowed_transitions, [list(pair) for pair in pairs])
+        self.assertEqual(crf.beam_size, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
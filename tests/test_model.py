@@ -2,7 +2,12 @@ import os
 import shutil
 import unittest
 
-from anago.models import BiLSTMCRF, load_model, save_model
+import keras.backend as K
+import numpy as np
+
+from anago.layers import quantize
+from anago.models import BiLSTMCRF, MultiTaskBiLSTMCRF, load_model, save_model, freeze_model, load_frozen_model
+from anago.models import quantize_model, load_quantized_model, save_mapped_model, load_mapped_model
 
 
 class TestModel(unittest.TestCase):
@@ -18,6 +23,11 @@ class TestModel(unittest.TestCase):
             os.remove(cls.weights_file)
         if os.path.exists(cls.weights_file):
             os.remove(cls.params_file)
+        cls.graph_file = os.path.join(cls.save_root, 'graph.pb')
+        cls.signature_file = os.path.join(cls.save_root, 'signature.json')
+        cls.quantized_weights_file = os.path.join(cls.save_root, 'weights.npz')
+        cls.quantized_params_file = os.path.join(cls.save_root, 'quantized_params.json')
+        cls.mapped_weights_file = os.path.join(cls.save_root, 'weights.bin')
 
     @classmethod
     def tearDownClass(cls):
@@ -48,6 +58,31 @@ class TestModel(unittest.TestCase):
                           use_char=False)
         model.build()
 
+        # Character CNN.
+        model = BiLSTMCRF(char_vocab_size=char_vocab_size,
+                          word_vocab_size=word_vocab_size,
+                          num_labels=num_labels,
+                          char_encoder='cnn')
+        model.build()
+
+        # Dilated CNN word encoder.
+        model = BiLSTMCRF(char_vocab_size=char_vocab_size,
+                          word_vocab_size=word_vocab_size,
+                          num_labels=num_labels,
+                          encoder='idcnn')
+        model.build()
+
+        with self.assertRaises(ValueError):
+            BiLSTMCRF(char_vocab_size=char_vocab_size,
+                      word_vocab_size=word_vocab_size,
+                      num_labels=num_labels,
+                      char_encoder='gru')
+        with self.assertRaises(ValueError):
+            BiLSTMCRF(char_vocab_size=char_vocab_size,
+                      word_vocab_size=word_vocab_size,
+                      num_labels=num_labels,
+                      encoder='transformer')
+
     def test_save_and_load(self):
         char_vocab_size = 100
         word_vocab_size = 10000
@@ -67,3 +102,180 @@ class TestModel(unittest.TestCase):
         self.assertTrue(os.path.exists(self.params_file))
 
         model = load_model(self.weights_file, self.params_file)
+
+    def test_freeze_and_load(self):
+        char_vocab_size = 100
+        word_vocab_size = 10000
+        num_labels = 10
+
+        model = BiLSTMCRF(char_vocab_size=char_vocab_size,
+                          word_vocab_size=word_vocab_size,
+                          num_labels=num_labels)
+        model, loss = model.build()
+        freeze_model(model, self.graph_file, self.signature_file)
+        frozen = load_frozen_model(self.graph_file, self.signature_file)
+
+        word_ids = np.random.randint(1, word_vocab_size, size=(4, 7))
+        char_ids = np.random.randint(1, char_vocab_size, size=(4, 7, 5))
+        np.testing.assert_allclose(frozen.predict([word_ids, char_ids]),
+                                   model.predict([word_ids, char_ids]))
+
+    def test_quantize(self):
+        x = np.random.randn(100, 30).astype('float32')
+        x[3] = 0
+        q, scales = quantize(x, axis=1)
+        self.assertEqual(q.dtype, np.int8)
+        self.assertEqual(scales.shape, (100,))
+        np.testing.assert_allclose(q * scales[:, None], x, atol=np.abs(x).max() / 127)
+        self.assertTrue((q[3] == 0).all())
+
+    def test_quantize_and_load(self):
+        char_vocab_size = 100
+        word_vocab_size = 10000
+        num_labels = 10
+
+        model = BiLSTMCRF(char_vocab_size=char_vocab_size,
+                          word_vocab_size=word_vocab_size,
+                          num_labels=num_labels)
+        model, loss = model.build()
+        word_ids = np.random.randint(1, word_vocab_size, size=(16, 10))
+        char_ids = np.random.randint(1, char_vocab_size, size=(16, 10, 5))
+        word_ids[1, 6:] = 0
+        y = np.argmax(model.predict([word_ids, char_ids]), -1)
+        prob = self.marginal(model, [word_ids, char_ids])
+
+        for quantize_kernels in (False, True):
+            with self.subTest(quantize_kernels=quantize_kernels):
+                quantize_model(model, self.quantized_weights_file, self.quantized_params_file,
+                               quantize_kernels=quantize_kernels)
+                quantized = load_quantized_model(self.quantized_weights_file, self.quantized_params_file)
+
+                layer = quantized.get_layer('word_embedding')
+                embeddings, scales = layer.get_weights()
+                self.assertEqual(embeddings.dtype, np.int8)
+                np.testing.assert_allclose(embeddings * scales[:, None],
+                                           model.get_layer('word_embedding').get_weights()[0],
+                                           atol=1e-3)
+
+                # int8 weights are off by up to half a step of 1/127 of a row's
+                # largest value, so the predictions differ only near ties.
+                y_quantized = np.argmax(quantized.predict([word_ids, char_ids]), -1)
+                self.assertGreaterEqual(np.mean(y_quantized[word_ids > 0] == y[word_ids > 0]), 0.95)
+                np.testing.assert_allclose(self.marginal(quantized, [word_ids, char_ids]), prob, atol=0.02)
+
+    def marginal(self, model, x):
+        crf = model.layers[-1]
+        f = K.function(model.inputs, [crf.get_marginal_prob(crf.input, crf.input_mask)])
+        return f(x)[0]
+
+    def test_save_and_load_mapped(self):
+        char_vocab_size = 100
+        word_vocab_size = 10000
+        num_labels = 10
+
+        model = BiLSTMCRF(char_vocab_size=char_vocab_size,
+                          word_vocab_size=word_vocab_size,
+                          num_labels=num_labels)
+        model, loss = model.build()
+        save_mapped_model(model, self.mapped_weights_file)
+        mapped = load_mapped_model(self.mapped_weights_file)
+        self.assertEqual(mapped.get_layer('word_embedding').matrix.shape,
+                         (word_vocab_size, 100))
+
+        word_ids = np.random.randint(1, word_vocab_size, size=(4, 7))
+        char_ids = np.random.randint(1, char_vocab_size, size=(4, 7, 5))
+        np.testing.assert_allclose(mapped.predict([word_ids, char_ids]),
+                                   model.predict([word_ids, char_ids]))
+
+    def test_save_and_load_char_cnn(self):
+        char_vocab_size = 100
+        word_vocab_size = 10000
+        num_labels = 10
+
+        model = BiLSTMCRF(char_vocab_size=char_vocab_size,
+                          word_vocab_size=word_vocab_size,
+                          num_labels=num_labels,
+                          char_encoder='cnn')
+        model, loss = model.build()
+        weights_file = os.path.join(self.save_root, 'cnn_weights.h5')
+        params_file = os.path.join(self.save_root, 'cnn_params.json')
+        save_model(model, weights_file, params_file)
+        loaded = load_model(weights_file, params_file)
+
+        # Padding does not change the predictions of real words.
+        word_ids = np.random.randint(1, word_vocab_size, size=(4, 7))
+        char_ids = np.random.randint(1, char_vocab_size, size=(4, 7, 5))
+        char_ids[:, :, 3:] = 0
+        y = loaded.predict([word_ids, char_ids])
+        np.testing.assert_allclose(y, model.predict([word_ids, char_ids]))
+        padded = [word_ids, np.pad(char_ids, [(0, 0), (0, 0), (0, 6)], 'constant')]
+        np.testing.assert_allclose(loaded.predict(padded), y)
+        padded = [np.pad(word_ids, [(0, 0), (0, 3)], 'constant'),
+                  np.pad(char_ids, [(0, 0), (0, 3), (0, 6)], 'constant')]
+        np.testing.assert_allclose(loaded.predict(padded)[:, :7], y)
+
+    def test_save_and_load_idcnn(self):
+        char_vocab_size = 100
+        word_vocab_size = 10000
+        num_labels = 10
+
+        model = BiLSTMCRF(char_vocab_size=char_vocab_size,
+                          word_vocab_size=word_vocab_size,
+                          num_labels=num_labels,
+                          encoder='idcnn')
+        model, loss = model.build()
+        weights_file = os.path.join(self.save_root, 'idcnn_weights.h5')
+        params_file = os.path.join(self.save_root, 'idcnn_params.json')
+        save_model(model, weights_file, params_file)
+        loaded = load_model(weights_file, params_file)
+
+        # Padding does not change the predictions of real words.
+        word_ids = np.random.randint(1, word_vocab_size, size=(4, 7))
+        char_ids = np.random.randint(1, char_vocab_size, size=(4, 7, 5))
+        y = loaded.predict([word_ids, char_ids])
+        np.testing.assert_allclose(y, model.predict([word_ids, char_ids]))
+        padded = [np.pad(word_ids, [(0, 0), (0, 3)], 'constant'),
+                  np.pad(char_ids, [(0, 0), (0, 3), (0, 0)], 'constant')]
+        np.testing.assert_allclose(loaded.predict(padded)[:, :7], y)
+
+    def test_build_multi_task_model(self):
+        char_vocab_size = 100
+        word_vocab_size = 10000
+        num_labels = [10, 5]
+
+        model = MultiTaskBiLSTMCRF(char_vocab_size=char_vocab_size,
+                                   word_vocab_size=word_vocab_size,
+                                   num_labels=num_labels,
+                                   task_names=['ner', 'chunk'])
+        model, losses = model.build()
+        self.assertEqual(len(losses), 2)
+        self.assertEqual(len(model.outputs), 2)
+        model.get_layer('ner_crf')
+        model.get_layer('chunk_crf')
+
+        word_ids = np.random.randint(1, word_vocab_size, size=(4, 7))
+        char_ids = np.random.randint(1, char_vocab_size, size=(4, 7, 5))
+        y_ner, y_chunk = model.predict([word_ids, char_ids])
+        self.assertEqual(y_ner.shape, (4, 7, 10))
+        self.assertEqual(y_chunk.shape, (4, 7, 5))
+
+    def test_load_with_index_output(self):
+        char_vocab_size = 100
+        word_vocab_size = 10000
+        num_labels = 10
+
+        model = BiLSTMCRF(char_vocab_size=char_vocab_size,
+                          word_vocab_size=word_vocab_size,
+                          num_labels=num_labels)
+        model, loss = model.build()
+        weights_file = os.path.join(self.save_root, 'index_weights.h5')
+        params_file = os.path.join(self.save_root, 'index_params.json')
+        save_model(model, weights_file, params_file)
+        loaded = load_model(weights_file, params_file, crf_options={'viterbi_output': 'index'})
+
+        word_ids = np.random.randint(1, word_vocab_size, size=(4, 7))
+        char_ids = np.random.randint(1, char_vocab_size, size=(4, 7, 5))
+        y = loaded.predict([word_ids, char_ids])
+        self.assertEqual(y.shape, (4, 7))
+        self.assertTrue(np.issubdtype(y.dtype, np.integer))
+        np.testing.assert_array_equal(y, np.argmax(model.predict([word_ids, char_ids]), -1))
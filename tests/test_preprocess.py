@@ -4,7 +4,7 @@ import unittest
 
 import numpy as np
 
-from anago.preprocessing import IndexTransformer, pad_nested_sequences
+from anago.preprocessing import IndexTransformer, MultiLabelIndexTransformer, pad_nested_sequences
 
 
 class TestIndexTransformer(unittest.TestCase):
@@ -117,6 +117,18 @@ class TestIndexTransformer(unittest.TestCase):
         inv_y = it.inverse_transform(y, lengths)
         self.assertEqual(inv_y, self.y)
 
+    def test_inverse_transform_ids(self):
+        it = IndexTransformer()
+        x, y = it.fit_transform(self.x, self.y)
+        lengths = list(map(len, self.y))
+        ids = np.argmax(y, -1)
+        inv_y = it.inverse_transform(ids, lengths)
+        self.assertEqual(inv_y, self.y)
+
+        inv_ids = it.inverse_transform(y, lengths, return_ids=True)
+        for i, l, row in zip(inv_ids, lengths, ids):
+            np.testing.assert_array_equal(i, row[:l])
+
     def test_inverse_transform_unknown_token(self):
         x_train, y_train = [['a', 'b']], [['X', 'O']]
         it = IndexTransformer()
@@ -151,6 +163,31 @@ class TestIndexTransformer(unittest.TestCase):
         np.testing.assert_array_equal(y1, y2)
 
 
+class TestMultiLabelIndexTransformer(unittest.TestCase):
+
+    def setUp(self):
+        self.x = [['a'], ['aa', 'ab'], ['AA', 'ab', 'ac']]
+        self.y = [(['O'], ['B-NP']),
+                  (['B-A', 'I-A'], ['B-NP', 'I-NP']),
+                  (['O', 'O', 'B-A'], ['B-VP', 'B-NP', 'I-NP'])]
+
+    def test_transform(self):
+        it = MultiLabelIndexTransformer(['ner', 'chunk'])
+        x, y = it.fit_transform(self.x, self.y)
+        self.assertEqual(it.label_size, [4, 4])
+        self.assertEqual(len(y), 2)
+        self.assertEqual(y[0].shape, (3, 3, 4))
+        self.assertEqual(y[1].shape, (3, 3, 4))
+
+    def test_inverse_transform(self):
+        it = MultiLabelIndexTransformer(['ner', 'chunk'])
+        x, y = it.fit_transform(self.x, self.y)
+        lengths = list(map(len, self.x))
+        ner, chunk = it.inverse_transform(y, lengths)
+        self.assertEqual(ner, [tags for tags, _ in self.y])
+        self.assertEqual(chunk, [tags for _, tags in self.y])
+
+
 class TestPadding(unittest.TestCase):
 
     def test_pad_nested_sequences(self):
@@ -0,0 +1,130 @@
+import json
+import os
+import threading
+import time
+import unittest
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import anago
+from anago.models import load_model
+from anago.preprocessing import IndexTransformer
+from anago.serve import make_server
+
+SAVE_ROOT = os.path.join(os.path.dirname(__file__), 'models')
+
+
+class TestServe(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        weights_file = os.path.join(SAVE_ROOT, 'weights.h5')
+        params_file = os.path.join(SAVE_ROOT, 'params.json')
+        preprocessor_file = os.path.join(SAVE_ROOT, 'preprocessor.pickle')
+        p = IndexTransformer.load(preprocessor_file)
+        model = load_model(weights_file, params_file)
+        cls.tagger = anago.Tagger(model, preprocessor=p)
+
+        cls.server = make_server(cls.tagger, port=0, num_workers=2)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = 'http://{}:{}'.format(*cls.server.server_address)
+        cls.sent = 'President Obama is speaking at the White House.'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def post(self, path, obj):
+        req = Request(self.url + path, data=json.dumps(obj).encode('utf-8'),
+                      headers={'Content-Type': 'application/json'})
+        return json.loads(urlopen(req).read().decode('utf-8'))
+
+    def get(self, path):
+        return json.loads(urlopen(self.url + path).read().decode('utf-8'))
+
+    def test_ready(self):
+        res = self.get('/ready?timeout=30')
+        self.assertTrue(res['ready'])
+
+    def test_analyze(self):
+        res = self.post('/analyze', {'text': self.sent})
+        self.assertEqual(res, self.tagger.analyze(self.sent))
+
+        res = self.post('/analyze/batch', {'texts': [self.sent, 'Obama']})
+        self.assertEqual(len(res['results']), 2)
+        self.assertEqual(res['results'][0], self.tagger.analyze(self.sent))
+
+        with self.assertRaises(HTTPError) as cm:
+            self.post('/analyze', {'sent': self.sent})
+        self.assertEqual(cm.exception.code, 400)
+
+    def test_metrics(self):
+        self.post('/analyze', {'text': self.sent})
+        res = self.get('/metrics')
+        self.assertGreater(res['requests'], 0)
+        self.assertIn('qps', res)
+        self.assertIn('p99', res['latency_ms'])
+        self.assertGreater(res['batch_size']['mean'], 0)
+
+
+class StubTagger(object):
+
+    def __init__(self, delay=0, warmup_error=None):
+        self.delay = delay
+        self.warmup_error = warmup_error
+
+    def warmup(self, batch_sizes):
+        if self.warmup_error:
+            raise self.warmup_error
+
+    def analyze(self, text):
+        if text == 'bad':
+            raise ValueError(text)
+        time.sleep(self.delay)
+        return {'words': text.split()}
+
+    def analyze_batch(self, texts):
+        return [self.analyze(text) for text in texts]
+
+
+class TestServeFailures(unittest.TestCase):
+
+    def serve(self, tagger, **kwargs):
+        server = make_server(tagger, port=0, **kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = 'http://{}:{}'.format(*server.server_address)
+        return server, url
+
+    def post(self, url, obj):
+        req = Request(url, data=json.dumps(obj).encode('utf-8'),
+                      headers={'Content-Type': 'application/json'})
+        return json.loads(urlopen(req).read().decode('utf-8'))
+
+    def test_warmup_error(self):
+        server, url = self.serve(StubTagger(warmup_error=RuntimeError('out of memory')))
+        with self.assertRaises(HTTPError) as cm:
+            urlopen(url + '/ready?timeout=5')
+        self.assertEqual(cm.exception.code, 503)
+        self.assertIn('out of memory', json.loads(cm.exception.read().decode('utf-8'))['error'])
+
+        # The workers still answer requests.
+        res = self.post(url + '/analyze', {'text': 'Obama'})
+        self.assertEqual(res, {'words': ['Obama']})
+
+    def test_bad_text_fails_alone(self):
+        server, url = self.serve(StubTagger(), max_wait=0.1)
+        futures = [server.app.worker.submit(text) for text in ['Obama', 'bad', 'White House']]
+        self.assertEqual(futures[0].result(5), {'words': ['Obama']})
+        with self.assertRaises(ValueError):
+            futures[1].result(5)
+        self.assertEqual(futures[2].result(5), {'words': ['White', 'House']})
+
+    def test_timeout(self):
+        server, url = self.serve(StubTagger(delay=1), timeout=0.1)
+        server.app.ready.wait(5)
+        with self.assertRaises(HTTPError) as cm:
+            self.post(url + '/analyze', {'text': 'Obama'})
+        self.assertEqual(cm.exception.code, 503)
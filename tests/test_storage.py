@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from anago.storage import save_arrays, load_arrays, open_arrays
+
+
+class TestStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.save_root = tempfile.mkdtemp()
+        self.path = os.path.join(self.save_root, 'weights.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.save_root)
+
+    def test_save_and_load(self):
+        arrays = {'embedding': np.random.randn(100, 30).astype('float32'),
+                  'ids': np.arange(7, dtype='int8'),
+                  'scalar': np.float32(3),
+                  'empty': np.zeros((0, 3))}
+        save_arrays(self.path, arrays, metadata={'version': 1})
+        self.assertEqual(os.listdir(self.save_root), ['weights.bin'])
+
+        for mmap in (True, False):
+            loaded, metadata = load_arrays(self.path, mmap=mmap)
+            self.assertEqual(metadata, {'version': 1})
+            self.assertEqual(set(loaded), set(arrays))
+            for name, a in arrays.items():
+                self.assertEqual(loaded[name].dtype, a.dtype)
+                np.testing.assert_array_equal(loaded[name], a)
+
+        loaded, _ = load_arrays(self.path)
+        self.assertFalse(loaded['embedding'].flags.writeable)
+
+    def test_open_arrays(self):
+        save_arrays(self.path, {'x': np.zeros(3)})
+        x1, _ = open_arrays(self.path)
+        x2, _ = open_arrays(self.path)
+        self.assertIs(x1['x'], x2['x'])
+
+        # A replaced file is mapped again, the old mapping stays valid.
+        save_arrays(self.path, {'x': np.ones(3)})
+        os.utime(self.path, ns=(0, 0))
+        x3, _ = open_arrays(self.path)
+        np.testing.assert_array_equal(x1['x'], np.zeros(3))
+        np.testing.assert_array_equal(x3['x'], np.ones(3))
+
+    def test_object_array(self):
+        with self.assertRaises(ValueError):
+            save_arrays(self.path, {'x': np.array(['a', None])})
+        self.assertEqual(os.listdir(self.save_root), [])
@@ -0,0 +1,109 @@
+import argparse
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from anago import tag
+from anago.tag import format_sentence, read_sentences, tag_file
+from anago.utils import load_data_and_labels
+
+DATA_ROOT = os.path.join(os.path.dirname(__file__), '../data/conll2003/en/ner')
+SAVE_ROOT = os.path.join(os.path.dirname(__file__), 'models')
+
+
+class TestTag(unittest.TestCase):
+
+    def test_read_sentences(self):
+        f = io.StringIO('EU\tB-ORG\nrejects\tO\n\n\nPeter\tB-PER\nBlackburn\tI-PER\n')
+        self.assertEqual(list(read_sentences(f, 'conll')),
+                         [['EU', 'rejects'], ['Peter', 'Blackburn']])
+
+        f = io.StringIO('{"words": ["EU", "rejects"]}\n\n{"text": "Peter  Blackburn"}\n')
+        self.assertEqual(list(read_sentences(f, 'jsonl')),
+                         [['EU', 'rejects'], ['Peter', 'Blackburn']])
+
+        f = io.StringIO('EU rejects\n\nPeter Blackburn\n')
+        self.assertEqual(list(read_sentences(f, 'text')),
+                         [['EU', 'rejects'], ['Peter', 'Blackburn']])
+
+        with self.assertRaises(ValueError):
+            list(read_sentences(f, 'xml'))
+
+    def test_format_sentence(self):
+        words, tags = ['EU', 'rejects'], ['B-ORG', 'O']
+        self.assertEqual(format_sentence(0, words, tags, 'conll'), 'EU\tB-ORG\nrejects\tO\n\n')
+        obj = json.loads(format_sentence(3, words, tags, 'jsonl'))
+        self.assertEqual(obj, {'id': 3, 'words': words, 'tags': tags})
+
+
+class TestTagFile(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        x, _ = load_data_and_labels(os.path.join(DATA_ROOT, 'valid.txt'))
+        self.input = os.path.join(self.dir, 'input.txt')
+        with open(self.input, 'w', encoding='utf-8') as f:
+            f.writelines(' '.join(words) + '\n' for words in x[:50])
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def get_args(self, output, **kwargs):
+        args = argparse.Namespace(
+            weights=os.path.join(SAVE_ROOT, 'weights.h5'),
+            params=os.path.join(SAVE_ROOT, 'params.json'),
+            preprocessor=os.path.join(SAVE_ROOT, 'preprocessor.pickle'),
+            input=self.input, output=os.path.join(self.dir, output),
+            input_format='text', output_format='jsonl', encoding='utf-8',
+            workers=1, batch_size=4, prefetch=2, ordered=True, checkpoint=None,
+            checkpoint_every=0., report_every=60., resume=False)
+        for key, value in kwargs.items():
+            setattr(args, key, value)
+        return args
+
+    def read_output(self, args):
+        with open(args.output, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    def test_ordered_and_unordered(self):
+        args = self.get_args('ordered.jsonl')
+        tag_file(args)
+        ordered = self.read_output(args)
+        self.assertEqual([obj['id'] for obj in ordered], list(range(50)))
+        with open(self.input, encoding='utf-8') as f:
+            self.assertEqual([obj['words'] for obj in ordered], [line.split() for line in f])
+
+        args = self.get_args('unordered.jsonl', ordered=False)
+        tag_file(args)
+        unordered = sorted(self.read_output(args), key=lambda obj: obj['id'])
+        self.assertEqual(unordered, ordered)
+
+    def test_resume(self):
+        args = self.get_args('full.jsonl')
+        tag_file(args)
+        with open(args.output, encoding='utf-8') as f:
+            expected = f.read()
+
+        # Stop in the middle of the sixth batch.
+        calls = []
+
+        def interrupt(*sentence):
+            calls.append(sentence)
+            if len(calls) == 22:
+                raise KeyboardInterrupt
+            return format_sentence(*sentence)
+
+        args = self.get_args('resumed.jsonl')
+        with mock.patch.object(tag, 'format_sentence', interrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                tag_file(args)
+        with open(args.output + '.ckpt') as f:
+            self.assertEqual(json.load(f)['sentences'], 20)
+
+        tag_file(self.get_args('resumed.jsonl', resume=True))
+        with open(args.output, encoding='utf-8') as f:
+            self.assertEqual(f.read(), expected)
@@ -1,17 +1,38 @@
 import os
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import tensorflow as tf
 
 import anago
-from anago.models import load_model
-from anago.preprocessing import IndexTransformer
+from anago.models import MultiTaskBiLSTMCRF, load_model
+from anago.preprocessing import IndexTransformer, MultiLabelIndexTransformer
 
 DATA_ROOT = os.path.join(os.path.dirname(__file__), '../data/conll2003/en/ner')
 SAVE_ROOT = os.path.join(os.path.dirname(__file__), 'models')
 
 
+class LookupModel(object):
+    """Tags every word by itself, with a table of label scores per word id."""
+
+    def __init__(self, table):
+        self.table = table
+
+    def predict(self, X):
+        return self.table[X]
+
+
+def build_lookup_tagger(sents, labels):
+    p = IndexTransformer(use_char=False).fit(sents, labels)
+    table = np.zeros((p.word_vocab_size, p.label_size))
+    table[:, p._label_vocab.doc2id(['O'])[0]] = 1
+    for words, tags in zip(sents, labels):
+        table[p._word_vocab.doc2id(words)] = np.eye(p.label_size)[p._label_vocab.doc2id(tags)]
+
+    return anago.Tagger(LookupModel(table), preprocessor=p)
+
+
 class TestTagger(unittest.TestCase):
 
     @classmethod
@@ -66,3 +87,153 @@ class TestTagger(unittest.TestCase):
         self.assertIsInstance(res, list)
         for tag in res:
             self.assertIsInstance(tag, str)
+
+    def test_analyze_document(self):
+        doc = ' '.join([self.sent] * 30)
+        res = list(self.tagger.analyze_document(doc, window_size=10, overlap=4, batch_size=4))
+        self.assertEqual(len(res), 30)
+        words = [w for r in res for w in r['words']]
+        self.assertEqual(words, doc.split())
+        for r in res:
+            for e in r['entities']:
+                self.assertEqual(e['text'], ' '.join(words[e['beginOffset']: e['endOffset']]))
+
+        res = list(self.tagger.analyze_document(doc, window_size=10, overlap=4,
+                                                split_sentences=False))
+        words = [w for r in res for w in r['words']]
+        self.assertEqual(words, doc.split())
+        for r in res:
+            self.assertLessEqual(len(r['words']), 10)
+
+        # Tagging every word alone, windows are tagged as the whole text is,
+        # so the merged entities must be those of the whole text.
+        sent = 'the mayor of New York City met Obama at the White House today'.split()
+        tags = ['O', 'O', 'O', 'B-LOC', 'I-LOC', 'I-LOC', 'O', 'B-PER', 'O', 'O', 'B-ORG', 'I-ORG', 'O']
+        tagger = build_lookup_tagger([sent], [tags])
+        doc = ' '.join(sent * 5)
+        res = list(tagger.analyze_document(doc, window_size=8, overlap=4, split_sentences=False))
+        entities = [e for r in res for e in r['entities']]
+        expected = tagger.analyze(doc)['entities']
+        self.assertEqual([(e['type'], e['beginOffset'], e['endOffset'], e['text']) for e in entities],
+                         [(e['type'], e['beginOffset'], e['endOffset'], e['text']) for e in expected])
+        edges = [r['offset'] for r in res]
+        self.assertTrue(any(e['beginOffset'] < edge < e['endOffset'] for e in entities for edge in edges))
+
+    def test_analyze_batch(self):
+        texts = [self.sent, 'Obama', 'White House']
+        res = self.tagger.analyze_batch(texts)
+        self.assertEqual(len(res), len(texts))
+        for text, r in zip(texts, res):
+            self.assertEqual(r, self.tagger.analyze(text))
+
+    def test_cache(self):
+        tagger = anago.Tagger(self.tagger.model, preprocessor=self.tagger.preprocessor,
+                              cache_size=2)
+        res1 = tagger.analyze(self.sent)
+        res1['entities'].clear()
+        res2 = tagger.analyze('  ' + self.sent)
+        self.assertEqual(res2, self.tagger.analyze(self.sent))
+        self.assertEqual(tagger.cache_info(), {'hits': 1, 'misses': 1, 'maxsize': 2, 'currsize': 1})
+
+        tagger.analyze_batch(['Obama', 'White House', self.sent])
+        info = tagger.cache_info()
+        self.assertEqual(info['currsize'], 2)
+        self.assertEqual(info['misses'], 3)
+
+        # Responses of a replaced model or preprocessor are not reused.
+        tagger.analyze('Obama')
+        self.assertEqual(tagger.cache_info()['misses'], 3)
+        tagger.model = self.tagger.model
+        tagger.analyze('Obama')
+        self.assertEqual(tagger.cache_info()['misses'], 4)
+        tagger.preprocessor = self.tagger.preprocessor
+        tagger.analyze('Obama')
+        self.assertEqual(tagger.cache_info()['misses'], 5)
+
+        tagger.cache_clear()
+        self.assertEqual(tagger.cache_info()['currsize'], 0)
+        self.assertIsNone(self.tagger.cache_info())
+
+    def test_buckets(self):
+        tagger = anago.Tagger(self.tagger.model, preprocessor=self.tagger.preprocessor,
+                              buckets=[4, 8, 16])
+        tagger.warmup(batch_sizes=(1, 2))
+        for text in [self.sent, 'Obama', ' '.join([self.sent] * 3)]:
+            self.assertEqual(tagger.predict(text), self.tagger.predict(text))
+            self.assertEqual(len(tagger.predict_proba(text)), len(text.split()))
+
+    def test_threads(self):
+        tagger = anago.Tagger(self.tagger.model, preprocessor=self.tagger.preprocessor,
+                              concurrency=2)
+        texts = [self.sent, 'Obama', 'White House'] * 20
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            res = list(executor.map(tagger.analyze, texts))
+        for text, r in zip(texts, res):
+            self.assertEqual(r, self.tagger.analyze(text))
+
+
+class TestMultiTaskTagger(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        x = [['President', 'Obama', 'is', 'speaking'], ['at', 'the', 'White', 'House.']]
+        y = [(['O', 'B-PER', 'O', 'O'], ['B-NP', 'I-NP', 'B-VP', 'I-VP']),
+             (['O', 'O', 'B-LOC', 'I-LOC'], ['B-PP', 'B-NP', 'I-NP', 'I-NP'])]
+        p = MultiLabelIndexTransformer(['ner', 'chunk']).fit(x, y)
+        model = MultiTaskBiLSTMCRF(char_vocab_size=p.char_vocab_size,
+                                   word_vocab_size=p.word_vocab_size,
+                                   num_labels=p.label_size,
+                                   task_names=p.task_names)
+        model, _ = model.build()
+        cls.tagger = anago.MultiTaskTagger(model, preprocessor=p)
+
+        cls.sent = 'President Obama is speaking at the White House.'
+
+    def test_predict(self):
+        res = self.tagger.predict(self.sent)
+        self.assertEqual(sorted(res), ['chunk', 'ner'])
+        for tags in res.values():
+            self.assertEqual(len(tags), len(self.sent.split()))
+
+    def test_analyze(self):
+        res = self.tagger.analyze(self.sent)
+        self.assertEqual(res['words'], self.sent.split())
+        self.assertEqual(res['tags'], self.tagger.predict(self.sent))
+        self.assertEqual(sorted(res['entities']), ['chunk', 'ner'])
+        for name, entities in res['entities'].items():
+            for e in entities:
+                self.assertEqual(e['text'], ' '.join(res['words'][e['beginOffset']: e['endOffset']]))
+
+    def test_analyze_batch(self):
+        texts = [self.sent, 'Obama', 'White House']
+        res = self.tagger.analyze_batch(texts)
+        self.assertEqual(len(res), len(texts))
+        for text, r in zip(texts, res):
+            self.assertEqual(r, self.tagger.analyze(text))
+
+    def test_analyze_document(self):
+        sents = [self.sent, 'Obama is speaking.', 'White House.']
+        doc = ' '.join(sents * 5)
+        res = list(self.tagger.analyze_document(doc, window_size=20, overlap=4, batch_size=4))
+        self.assertEqual(len(res), len(sents) * 5)
+        # Windows holding whole sentences are tagged as the sentences alone.
+        for text, r in zip(sents * 5, res):
+            expected = self.tagger.analyze(text)
+            self.assertEqual(r['words'], expected['words'])
+            self.assertEqual(r['tags'], expected['tags'])
+            for name, entities in r['entities'].items():
+                spans = [(e['type'], e['beginOffset'] - r['offset'], e['endOffset'] - r['offset'])
+                         for e in entities]
+                self.assertEqual(spans, [(e['type'], e['beginOffset'], e['endOffset'])
+                                         for e in expected['entities'][name]])
+
+        res = list(self.tagger.analyze_document(doc, window_size=6, overlap=2,
+                                                split_sentences=False))
+        words = [w for r in res for w in r['words']]
+        self.assertEqual(words, doc.split())
+        for r in res:
+            self.assertEqual(sorted(r['tags']), ['chunk', 'ner'])
+            for name, entities in r['entities'].items():
+                self.assertEqual(len(r['tags'][name]), len(r['words']))
+                for e in entities:
+                    self.assertEqual(e['text'], ' '.join(words[e['beginOffset']: e['endOffset']]))
@@ -1,10 +1,11 @@
+import copy
 import os
 import unittest
 
 from anago.utils import load_data_and_labels
-from anago.models import BiLSTMCRF, save_model
-from anago.preprocessing import IndexTransformer
-from anago.trainer import Trainer
+from anago.models import BiLSTMCRF, MultiTaskBiLSTMCRF, save_model
+from anago.preprocessing import IndexTransformer, MultiLabelIndexTransformer
+from anago.trainer import Trainer, DistillationTrainer
 
 get_path = lambda path: os.path.join(os.path.dirname(__file__), path)
 DATA_ROOT = get_path('../data/conll2003/en/ner')
@@ -50,6 +51,15 @@ class TestTrainer(unittest.TestCase):
         trainer.train(self.x_train, self.y_train,
                       x_valid=self.x_valid, y_valid=self.y_valid)
 
+    def test_train_workers(self):
+        trainer = Trainer(self.model, preprocessor=self.p)
+        trainer.train(self.x_train, self.y_train,
+                      x_valid=self.x_valid, y_valid=self.y_valid,
+                      workers=2, use_multiprocessing=True, max_queue_size=4)
+        data_wait = self.model.history.history['data_wait']
+        self.assertEqual(len(data_wait), 1)
+        self.assertTrue(0 <= data_wait[0] <= 1)
+
     def test_train_no_valid(self):
         trainer = Trainer(self.model, preprocessor=self.p)
         trainer.train(self.x_train, self.y_train)
@@ -78,6 +88,27 @@ class TestTrainer(unittest.TestCase):
         trainer.train(self.x_train, self.y_train,
                       x_valid=self.x_valid, y_valid=self.y_valid)
 
+    def test_train_multi_task(self):
+        # A second label set: entity spans without their types.
+        spans = lambda y: [[tag.split('-')[0] + '-ENT' if tag != 'O' else tag for tag in tags] for tags in y]
+        y_train = list(zip(self.y_train[:1000], spans(self.y_train[:1000])))
+        y_valid = list(zip(self.y_valid[:100], spans(self.y_valid[:100])))
+        p = MultiLabelIndexTransformer(['ner', 'span'])
+        p.fit(self.x_train[:1000], y_train)
+        model = MultiTaskBiLSTMCRF(char_vocab_size=p.char_vocab_size,
+                                   word_vocab_size=p.word_vocab_size,
+                                   num_labels=p.label_size,
+                                   task_names=p.task_names)
+        model, losses = model.build()
+        model.compile(loss=losses, optimizer='adam')
+        trainer = Trainer(model, preprocessor=p)
+        trainer.train(self.x_train[:1000], y_train,
+                      x_valid=self.x_valid[:100], y_valid=y_valid)
+        history = model.history.history
+        for key in ['ner_f1', 'span_f1', 'f1']:
+            self.assertEqual(len(history[key]), 1)
+        self.assertAlmostEqual(history['f1'][0], (history['ner_f1'][0] + history['span_f1'][0]) / 2)
+
     def test_save(self):
         # Train the model.
         trainer = Trainer(self.model, preprocessor=self.p)
@@ -86,3 +117,26 @@ class TestTrainer(unittest.TestCase):
         # Save the model.
         save_model(self.model, self.weights_file, self.params_file)
         self.p.save(self.preprocessor_file)
+
+    def test_distill(self):
+        trainer = Trainer(self.model, preprocessor=self.p)
+        trainer.train(self.x_train[:1000], self.y_train[:1000])
+
+        p = copy.deepcopy(self.p)
+        p._use_char = False
+        student = BiLSTMCRF(word_vocab_size=p.word_vocab_size,
+                            num_labels=p.label_size,
+                            word_lstm_size=25,
+                            use_char=False)
+        student, loss = student.build()
+        student.compile(loss=loss, optimizer='adam')
+
+        trainer = DistillationTrainer(student, self.model, preprocessor=p, teacher_preprocessor=self.p)
+        soft = trainer.label(self.x_train[:10])
+        self.assertEqual(len(soft), 10)
+        self.assertEqual(soft[0].shape, (len(self.x_train[0]), p.label_size))
+        trainer.train(self.x_train[:1000], x_valid=self.x_valid[:100], y_valid=self.y_valid[:100])
+
+        res = trainer.compare(self.x_valid[:100], self.y_valid[:100], num_queries=10)
+        self.assertIn('f1_gap', res)
+        self.assertGreater(res['student']['sents_per_sec'], 0)
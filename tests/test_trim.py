@@ -0,0 +1,49 @@
+import unittest
+
+import numpy as np
+
+from anago.models import BiLSTMCRF
+from anago.preprocessing import IndexTransformer
+from anago.trim import trim_vocabulary, trim_model, verify_trim
+
+
+class TestTrim(unittest.TestCase):
+
+    def setUp(self):
+        self.x = [['EU', 'rejects', 'German', 'call'],
+                  ['Peter', 'Blackburn'],
+                  ['BRUSSELS', 'rejects', 'call', 'call']]
+        self.y = [['B-ORG', 'O', 'B-MISC', 'O'],
+                  ['B-PER', 'I-PER'],
+                  ['B-LOC', 'O', 'O', 'O']]
+        self.p = IndexTransformer().fit(self.x, self.y)
+
+    def test_trim_vocabulary(self):
+        docs = [['call', 'rejects', 'unseen'], ['Call']]
+        p, old_ids = trim_vocabulary(self.p, docs)
+        vocab = p._word_vocab
+        self.assertEqual(vocab.reverse_vocab, ['<pad>', 'call', 'rejects', '<unk>'])
+        self.assertEqual([self.p._word_vocab.reverse_vocab[i] for i in old_ids], vocab.reverse_vocab)
+        self.assertEqual(vocab.doc2id(['call', 'EU', 'rejects']), [1, 3, 2])
+        # The original preprocessor is unchanged.
+        self.assertEqual(self.p.word_vocab_size, 9)
+
+        p, old_ids = trim_vocabulary(self.p, docs, min_count=2)
+        self.assertEqual(p._word_vocab.reverse_vocab, ['<pad>', 'call', '<unk>'])
+
+        p, old_ids = trim_vocabulary(self.p, min_count=2)
+        self.assertEqual(p._word_vocab.reverse_vocab, ['<pad>', 'call', 'rejects', '<unk>'])
+
+    def test_trim_model(self):
+        model, loss = BiLSTMCRF(char_vocab_size=self.p.char_vocab_size,
+                                word_vocab_size=self.p.word_vocab_size,
+                                num_labels=self.p.label_size).build()
+        p, old_ids = trim_vocabulary(self.p, [['call', 'rejects', 'German']])
+        trimmed = trim_model(model, old_ids)
+
+        embeddings = trimmed.get_layer('word_embedding').get_weights()[0]
+        self.assertEqual(embeddings.shape[0], p.word_vocab_size)
+        np.testing.assert_array_equal(embeddings, model.get_layer('word_embedding').get_weights()[0][old_ids])
+
+        res = verify_trim(model, self.p, trimmed, p, self.x + [['German', 'call'], ['rejects']])
+        self.assertEqual(res, {'sentences': 2, 'mismatches': 0})
@@ -1,8 +1,13 @@
 import os
 import unittest
 
-from anago.utils import load_data_and_labels, Vocabulary, download, NERSequence
+import numpy as np
+from seqeval.metrics.sequence_labeling import get_entities
+
+from anago.utils import load_data_and_labels, Vocabulary, download, EntityDecoder
+from anago.utils import allowed_transitions
 from anago.preprocessing import IndexTransformer
+from anago.sequence import NERSequence
 
 
 class TestUtils(unittest.TestCase):
@@ -102,3 +107,63 @@ class TestVocabulary(unittest.TestCase):
         doc_ids = vocab.doc2id(true_doc)
         pred_doc = vocab.id2doc(doc_ids)
         self.assertEqual(pred_doc, true_doc)
+
+
+class TestEntityDecoder(unittest.TestCase):
+
+    def test_decode(self):
+        labels = ['<pad>', 'O', 'B-PER', 'I-PER', 'B-LOC', 'I-LOC']
+        decoder = EntityDecoder(labels)
+        y = [[2, 3, 1, 4, 5, 0],
+             [3, 3, 4, 2, 0, 0],
+             [5, 1, 1, 1, 1, 2]]
+        lengths = [5, 4, 6]
+        scores = np.random.rand(3, 6)
+        chunks = decoder.decode(y, lengths, scores)
+        for ids, length, score, sent_chunks in zip(y, lengths, scores, chunks):
+            tags = [labels[i] for i in ids[:length]]
+            self.assertEqual([c[:3] for c in sent_chunks], get_entities(tags))
+            for _, begin, end, s in sent_chunks:
+                self.assertAlmostEqual(s, np.mean(score[begin: end + 1]))
+
+    def test_decode_iobes(self):
+        labels = ['<pad>', 'O', 'B-A', 'I-A', 'E-A', 'S-A', 'B-B', 'E-B', 'S-B']
+        decoder = EntityDecoder(labels)
+        y = np.random.randint(0, len(labels), size=(50, 10))
+        lengths = np.random.randint(0, 11, size=50)
+        chunks = decoder.decode(y, lengths)
+        for ids, length, sent_chunks in zip(y, lengths, chunks):
+            tags = [labels[i] for i in ids[:length]]
+            self.assertEqual([c[:3] for c in sent_chunks], get_entities(tags))
+
+
+class TestAllowedTransitions(unittest.TestCase):
+
+    def test_bio(self):
+        labels = ['<pad>', 'O', 'B-PER', 'I-PER', 'B-LOC', 'I-LOC']
+        start, end = len(labels), len(labels) + 1
+        pairs = set(allowed_transitions(labels))
+        self.assertIn((labels.index('B-PER'), labels.index('I-PER')), pairs)
+        self.assertIn((labels.index('I-PER'), labels.index('I-PER')), pairs)
+        self.assertIn((labels.index('I-PER'), labels.index('B-LOC')), pairs)
+        self.assertNotIn((labels.index('O'), labels.index('I-PER')), pairs)
+        self.assertNotIn((labels.index('B-LOC'), labels.index('I-PER')), pairs)
+        self.assertNotIn((start, labels.index('I-PER')), pairs)
+        self.assertIn((start, labels.index('B-PER')), pairs)
+        self.assertIn((labels.index('I-LOC'), end), pairs)
+
+    def test_bioes(self):
+        labels = ['<pad>', 'O', 'B-A', 'I-A', 'E-A', 'S-A']
+        start, end = len(labels), len(labels) + 1
+        pairs = set(allowed_transitions(labels, scheme='BIOES'))
+        self.assertIn((labels.index('B-A'), labels.index('E-A')), pairs)
+        self.assertIn((labels.index('E-A'), labels.index('S-A')), pairs)
+        self.assertNotIn((labels.index('B-A'), labels.index('O')), pairs)
+        self.assertNotIn((labels.index('O'), labels.index('E-A')), pairs)
+        self.assertNotIn((labels.index('I-A'), end), pairs)
+        self.assertIn((labels.index('S-A'), end), pairs)
+        self.assertNotIn((start, labels.index('I-A')), pairs)
+
+    def test_unknown_scheme(self):
+        with self.assertRaises(ValueError):
+            allowed_transitions(['O'], scheme='IOB1')